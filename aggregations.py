@@ -0,0 +1,129 @@
+"""
+SQL-side aggregation of a user's transactions.
+
+Everything here is computed by SQLite with GROUP BY and comes back as small
+named tuples, so callers never fetch raw rows just to total them up. Sums are
+exact integer cents in SQL and Decimal amounts in the returned tuples.
+"""
+from collections import namedtuple
+from decimal import Decimal
+
+from instrumentation import timed
+from records import from_cents
+
+Totals = namedtuple("Totals", ["total_income", "total_expenses", "balance", "count"])
+CategoryTotal = namedtuple("CategoryTotal", ["type", "category", "total", "count"])
+PeriodTotal = namedtuple("PeriodTotal", ["period", "income", "expenses"])
+Aggregates = namedtuple("Aggregates", ["totals", "by_category", "by_month", "by_week"])
+
+EMPTY_TOTALS = Totals(Decimal("0.00"), Decimal("0.00"), Decimal("0.00"), 0)
+
+
+@timed("db.summary_totals")
+def summary_totals(db_manager, username):
+    """
+    Income, expense and balance totals from the materialized user_balances row.
+    :return: Totals
+    """
+    with db_manager.connection() as conn:
+        row = conn.execute("""
+            SELECT total_income_cents, total_expenses_cents, tx_count
+            FROM user_balances
+            WHERE username = ?
+        """, (username,)).fetchone()
+    if row is None:
+        return EMPTY_TOTALS
+    income, expenses, count = row
+    return Totals(from_cents(income), from_cents(expenses), from_cents(income - expenses), count)
+
+
+@timed("db.monthly_totals", rows=len)
+def monthly_totals(db_manager, username):
+    """
+    Income and expenses per month from the materialized monthly_rollups table.
+    :return: list of PeriodTotal, oldest month first
+    """
+    with db_manager.connection() as conn:
+        rows = conn.execute("""
+            SELECT month,
+                   SUM(CASE WHEN type = 'income' THEN total_cents ELSE 0 END),
+                   SUM(CASE WHEN type = 'expense' THEN total_cents ELSE 0 END)
+            FROM monthly_rollups
+            WHERE username = ?
+            GROUP BY month
+            ORDER BY month
+        """, (username,)).fetchall()
+    return [PeriodTotal(month, from_cents(income), from_cents(expenses)) for month, income, expenses in rows]
+
+
+@timed("db.category_totals", rows=len)
+def category_totals(db_manager, username):
+    """
+    Per type and category sums, largest first.
+    :return: list of CategoryTotal
+    """
+    with db_manager.connection() as conn:
+        rows = conn.execute("""
+            SELECT type, category, SUM(amount_cents) AS total, COUNT(*)
+            FROM transactions
+            WHERE username = ?
+            GROUP BY type, category
+            ORDER BY total DESC
+        """, (username,)).fetchall()
+    return [CategoryTotal(t, c, from_cents(total), n) for t, c, total, n in rows]
+
+
+@timed("db.aggregate")
+def aggregate(db_manager, username):
+    """
+    Totals, per-category sums and monthly/weekly rollups from one grouped query.
+    The query groups by (type, category, month, week); the much smaller result
+    is folded into each view here.
+    :return: Aggregates
+    """
+    with db_manager.connection() as conn:
+        rows = conn.execute("""
+            SELECT type, category, substr(date, 1, 7) AS month,
+                   strftime('%Y-W%W', date) AS week, SUM(amount_cents), COUNT(*)
+            FROM transactions
+            WHERE username = ?
+            GROUP BY type, category, month, week
+        """, (username,)).fetchall()
+
+    income = expenses = 0
+    count = 0
+    categories = {}
+    months = {}
+    weeks = {}
+    for trans_type, category, month, week, total, n in rows:
+        count += n
+        slot = 0 if trans_type == "income" else 1
+        if slot == 0:
+            income += total
+        else:
+            expenses += total
+
+        key = (trans_type, category)
+        previous = categories.get(key, (0, 0))
+        categories[key] = (previous[0] + total, previous[1] + n)
+
+        for period, bucket in ((month, months), (week, weeks)):
+            sums = bucket.setdefault(period, [0, 0])
+            sums[slot] += total
+
+    # Folded in integer cents; converted to Decimal once per output value.
+    by_category = sorted(
+        (CategoryTotal(t, c, from_cents(total), n) for (t, c), (total, n) in categories.items()),
+        key=lambda item: item.total,
+        reverse=True,
+    )
+
+    def periods(bucket):
+        return [PeriodTotal(p, from_cents(bucket[p][0]), from_cents(bucket[p][1])) for p in sorted(bucket, key=str)]
+
+    return Aggregates(
+        totals=Totals(from_cents(income), from_cents(expenses), from_cents(income - expenses), count),
+        by_category=by_category,
+        by_month=periods(months),
+        by_week=periods(weeks),
+    )
@@ -0,0 +1,20 @@
+"""
+Vectorized analytics over a user's transaction history.
+
+``load_columns`` reads the history once into typed NumPy columns (int64
+cents, datetime64 dates, integer category codes); budgets, recurring payment
+detection and the cash-flow forecast then work on whole columns with NumPy
+operations instead of looping over rows in Python. Amounts in results are
+integer cents, as stored, except RecurringPayment.amount, which is a Decimal.
+
+numpy is imported with this package, so import it lazily from the entry points.
+"""
+from analytics.budgets import BudgetReport, monthly_budgets
+from analytics.columns import TransactionColumns, load_columns
+from analytics.forecast import CashFlowForecast, forecast_cash_flow
+from analytics.recurring import RecurringPayment, detect_recurring
+
+__all__ = [
+    "BudgetReport", "CashFlowForecast", "RecurringPayment", "TransactionColumns",
+    "detect_recurring", "forecast_cash_flow", "load_columns", "monthly_budgets",
+]
@@ -0,0 +1,65 @@
+"""
+Monthly spending per category against a budget.
+"""
+from collections import namedtuple
+
+import numpy as np
+
+from analytics.columns import month_index
+from records import to_cents
+
+BudgetReport = namedtuple("BudgetReport", [
+    "months",          # datetime64[M], oldest first
+    "categories",      # expense categories, in row order of the matrices
+    "actual_cents",    # int64 (categories, months): spent in the month
+    "budget_cents",    # int64 (categories, months): the month's budget
+    "variance_cents",  # int64 (categories, months): actual - budget; positive is overspent
+])
+
+
+def rolling_means(matrix, window):
+    """
+    Row-wise mean of the ``window`` columns before each column, rounded half
+    up; columns with nothing before them get 0.
+    """
+    months = matrix.shape[1]
+    cumulative = np.zeros((matrix.shape[0], months + 1), dtype=np.int64)
+    np.cumsum(matrix, axis=1, out=cumulative[:, 1:])
+    end = np.arange(months)
+    start = np.maximum(end - window, 0)
+    counts = end - start
+    sums = cumulative[:, end] - cumulative[:, start]
+    return np.where(counts > 0, (2 * sums + counts) // (2 * np.maximum(counts, 1)), 0)
+
+
+def monthly_budgets(columns, budgets=None, window=3):
+    """
+    Expenses per category and month with each month's budget.
+    A category's budget is its amount in ``budgets`` for every month, or else
+    the rolling mean of its spending over the ``window`` months before.
+    :param columns: analytics.TransactionColumns
+    :param budgets: Optional {category: monthly amount in currency units}
+    :return: BudgetReport; categories without expenses are left out
+    """
+    expense = ~columns.is_income
+    first, offsets, months = month_index(columns.dates[expense])
+    codes = columns.category_codes[expense].astype(np.int64)
+    count = len(columns.categories)
+
+    # float64 sums of integer cents are exact below 2**53 cents.
+    actual = np.bincount(
+        codes * months + offsets, weights=columns.amount_cents[expense], minlength=count * months
+    ).astype(np.int64).reshape(count, months)
+    spent = np.bincount(codes, minlength=count) > 0
+    actual = actual[spent]
+    categories = columns.categories[spent]
+
+    budget = rolling_means(actual, window)
+    if budgets:
+        rows = {name: row for row, name in enumerate(categories)}
+        for name, amount in budgets.items():
+            if name in rows:
+                budget[rows[name]] = to_cents(amount)
+
+    month_labels = first + np.arange(months) if months else np.zeros(0, dtype="datetime64[M]")
+    return BudgetReport(month_labels, categories, actual, budget, actual - budget)
@@ -0,0 +1,67 @@
+"""
+Cash-flow forecast from monthly income and expense totals.
+"""
+from collections import namedtuple
+
+import numpy as np
+
+from analytics.columns import month_index
+
+CashFlowForecast = namedtuple("CashFlowForecast", [
+    "months",         # datetime64[M] of the forecast months
+    "income_cents",   # int64 per month
+    "expense_cents",  # int64 per month
+    "net_cents",      # int64 per month: income - expenses
+    "balance_cents",  # int64: running balance at the end of each month
+])
+
+
+def monthly_series(columns):
+    """
+    Income and expense totals for every month from the first transaction to the last.
+    :return: (first month, income cents, expense cents)
+    """
+    first, offsets, months = month_index(columns.dates)
+    amounts = columns.amount_cents
+    # float64 sums of integer cents are exact below 2**53 cents.
+    income = np.bincount(offsets, weights=np.where(columns.is_income, amounts, 0), minlength=months)
+    expenses = np.bincount(offsets, weights=np.where(columns.is_income, 0, amounts), minlength=months)
+    return first, income.astype(np.int64), expenses.astype(np.int64)
+
+
+def forecast_cash_flow(columns, months=6, history=12):
+    """
+    Project income and expenses with a least-squares linear trend over the
+    last ``history`` complete months. The month of the latest transaction is
+    taken to be incomplete: it is left out of the fit and forecast in full,
+    as the first forecast month. Projections never go below zero.
+    :param columns: analytics.TransactionColumns
+    :param months: Number of months to forecast
+    :return: CashFlowForecast; empty without transactions
+    """
+    first, income, expenses = monthly_series(columns)
+    if first is None:
+        empty = np.zeros(0, dtype=np.int64)
+        return CashFlowForecast(np.zeros(0, dtype="datetime64[M]"), empty, empty, empty, empty)
+
+    complete = len(income) - 1
+    start = max(0, complete - history)
+    # One row per series; the partial month stands in when there is no complete one.
+    fitted = np.vstack([income, expenses])[:, start:complete] if complete else np.vstack([income, expenses])
+    steps = np.arange(fitted.shape[1], fitted.shape[1] + months)
+    if fitted.shape[1] >= 2:
+        slope, intercept = np.polyfit(np.arange(fitted.shape[1]), fitted.T, 1)
+        projected = slope[:, None] * steps + intercept[:, None]
+    else:
+        projected = np.repeat(fitted[:, -1:], months, axis=1).astype(np.float64)
+    projected = np.maximum(np.rint(projected), 0).astype(np.int64)
+
+    net = projected[0] - projected[1]
+    opening = int(income[:complete].sum() - expenses[:complete].sum())
+    return CashFlowForecast(
+        months=first + complete + np.arange(months),
+        income_cents=projected[0],
+        expense_cents=projected[1],
+        net_cents=net,
+        balance_cents=opening + np.cumsum(net),
+    )
@@ -0,0 +1,110 @@
+"""
+Recurring payment detection.
+
+Transactions are clustered by type, category and amount: within a category,
+amounts sorted in order join the same cluster while each is within
+``amount_tolerance`` of the one before. A cluster is recurring when it has
+enough occurrences and the days between them sit close to a standard period
+(weekly to yearly) with little spread. Descriptions are not used, so they
+stay sealed; two subscriptions of the same amount in one category fall into
+one cluster and are only found if they share a schedule.
+"""
+from collections import namedtuple
+
+import numpy as np
+
+from records import from_cents
+
+RecurringPayment = namedtuple("RecurringPayment", [
+    "type", "category", "amount", "period", "interval_days", "occurrences", "first_date", "last_date",
+    "next_date", "active",
+])
+
+# Standard periods in days, and their names.
+PERIODS = {"weekly": 7.0, "fortnightly": 14.0, "monthly": 30.44, "quarterly": 91.31, "yearly": 365.25}
+
+
+def cluster_amounts(groups, amounts, tolerance):
+    """
+    Cluster numbers per row: rows of one group whose amounts chain together in
+    steps of at most ``tolerance`` (relative) share a cluster.
+    :return: (cluster number per row, number of clusters)
+    """
+    span = int(amounts.max()) + 1 if len(amounts) else 1
+    if len(groups) and (int(groups.max()) + 1) * span < 2 ** 63:
+        # One int64 key sorts several times faster than a two-key lexsort.
+        order = np.argsort(groups * span + amounts)
+    else:
+        order = np.lexsort((amounts, groups))
+    sorted_groups = groups[order]
+    sorted_amounts = amounts[order]
+    starts = np.ones(len(order), dtype=bool)
+    starts[1:] = ((sorted_groups[1:] != sorted_groups[:-1])
+                  | (np.diff(sorted_amounts) > sorted_amounts[:-1] * tolerance))
+    clusters = np.empty(len(order), dtype=np.int64)
+    clusters[order] = np.cumsum(starts) - 1
+    return clusters, int(starts.sum())
+
+
+def detect_recurring(columns, amount_tolerance=0.03, min_occurrences=3, max_jitter_days=3.0,
+                     period_tolerance=0.1):
+    """
+    :param columns: analytics.TransactionColumns
+    :param amount_tolerance: Relative step between amounts of one cluster
+    :param min_occurrences: Fewest payments that make a schedule
+    :param max_jitter_days: Largest standard deviation of the days between payments
+    :param period_tolerance: How far, relative, the mean interval may be from a standard period
+    :return: list of RecurringPayment, soonest next payment first. A payment is
+        active if it was last seen within two periods of the end of the history.
+    """
+    if not len(columns.ids):
+        return []
+    days = columns.dates.astype(np.int64)
+    groups = columns.category_codes.astype(np.int64) * 2 + columns.is_income
+    clusters, count = cluster_amounts(groups, columns.amount_cents, amount_tolerance)
+
+    # Rows in (cluster, date) order; intervals are taken between neighbours of one cluster.
+    order = np.lexsort((days, clusters))
+    clusters = clusters[order]
+    days = days[order]
+    same = clusters[1:] == clusters[:-1]
+    intervals = np.diff(days)[same].astype(np.float64)
+    interval_clusters = clusters[1:][same]
+
+    occurrences = np.bincount(clusters, minlength=count)
+    gaps = np.maximum(occurrences - 1, 1)
+    mean = np.bincount(interval_clusters, weights=intervals, minlength=count) / gaps
+    square = np.bincount(interval_clusters, weights=intervals ** 2, minlength=count) / gaps
+    spread = np.sqrt(np.maximum(square - mean ** 2, 0))
+
+    names = np.array(list(PERIODS))
+    lengths = np.array(list(PERIODS.values()))
+    nearest = np.abs(mean[:, None] - lengths).argmin(axis=1)
+    recurring = ((occurrences >= min_occurrences)
+                 & (np.abs(mean - lengths[nearest]) <= lengths[nearest] * period_tolerance)
+                 & (spread <= max_jitter_days))
+
+    firsts = np.flatnonzero(np.r_[True, ~same])
+    lasts = np.r_[firsts[1:] - 1, len(clusters) - 1]
+    amounts = np.bincount(clusters, weights=columns.amount_cents[order], minlength=count) / np.maximum(occurrences, 1)
+    group_of = groups[order][firsts]
+    end = days.max()
+
+    found = []
+    for cluster in np.flatnonzero(recurring):
+        interval = round(float(mean[cluster]), 1)
+        last = int(days[lasts[cluster]])
+        found.append(RecurringPayment(
+            type="income" if group_of[cluster] % 2 else "expense",
+            category=columns.categories[group_of[cluster] // 2],
+            amount=from_cents(int(round(amounts[cluster]))),
+            period=str(names[nearest[cluster]]),
+            interval_days=interval,
+            occurrences=int(occurrences[cluster]),
+            first_date=str(np.datetime64(int(days[firsts[cluster]]), "D")),
+            last_date=str(np.datetime64(last, "D")),
+            next_date=str(np.datetime64(last + round(interval), "D")),
+            active=bool(end - last <= 2 * interval),
+        ))
+    found.sort(key=lambda payment: payment.next_date)
+    return found
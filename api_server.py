@@ -0,0 +1,430 @@
+"""
+Local HTTP/JSON API over Auth and FinanceTracker, for sharing one tracker
+database between several people on a trusted network.
+
+    python api_server.py --host 127.0.0.1 --port 8765 --db data/finance.db
+
+Requests are parsed on an asyncio event loop; every call into Auth,
+FinanceTracker or DBManager runs on a bounded thread pool, so slow password
+hashing or exports never stall other clients. After ``POST /login`` clients
+send ``Authorization: Bearer <token>``; the session holds the user's unlocked
+data keys, so descriptions are encrypted and decrypted on the server.
+
+    POST /register              {"username", "password"}
+    POST /login                 {"username", "password"} -> {"token", "expires_in"}
+    POST /logout
+    POST /transactions          {"type", "category", "amount", "description", "date"} -> {"id"}
+    POST /transactions/batch    {"transactions": [...]} -> {"inserted", "errors"}
+    GET  /transactions          ?page_size&cursor&sort&order&type&category&date_from&date_to
+                                -> {"transactions", "cursor"}
+    GET  /summary
+    POST /exports/<kind>        kind is excel, csv, parquet or pdf -> {"path", "rows", "seconds"}
+    GET  /metrics               ?format=prometheus -> timing histograms (see instrumentation)
+"""
+import asyncio
+import base64
+import json
+import logging
+import secrets
+import time
+from concurrent.futures import ThreadPoolExecutor
+from decimal import Decimal
+from http import HTTPStatus
+from urllib.parse import parse_qsl, urlsplit
+
+import instrumentation
+import report_generator
+from auth import Auth
+from db_manager import DBManager, SORT_KEYS, TRANSACTION_COLUMNS
+from errors import (
+    InvalidCredentials, InvalidRegistration, InvalidTransaction, StorageError, UsernameTaken
+)
+from finance_tracker import FinanceTracker
+
+logger = logging.getLogger(__name__)
+
+MAX_BODY_BYTES = 16 * 1024 * 1024
+MAX_HEADER_LINES = 100
+EXPORTERS = {
+    "excel": report_generator.export_to_excel,
+    "csv": report_generator.export_to_csv,
+    "parquet": report_generator.export_to_parquet,
+    "pdf": report_generator.export_to_pdf,
+}
+
+# Service exceptions and the status codes they map to; checked in order.
+ERROR_STATUS = (
+    (InvalidCredentials, HTTPStatus.UNAUTHORIZED),
+    (UsernameTaken, HTTPStatus.CONFLICT),
+    (InvalidRegistration, HTTPStatus.BAD_REQUEST),
+    (InvalidTransaction, HTTPStatus.BAD_REQUEST),
+    (StorageError, HTTPStatus.INTERNAL_SERVER_ERROR),
+    (ValueError, HTTPStatus.BAD_REQUEST),
+)
+
+
+def _json_default(value):
+    # Money is Decimal; send it as a string so clients do not lose cents to floats.
+    if isinstance(value, Decimal):
+        return str(value)
+    raise TypeError(f"{type(value).__name__} is not JSON serializable")
+
+
+class HTTPError(Exception):
+    def __init__(self, status, message=None):
+        super().__init__(message or status.phrase)
+        self.status = status
+
+
+class SessionStore:
+    """
+    Bearer tokens for logged-in users. Only touched from the event loop.
+    :param ttl: Seconds a token stays valid after login
+    """
+
+    def __init__(self, ttl=3600):
+        self.ttl = ttl
+        self._sessions = {}
+
+    def create(self, username, keyring=None):
+        self._purge()
+        token = secrets.token_urlsafe(32)
+        self._sessions[token] = (username, keyring, time.monotonic() + self.ttl)
+        return token
+
+    def get(self, token):
+        """:return: (username, keyring) for a live token, or None"""
+        session = self._sessions.get(token)
+        if session is None:
+            return None
+        username, keyring, expires = session
+        if expires < time.monotonic():
+            del self._sessions[token]
+            return None
+        return username, keyring
+
+    def revoke(self, token):
+        self._sessions.pop(token, None)
+
+    def _purge(self):
+        now = time.monotonic()
+        for token in [token for token, (_, _, expires) in self._sessions.items() if expires < now]:
+            del self._sessions[token]
+
+
+def _log_failure(future):
+    if future.exception() is not None:
+        logger.warning("Background task failed: %s", future.exception())
+
+
+def encode_cursor(cursor):
+    if cursor is None:
+        return None
+    return base64.urlsafe_b64encode(json.dumps(cursor).encode()).decode("ascii")
+
+
+def decode_cursor(text, arity):
+    """
+    :param arity: Number of values in the sort key the cursor continues
+    :raises HTTPError: 400 unless the cursor is a flat list of that many strings, integers or nulls
+    """
+    if not text:
+        return None
+    try:
+        values = json.loads(base64.urlsafe_b64decode(text.encode("ascii")))
+    except (ValueError, TypeError):
+        raise HTTPError(HTTPStatus.BAD_REQUEST, "Invalid cursor")
+    if (not isinstance(values, list) or len(values) != arity
+            or not all(value is None or type(value) in (str, int) for value in values)):
+        raise HTTPError(HTTPStatus.BAD_REQUEST, "Invalid cursor")
+    return tuple(values)
+
+
+def _text_fields(data, *names):
+    """
+    :return: The named body fields, "" for missing ones
+    :raises HTTPError: 400 if any of them is not a string
+    """
+    values = [data.get(name, "") for name in names]
+    for name, value in zip(names, values):
+        if not isinstance(value, str):
+            raise HTTPError(HTTPStatus.BAD_REQUEST, f"{name} must be a string")
+    return values
+
+
+class Request:
+    def __init__(self, method, path, query, headers, body):
+        self.method = method
+        self.path = path
+        self.query = query
+        self.headers = headers
+        self.body = body
+        self.username = None
+        self.keyring = None
+
+    def json(self):
+        if not self.body:
+            return {}
+        try:
+            data = json.loads(self.body)
+        except ValueError:
+            raise HTTPError(HTTPStatus.BAD_REQUEST, "Request body is not valid JSON")
+        if not isinstance(data, dict):
+            raise HTTPError(HTTPStatus.BAD_REQUEST, "Request body must be a JSON object")
+        return data
+
+    @property
+    def token(self):
+        scheme, _, token = self.headers.get("authorization", "").partition(" ")
+        return token.strip() if scheme.lower() == "bearer" else None
+
+    @property
+    def keep_alive(self):
+        return self.headers.get("connection", "").lower() != "close"
+
+
+class ApiServer:
+    """
+    :param db_manager: Shared DBManager; a default one is opened if omitted
+    :param max_workers: Threads available for database, hashing and export work
+    :param session_ttl: Seconds a login token stays valid
+    :param export_dir: Where exports are written; defaults to $FINANCE_EXPORT_DIR or ~/Downloads
+    """
+
+    def __init__(self, db_manager=None, max_workers=8, session_ttl=3600, export_dir=None):
+        self.db_manager = db_manager or DBManager()
+        self.auth = Auth(self.db_manager)
+        self.sessions = SessionStore(session_ttl)
+        self.export_dir = export_dir
+        self.executor = ThreadPoolExecutor(max_workers=max_workers, thread_name_prefix="finance-api")
+        self.routes = {
+            ("POST", "/register"): (self.register, False),
+            ("POST", "/login"): (self.login, False),
+            ("POST", "/logout"): (self.logout, True),
+            ("POST", "/transactions"): (self.add_transaction, True),
+            ("POST", "/transactions/batch"): (self.add_transactions, True),
+            ("GET", "/transactions"): (self.get_transactions, True),
+            ("GET", "/summary"): (self.get_summary, True),
+            ("GET", "/metrics"): (self.metrics, False),
+        }
+        self._server = None
+
+    async def _call(self, fn, *args, **kwargs):
+        """Run blocking service code on the worker pool."""
+        loop = asyncio.get_running_loop()
+        return await loop.run_in_executor(self.executor, lambda: fn(*args, **kwargs))
+
+    def _tracker(self, request):
+        return FinanceTracker(request.username, self.db_manager, request.keyring)
+
+    # Handlers return (status, payload).
+
+    async def register(self, request):
+        username, password = _text_fields(request.json(), "username", "password")
+        await self._call(self.auth.register_user, username, password)
+        return HTTPStatus.CREATED, {"username": username}
+
+    async def login(self, request):
+        username, password = _text_fields(request.json(), "username", "password")
+        keyring = await self._call(self.auth.unlock_keys, username, password)
+        # Seal plaintext descriptions or finish a rotation without delaying the response.
+        tracker = FinanceTracker(username, self.db_manager, keyring)
+        self.executor.submit(tracker.reencrypt).add_done_callback(_log_failure)
+        return HTTPStatus.OK, {"token": self.sessions.create(username, keyring), "expires_in": self.sessions.ttl}
+
+    async def logout(self, request):
+        self.sessions.revoke(request.token)
+        return HTTPStatus.OK, {}
+
+    async def add_transaction(self, request):
+        data = request.json()
+        trans_id = await self._call(
+            self._tracker(request).add_transaction,
+            data.get("type"), data.get("category"), data.get("amount"), data.get("description") or "", data.get("date")
+        )
+        return HTTPStatus.CREATED, {"id": trans_id}
+
+    async def add_transactions(self, request):
+        items = request.json().get("transactions")
+        if not isinstance(items, list):
+            raise HTTPError(HTTPStatus.BAD_REQUEST, "transactions must be a list")
+        result = await self._call(self._tracker(request).add_transactions, items)
+        return HTTPStatus.OK, result
+
+    async def get_transactions(self, request):
+        query = request.query
+        try:
+            page_size = min(max(int(query.get("page_size", 100)), 1), 1000)
+        except ValueError:
+            raise HTTPError(HTTPStatus.BAD_REQUEST, "page_size must be an integer")
+        filters = {
+            name: query[name]
+            for name in ("type", "category", "date_from", "date_to", "amount_min", "amount_max") if query.get(name)
+        }
+        if query.get("q"):
+            # Search results page by id, newest first; sort and order do not apply.
+            rows, cursor = await self._call(
+                self._tracker(request).search_transactions,
+                query["q"], page_size, decode_cursor(query.get("cursor"), 1), filters
+            )
+        else:
+            sort_column = query.get("sort", "date")
+            if sort_column not in SORT_KEYS:
+                raise HTTPError(HTTPStatus.BAD_REQUEST, f"Cannot sort transactions by {sort_column!r}")
+            rows, cursor = await self._call(
+                self._tracker(request).get_transactions_page,
+                page_size, decode_cursor(query.get("cursor"), len(SORT_KEYS[sort_column])), filters,
+                sort_column, query.get("order", "desc") != "asc"
+            )
+        return HTTPStatus.OK, {
+            "transactions": [dict(zip(TRANSACTION_COLUMNS, row)) for row in rows],
+            "cursor": encode_cursor(cursor),
+        }
+
+    async def get_summary(self, request):
+        return HTTPStatus.OK, await self._call(self._tracker(request).get_summary)
+
+    async def export(self, request):
+        kind = request.path[len("/exports/"):]
+        exporter = EXPORTERS.get(kind)
+        if exporter is None:
+            raise HTTPError(HTTPStatus.NOT_FOUND, f"Unknown export format {kind!r}")
+        result = await self._call(
+            exporter, request.username, output_dir=self.export_dir, db_manager=self.db_manager,
+            cipher=request.keyring.cipher if request.keyring else None
+        )
+        if result is None:
+            return HTTPStatus.OK, {"path": None, "rows": 0, "seconds": 0}
+        return HTTPStatus.OK, {"path": result.path, "rows": result.rows, "seconds": result.seconds}
+
+    async def metrics(self, request):
+        """Operation names and timings only, no user data, so no session is needed."""
+        if request.query.get("format") == "prometheus" or "text/plain" in request.headers.get("accept", ""):
+            return HTTPStatus.OK, instrumentation.prometheus_text()
+        return HTTPStatus.OK, instrumentation.snapshot()
+
+    async def dispatch(self, request):
+        route = self.routes.get((request.method, request.path))
+        if route is None and request.method == "POST" and request.path.startswith("/exports/"):
+            route = (self.export, True)
+        if route is None:
+            raise HTTPError(HTTPStatus.NOT_FOUND)
+        handler, needs_session = route
+        if needs_session:
+            session = self.sessions.get(request.token)
+            if session is None:
+                raise HTTPError(HTTPStatus.UNAUTHORIZED, "Missing or expired session token")
+            request.username, request.keyring = session
+        return await handler(request)
+
+    async def _read_request(self, reader):
+        """:return: A Request, or None when the client closed the connection"""
+        request_line = await reader.readline()
+        if not request_line:
+            return None
+        try:
+            method, target, _ = request_line.decode("latin-1").split(" ", 2)
+        except ValueError:
+            raise HTTPError(HTTPStatus.BAD_REQUEST, "Malformed request line")
+        headers = {}
+        for _ in range(MAX_HEADER_LINES):
+            line = await reader.readline()
+            if line in (b"\r\n", b"\n", b""):
+                break
+            name, _, value = line.decode("latin-1").partition(":")
+            headers[name.strip().lower()] = value.strip()
+        else:
+            raise HTTPError(HTTPStatus.REQUEST_HEADER_FIELDS_TOO_LARGE)
+        length = int(headers.get("content-length") or 0)
+        if length > MAX_BODY_BYTES:
+            raise HTTPError(HTTPStatus.REQUEST_ENTITY_TOO_LARGE)
+        body = await reader.readexactly(length) if length else b""
+        url = urlsplit(target)
+        return Request(method.upper(), url.path.rstrip("/") or "/", dict(parse_qsl(url.query)), headers, body)
+
+    @staticmethod
+    def _write_response(writer, status, payload, keep_alive):
+        """A str payload is sent as plain text, anything else as JSON."""
+        if isinstance(payload, str):
+            body, content_type = payload.encode(), "text/plain; version=0.0.4; charset=utf-8"
+        else:
+            body, content_type = json.dumps(payload, default=_json_default).encode(), "application/json"
+        head = (
+            f"HTTP/1.1 {status.value} {status.phrase}\r\n"
+            f"Content-Type: {content_type}\r\n"
+            f"Content-Length: {len(body)}\r\n"
+            f"Connection: {'keep-alive' if keep_alive else 'close'}\r\n\r\n"
+        )
+        writer.write(head.encode("latin-1") + body)
+
+    async def handle_connection(self, reader, writer):
+        try:
+            while True:
+                keep_alive = False
+                try:
+                    request = await self._read_request(reader)
+                    if request is None:
+                        break
+                    keep_alive = request.keep_alive
+                    status, payload = await self.dispatch(request)
+                except HTTPError as e:
+                    status, payload = e.status, {"error": str(e)}
+                except (asyncio.IncompleteReadError, ConnectionError):
+                    break
+                except Exception as e:
+                    status = next(
+                        (code for error_type, code in ERROR_STATUS if isinstance(e, error_type)),
+                        HTTPStatus.INTERNAL_SERVER_ERROR
+                    )
+                    if status == HTTPStatus.INTERNAL_SERVER_ERROR:
+                        logger.exception("Request failed")
+                    payload = {"error": str(e)}
+                self._write_response(writer, status, payload, keep_alive)
+                await writer.drain()
+                if not keep_alive:
+                    break
+        except ConnectionError:
+            pass
+        finally:
+            writer.close()
+
+    async def start(self, host="127.0.0.1", port=8765):
+        self._server = await asyncio.start_server(self.handle_connection, host, port, backlog=1024)
+        logger.info("Listening on %s", ", ".join(str(sock.getsockname()) for sock in self._server.sockets))
+        return self._server
+
+    async def serve_forever(self, host="127.0.0.1", port=8765):
+        server = await self.start(host, port)
+        async with server:
+            await server.serve_forever()
+
+    def close(self):
+        if self._server is not None:
+            self._server.close()
+        self.executor.shutdown(wait=False)
+
+
+def main():
+    import argparse
+
+    parser = argparse.ArgumentParser(description="Serve the finance tracker over a local HTTP/JSON API.")
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=8765)
+    parser.add_argument("--db", default="data/finance.db")
+    parser.add_argument("--workers", type=int, default=8, help="Threads for database and hashing work")
+    parser.add_argument("--session-ttl", type=int, default=3600)
+    parser.add_argument("--export-dir", default=None)
+    args = parser.parse_args()
+
+    logging.basicConfig(level=logging.INFO, format="%(asctime)s %(name)s %(levelname)s %(message)s")
+    server = ApiServer(DBManager(args.db), args.workers, args.session_ttl, args.export_dir)
+    try:
+        asyncio.run(server.serve_forever(args.host, args.port))
+    except KeyboardInterrupt:
+        pass
+    finally:
+        server.close()
+
+
+if __name__ == "__main__":
+    main()
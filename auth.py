@@ -1,70 +1,125 @@
-import hashlib
+import logging
 import sqlite3
 from db_manager import DBManager
-from tkinter import messagebox  # To provide GUI feedback on actions
+from errors import InvalidCredentials, InvalidRegistration, StorageError, UsernameTaken
+from passwords import PasswordHasher, VerificationCache
+
+logger = logging.getLogger(__name__)
+
 
 class Auth:
-    def __init__(self):
-        self.db_manager = DBManager()
+    def __init__(self, db_manager=None, hasher=None, cache=None):
+        self._db_manager = db_manager
+        self.hasher = hasher or PasswordHasher.from_env()
+        self.cache = cache if cache is not None else VerificationCache()
+        # Checked against for unknown usernames; ready before the first login so
+        # that login costs one KDF run like any other.
+        self._dummy = self.hasher.dummy_hash()
+
+    @property
+    def db_manager(self):
+        """Opened on first use, so building the login window does not wait on database setup."""
+        if self._db_manager is None:
+            self._db_manager = DBManager()
+        return self._db_manager
 
     def hash_password(self, password):
-        """Hash a password using SHA-256."""
-        return hashlib.sha256(password.encode()).hexdigest()
+        """Hash a password with a salted KDF (see passwords.PasswordHasher)."""
+        return self.hasher.hash(password)
 
     def register_user(self, username, password):
         """
         Register a new user with a hashed password.
+        Runs the KDF, so call it from a worker thread.
         :param username: The desired username
         :param password: The password to be hashed and stored
-        :return: True if registration is successful, False if username exists
+        :return: True once the user is stored
+        :raises InvalidRegistration: If the username or password is empty, or the
+            username holds path separators, ".." or control characters
+        :raises UsernameTaken: If the username exists
+        :raises StorageError: If the database write fails
         """
+        if not username or not password:
+            raise InvalidRegistration("Username and password are required.")
+        # Usernames end up in export file names, and registration is open to API clients.
+        if "/" in username or "\\" in username or ".." in username or not username.isprintable():
+            raise InvalidRegistration("Usernames cannot contain slashes, '..' or control characters.")
         hashed_password = self.hash_password(password)
-        conn = self.db_manager.get_connection()
-        cursor = conn.cursor()
 
         try:
-            # Check if username already exists
-            cursor.execute("SELECT username FROM users WHERE username = ?", (username,))
-            if cursor.fetchone():
-                messagebox.showerror("Registration Failed", "Username already exists.")
-                return False
+            with self.db_manager.connection() as conn:
+                conn.execute("INSERT INTO users (username, password) VALUES (?, ?)", (username, hashed_password))
+        except sqlite3.IntegrityError:
+            raise UsernameTaken(f"Username {username!r} already exists.")
+        except sqlite3.Error as e:
+            raise StorageError(str(e)) from e
+        logger.info("Registered user %s", username)
+        return True
 
-            # Insert new user into the database
-            cursor.execute("INSERT INTO users (username, password) VALUES (?, ?)", (username, hashed_password))
-            conn.commit()
-            messagebox.showinfo("Success", "Registration successful! You can now log in.")
+    def verify_credentials(self, username, password):
+        """
+        Check a username/password pair without any UI side effects.
+        Runs the KDF, so call it from a worker thread. Hashes in a legacy or
+        outdated format are upgraded after a successful check.
+        :return: True if the password matches
+        :raises sqlite3.Error: If the lookup fails
+        """
+        with self.db_manager.connection() as conn:
+            row = conn.execute("SELECT password FROM users WHERE username = ?", (username,)).fetchone()
+        if not row:
+            # Spend the same KDF time as a real check so unknown usernames are not revealed by timing.
+            self.hasher.verify(password, self._dummy)
+            return False
+        stored = row[0]
+        if self.cache.check(username, password, stored):
             return True
-        except sqlite3.Error as e:
-            messagebox.showerror("Database Error", f"An error occurred: {e}")
+        if not self.hasher.verify(password, stored):
             return False
-        finally:
-            conn.close()
+
+        if self.hasher.needs_rehash(stored):
+            upgraded = self.hash_password(password)
+            with self.db_manager.connection() as conn:
+                # Only replace the hash that was verified, in case it changed meanwhile.
+                cursor = conn.execute(
+                    "UPDATE users SET password = ? WHERE username = ? AND password = ?",
+                    (upgraded, username, stored)
+                )
+            if cursor.rowcount:
+                stored = upgraded
+        self.cache.add(username, password, stored)
+        return True
 
     def login_user(self, username, password):
         """
         Log in a user by checking the hashed password.
         :param username: The username
         :param password: The plaintext password to verify
-        :return: True if login is successful, False otherwise
+        :return: True if login is successful
+        :raises InvalidCredentials: If the username is unknown or the password is wrong
+        :raises StorageError: If the lookup fails
         """
-        hashed_password = self.hash_password(password)
-        conn = self.db_manager.get_connection()
-        cursor = conn.cursor()
-
         try:
-            cursor.execute("SELECT password FROM users WHERE username = ?", (username,))
-            row = cursor.fetchone()
-
-            if row and row[0] == hashed_password:
-                messagebox.showinfo("Login Success", f"Welcome back, {username}!")
-                return True
-            else:
-                messagebox.showerror("Login Failed", "Invalid username or password.")
-                return False
+            ok = self.verify_credentials(username, password)
         except sqlite3.Error as e:
-            messagebox.showerror("Database Error", f"An error occurred: {e}")
-            return False
-        finally:
-            conn.close()
-
+            raise StorageError(str(e)) from e
+        if not ok:
+            logger.info("Failed login for %s", username)
+            raise InvalidCredentials("Invalid username or password.")
+        return True
 
+    def unlock_keys(self, username, password):
+        """
+        Log in and unlock the user's data keys for encrypted descriptions,
+        creating them on the first login. Runs the KDF twice, so call it from
+        a worker thread.
+        :return: encryption.KeyRing to pass to FinanceTracker
+        :raises InvalidCredentials: If the username is unknown or the password is wrong
+        :raises EncryptionError: If the stored keys cannot be unwrapped
+        :raises StorageError: If the database read or write fails
+        """
+        self.login_user(username, password)
+        from encryption import KeyRing  # Deferred: loads cryptography
+        try:
+            return KeyRing.unlock(self.db_manager, username, password, self.hasher.scrypt_params)
+        except sqlite3.Error as e:
+            raise StorageError(str(e)) from e
@@ -0,0 +1,369 @@
+"""
+Online snapshots and incremental backups of the finance database.
+
+Triggers append every insert, update and delete on users, transactions and
+user_keys to change_journal (migration 10): the table, the row's key and a
+sequence number that only grows. A copy remembers the sequence number it is
+up to date with, its checkpoint, so bringing it up to date means reading the
+keys journaled since then and copying just those rows as they are now, or
+deleting them where they are gone. Balances, rollups and the search index are
+not copied: the copy's own triggers maintain them as the rows arrive.
+
+* ``snapshot`` makes a full, consistent copy with SQLite's online backup API,
+  a few pages per step inside one read transaction, so the GUI and other
+  writers carry on while it runs.
+* ``sync_database`` replays the journal into a copy made by ``snapshot``.
+* ``backup_directory`` keeps a directory holding a base snapshot plus one
+  JSON-lines file of changed rows per run, and ``restore_directory`` turns
+  it back into a database.
+
+The journal grows with every write; ``prune_journal`` drops entries the
+copies have replayed. A copy whose checkpoint is older than the pruned
+entries needs a new snapshot.
+"""
+import json
+import logging
+import os
+import sqlite3
+import tempfile
+import time
+from collections import namedtuple
+
+from db_manager import DBManager
+from errors import BackupError
+from migrations import JOURNALED_TABLES, get_version
+
+logger = logging.getLogger(__name__)
+
+# Pages copied per backup step: 4 MiB with the default page size.
+SNAPSHOT_PAGES = 1024
+KEYS_PER_QUERY = 500
+MANIFEST = "manifest.json"
+
+SnapshotResult = namedtuple("SnapshotResult", ["path", "checkpoint", "pages", "seconds"])
+SyncResult = namedtuple("SyncResult", ["path", "from_seq", "to_seq", "upserted", "deleted", "seconds"])
+
+
+def database_id(conn):
+    """The random identity of a database, which copies record their checkpoints against."""
+    return conn.execute("SELECT value FROM journal_meta WHERE name = 'database_id'").fetchone()[0]
+
+
+def last_seq(conn):
+    """The newest sequence number ever journaled, including pruned entries."""
+    row = conn.execute("SELECT seq FROM sqlite_sequence WHERE name = 'change_journal'").fetchone()
+    return row[0] if row else 0
+
+
+def _pruned_through(conn):
+    return conn.execute("SELECT value FROM journal_meta WHERE name = 'pruned_through'").fetchone()[0]
+
+
+def checkpoint(conn, source_id):
+    """:return: How far the database on ``conn`` has replayed ``source_id``, or None"""
+    row = conn.execute("SELECT last_seq FROM sync_checkpoints WHERE source_id = ?", (source_id,)).fetchone()
+    return row[0] if row else None
+
+
+def _set_checkpoint(conn, source_id, seq):
+    conn.execute("""
+        INSERT INTO sync_checkpoints (source_id, last_seq) VALUES (?, ?)
+        ON CONFLICT (source_id) DO UPDATE SET last_seq = excluded.last_seq, synced_at = CURRENT_TIMESTAMP
+    """, (source_id, seq))
+
+
+def _columns(conn):
+    return {table: [row[1] for row in conn.execute(f"PRAGMA table_info({table})")] for table in JOURNALED_TABLES}
+
+
+def _write_file_atomically(path, write):
+    directory = os.path.dirname(os.path.abspath(path))
+    fd, temp_path = tempfile.mkstemp(prefix=f".{os.path.basename(path)}.", dir=directory)
+    try:
+        with os.fdopen(fd, "w", encoding="utf-8") as f:
+            write(f)
+        os.replace(temp_path, path)
+    except BaseException:
+        os.remove(temp_path)
+        raise
+
+
+def _copy_database(source, target_path, pages, progress=None):
+    """
+    Copy the database on ``source`` to a new file at ``target_path`` with the
+    backup API, stamped as a copy of the source with a checkpoint and given an
+    identity of its own.
+    :return: (checkpoint, pages copied)
+    """
+    directory = os.path.dirname(os.path.abspath(target_path))
+    os.makedirs(directory, exist_ok=True)
+    fd, temp_path = tempfile.mkstemp(prefix=f".{os.path.basename(target_path)}.", dir=directory)
+    os.close(fd)
+    total = [0]
+
+    def step(status, remaining, pages_total):
+        total[0] = pages_total
+        if progress:
+            progress(pages_total - remaining, pages_total)
+
+    try:
+        target = sqlite3.connect(temp_path)
+        try:
+            # A read transaction pins the copy to one moment. Without it SQLite
+            # restarts a stepped backup whenever another connection writes, which
+            # under a steady writer never finishes; with it, WAL lets the writers
+            # carry on meanwhile.
+            source.execute("BEGIN")
+            source.execute("SELECT COUNT(*) FROM sqlite_master").fetchone()
+            try:
+                source.backup(target, pages=pages, progress=step)
+            finally:
+                source.rollback()
+            seq = last_seq(target)
+            source_id = database_id(target)
+            target.execute("BEGIN IMMEDIATE")
+            # The copied journal is the source's history, not the copy's.
+            target.execute("DELETE FROM change_journal")
+            target.execute("UPDATE journal_meta SET value = ? WHERE name = 'pruned_through'", (seq,))
+            target.execute("UPDATE journal_meta SET value = lower(hex(randomblob(16))) WHERE name = 'database_id'")
+            _set_checkpoint(target, source_id, seq)
+            target.commit()
+        finally:
+            target.close()
+        os.replace(temp_path, target_path)
+    except BaseException:
+        for path in (temp_path, temp_path + "-wal", temp_path + "-shm"):
+            if os.path.exists(path):
+                os.remove(path)
+        raise
+    return seq, total[0]
+
+
+def snapshot(db_manager, target_path, pages=SNAPSHOT_PAGES, progress=None):
+    """
+    Write a consistent copy of the database to ``target_path`` while it stays in use.
+    :param pages: Pages copied per step; -1 copies everything in one step
+    :param progress: Optional callable(pages done, pages total) called after each step
+    :return: SnapshotResult
+    """
+    started = time.perf_counter()
+    source = db_manager.get_connection()
+    try:
+        seq, pages_copied = _copy_database(source, target_path, pages, progress)
+    finally:
+        db_manager.close_connection(source)
+    result = SnapshotResult(target_path, seq, pages_copied, time.perf_counter() - started)
+    logger.info("Snapshot of %d pages written to %s in %.2fs", result.pages, target_path, result.seconds)
+    return result
+
+
+def _changes(conn, after, until):
+    """
+    Rows journaled in (after, until], as they are now.
+    :return: Iterator of (table, key, row) with row None for deleted rows, tables in JOURNALED_TABLES order
+    """
+    keys = {table: {} for table in JOURNALED_TABLES}
+    for table, key in conn.execute(
+        "SELECT table_name, row_key FROM change_journal WHERE seq > ? AND seq <= ?", (after, until)
+    ):
+        keys[table][key] = None  # An ordered set
+    columns = _columns(conn)
+    for table, key_column in JOURNALED_TABLES.items():
+        table_keys = list(keys[table])
+        position = columns[table].index(key_column)
+        selected = ", ".join(columns[table])
+        for start in range(0, len(table_keys), KEYS_PER_QUERY):
+            chunk = table_keys[start:start + KEYS_PER_QUERY]
+            rows = conn.execute(
+                f"SELECT {selected} FROM {table} WHERE {key_column} IN ({', '.join('?' for _ in chunk)})", chunk
+            ).fetchall()
+            found = {row[position]: row for row in rows}
+            for key in chunk:
+                yield table, key, found.get(key)
+
+
+class _Replayer:
+    """Applies (table, key, row) changes to a copy; counts what it did."""
+
+    def __init__(self, conn, columns):
+        self.conn = conn
+        self.upserted = 0
+        self.deleted = 0
+        self._update = {}
+        self._insert = {}
+        self._delete = {}
+        # UPDATE, then INSERT when there was nothing to update. Neither INSERT OR
+        # REPLACE (deletes without firing the delete triggers) nor an upsert (its
+        # conflict clause overrides the INSERT OR IGNORE in the rollup triggers)
+        # keeps the copy's balances, rollups and search index right.
+        for table, key_column in JOURNALED_TABLES.items():
+            names = columns[table]
+            others = [name for name in names if name != key_column]
+            self._update[table] = (
+                f"UPDATE {table} SET {', '.join(f'{name} = ?' for name in others)} WHERE {key_column} = ?",
+                [names.index(name) for name in others] + [names.index(key_column)],
+            )
+            self._insert[table] = f"INSERT INTO {table} ({', '.join(names)}) VALUES ({', '.join('?' for _ in names)})"
+            self._delete[table] = f"DELETE FROM {table} WHERE {key_column} = ?"
+
+    def apply(self, table, key, row):
+        if row is None:
+            self.conn.execute(self._delete[table], (key,))
+            self.deleted += 1
+            return
+        update, order = self._update[table]
+        if not self.conn.execute(update, [row[index] for index in order]).rowcount:
+            self.conn.execute(self._insert[table], row)
+        self.upserted += 1
+
+
+def _check_replayable(conn, source_id, source_pruned, name):
+    """:return: The copy's checkpoint for ``source_id``"""
+    seq = checkpoint(conn, source_id)
+    if seq is None:
+        raise BackupError(f"{name} is not a copy of this database; take a snapshot first.")
+    if seq < source_pruned:
+        raise BackupError(f"The change journal was pruned past the checkpoint of {name}; take a new snapshot.")
+    return seq
+
+
+def sync_database(db_manager, target_path):
+    """
+    Bring a copy made by ``snapshot`` up to date with the journal since its checkpoint.
+    :return: SyncResult
+    :raises BackupError: If the copy is not of this database or the journal no longer reaches back to it
+    """
+    started = time.perf_counter()
+    target = DBManager(target_path)
+    with db_manager.connection() as source:
+        # One read transaction: the journal and the rows it points at are read at the same moment.
+        source.execute("BEGIN")
+        source_id, until = database_id(source), last_seq(source)
+        if get_version(source) != target.schema_version():
+            raise BackupError(f"{target_path} has a different schema version; take a new snapshot.")
+        with target.connection() as conn:
+            after = _check_replayable(conn, source_id, _pruned_through(source), target_path)
+            replayer = _Replayer(conn, _columns(source))
+            for change in _changes(source, after, until):
+                replayer.apply(*change)
+            _set_checkpoint(conn, source_id, max(after, until))
+    result = SyncResult(target_path, after, max(after, until), replayer.upserted, replayer.deleted,
+                        time.perf_counter() - started)
+    logger.info("Synced %s from %d to %d: %d rows copied, %d deleted in %.2fs", target_path, result.from_seq,
+                result.to_seq, result.upserted, result.deleted, result.seconds)
+    return result
+
+
+def _read_manifest(directory):
+    path = os.path.join(directory, MANIFEST)
+    if not os.path.exists(path):
+        return None
+    with open(path, encoding="utf-8") as f:
+        return json.load(f)
+
+
+def backup_directory(db_manager, directory, full=False, pages=SNAPSHOT_PAGES, progress=None):
+    """
+    Back up into ``directory``: a base snapshot on the first run (or with
+    ``full``), afterwards one changes-<from>-<to>.jsonl file of the rows
+    journaled since the previous run. manifest.json lists the files in order.
+    :return: SnapshotResult for a new base, else SyncResult
+    :raises BackupError: If the directory holds another database's backups, or
+        the journal was pruned past its checkpoint (run again with ``full``)
+    """
+    os.makedirs(directory, exist_ok=True)
+    manifest = None if full else _read_manifest(directory)
+    if manifest is None:
+        previous = _read_manifest(directory)
+        base = f"base-{time.strftime('%Y%m%dT%H%M%S')}.db"
+        result = snapshot(db_manager, os.path.join(directory, base), pages, progress)
+        with db_manager.connection() as conn:
+            source_id = database_id(conn)
+        manifest = {"source_id": source_id, "base": base, "checkpoint": result.checkpoint, "segments": []}
+        _write_file_atomically(os.path.join(directory, MANIFEST), lambda f: json.dump(manifest, f, indent=2))
+        if previous is not None:
+            for name in [previous["base"], *previous["segments"]]:
+                if name != base and os.path.exists(os.path.join(directory, name)):
+                    os.remove(os.path.join(directory, name))
+        return result
+
+    started = time.perf_counter()
+    with db_manager.connection() as source:
+        source.execute("BEGIN")
+        if database_id(source) != manifest["source_id"]:
+            raise BackupError(f"{directory} holds backups of another database.")
+        after, until = manifest["checkpoint"], last_seq(source)
+        if after < _pruned_through(source):
+            raise BackupError(f"The change journal was pruned past the checkpoint of {directory}; "
+                              "make a full backup.")
+        if until <= after:
+            return SyncResult(None, after, after, 0, 0, time.perf_counter() - started)
+        columns = _columns(source)
+        name = f"changes-{after + 1:012d}-{until:012d}.jsonl"
+        counts = {"upserted": 0, "deleted": 0}
+
+        def write(f):
+            header = {"source_id": manifest["source_id"], "from_seq": after, "to_seq": until,
+                      "schema_version": get_version(source), "columns": columns}
+            f.write(json.dumps(header) + "\n")
+            for table, key, row in _changes(source, after, until):
+                f.write(json.dumps([table, key, None if row is None else list(row)]) + "\n")
+                counts["deleted" if row is None else "upserted"] += 1
+
+        _write_file_atomically(os.path.join(directory, name), write)
+    manifest["checkpoint"] = until
+    manifest["segments"].append(name)
+    _write_file_atomically(os.path.join(directory, MANIFEST), lambda f: json.dump(manifest, f, indent=2))
+    result = SyncResult(os.path.join(directory, name), after, until, counts["upserted"], counts["deleted"],
+                        time.perf_counter() - started)
+    logger.info("Wrote %s: %d rows, %d deletions in %.2fs", name, result.upserted, result.deleted, result.seconds)
+    return result
+
+
+def restore_directory(directory, target_path, pages=SNAPSHOT_PAGES):
+    """
+    Rebuild a database at ``target_path`` from a backup directory: its base
+    snapshot with every changes file replayed in order.
+    :return: The restored database's checkpoint
+    :raises BackupError: If the directory holds no backup or its files do not follow on from each other
+    """
+    manifest = _read_manifest(directory)
+    if manifest is None:
+        raise BackupError(f"{directory} holds no backup.")
+    if os.path.exists(target_path):
+        raise BackupError(f"{target_path} already exists.")
+    base = sqlite3.connect(os.path.join(directory, manifest["base"]))
+    try:
+        _copy_database(base, target_path, pages)
+    finally:
+        base.close()
+
+    source_id = manifest["source_id"]
+    target = DBManager(target_path)
+    for name in manifest["segments"]:
+        with open(os.path.join(directory, name), encoding="utf-8") as f, target.connection() as conn:
+            header = json.loads(f.readline())
+            if header["from_seq"] != checkpoint(conn, source_id):
+                raise BackupError(f"{name} does not follow on from the files before it.")
+            replayer = _Replayer(conn, header["columns"])
+            for line in f:
+                table, key, row = json.loads(line)
+                replayer.apply(table, key, row)
+            _set_checkpoint(conn, source_id, header["to_seq"])
+    with target.connection() as conn:
+        return checkpoint(conn, source_id)
+
+
+def prune_journal(db_manager, through_seq):
+    """
+    Delete journal entries up to and including ``through_seq``, which every
+    copy kept up to date must already have replayed.
+    :return: Number of entries deleted
+    """
+    with db_manager.connection() as conn:
+        deleted = conn.execute("DELETE FROM change_journal WHERE seq <= ?", (through_seq,)).rowcount
+        conn.execute("""
+            UPDATE journal_meta SET value = MAX(value, ?) WHERE name = 'pruned_through'
+        """, (through_seq,))
+    logger.info("Pruned %d change journal entries through %d", deleted, through_seq)
+    return deleted
@@ -0,0 +1,171 @@
+"""
+Statements for every user, generated across a pool of worker processes.
+
+    python batch_reports.py --output-dir reports/2024-10 [--formats pdf xlsx] [--workers N] [--user NAME ...]
+
+The parent process opens the database once, which brings the schema up to
+date, and lists the users; every worker process then opens its own read-only
+DBManager and exports one user at a time, largest histories first so a big
+user does not start last and hold up the end of the run. Files are written
+atomically (see report_generator), so an interrupted run never leaves a
+truncated statement behind. Descriptions a user has encrypted cannot be opened
+without that user's password and appear as "[encrypted]".
+"""
+import argparse
+import logging
+import multiprocessing
+import os
+import time
+from collections import namedtuple
+from concurrent.futures import ProcessPoolExecutor, as_completed
+
+import report_generator
+from db_manager import DBManager
+from encryption import RedactingCipher
+
+EXPORTERS = {
+    "pdf": report_generator.export_to_pdf,
+    "xlsx": report_generator.export_to_excel,
+    "csv": report_generator.export_to_csv,
+    "parquet": report_generator.export_to_parquet,
+}
+
+logger = logging.getLogger(__name__)
+
+# Set in each worker process by _init_worker.
+_worker_db = None
+_worker_cipher = None
+
+
+class UserReport(namedtuple("UserReport", ["username", "results", "error", "seconds"])):
+    """
+    The exports of one user: ``results`` maps each finished format to its
+    ExportResult (None when there was nothing to export), and ``error``
+    describes the failure that stopped the rest, if any.
+    """
+
+    @property
+    def files(self):
+        return [result for result in self.results.values() if result is not None]
+
+
+class BatchSummary(namedtuple("BatchSummary", ["users", "empty", "files", "rows", "bytes", "seconds", "failures"])):
+    """Totals of a batch run; ``failures`` lists (username, error) pairs."""
+
+    @property
+    def rows_per_second(self):
+        return self.rows / self.seconds if self.seconds else float(self.rows)
+
+    @property
+    def users_per_second(self):
+        return self.users / self.seconds if self.seconds else float(self.users)
+
+
+def list_users(db_manager, usernames=None):
+    """
+    Usernames to report on, those with the most transactions first.
+    :param usernames: Optional subset to keep; names without an account are dropped
+    """
+    with db_manager.connection() as conn:
+        rows = conn.execute("""
+            SELECT u.username FROM users AS u LEFT JOIN user_balances AS b USING (username)
+            ORDER BY IFNULL(b.tx_count, 0) DESC, u.username
+        """).fetchall()
+    found = [username for (username,) in rows]
+    if usernames is None:
+        return found
+    wanted = set(usernames)
+    return [username for username in found if username in wanted]
+
+
+def _init_worker(db_path, profile):
+    global _worker_db, _worker_cipher
+    _worker_db = DBManager(db_path, profile, read_only=True)
+    _worker_cipher = RedactingCipher()
+
+
+def _export_user(username, formats, output_dir):
+    """Run in a worker: every requested export of one user. Errors are returned, not raised."""
+    started = time.perf_counter()
+    results = {}
+    try:
+        for name in formats:
+            results[name] = EXPORTERS[name](
+                username, output_dir=output_dir, db_manager=_worker_db, cipher=_worker_cipher
+            )
+    except Exception as e:
+        logger.exception("Reports for %s failed", username)
+        return UserReport(username, results, f"{type(e).__name__}: {e}", time.perf_counter() - started)
+    return UserReport(username, results, None, time.perf_counter() - started)
+
+
+def run_batch(db_path, output_dir, formats=("pdf",), workers=None, usernames=None, profile=None, on_report=None):
+    """
+    Export ``formats`` for every user (or ``usernames``) into ``output_dir``.
+    :param workers: Worker processes; defaults to the number of CPUs
+    :param on_report: Optional callable(UserReport) invoked as each user finishes
+    :return: BatchSummary
+    :raises ValueError: If a format is not one of EXPORTERS
+    """
+    unknown = [name for name in formats if name not in EXPORTERS]
+    if unknown:
+        raise ValueError(f"Unknown report format(s) {', '.join(unknown)}; choose from {', '.join(EXPORTERS)}")
+    started = time.perf_counter()
+    users = list_users(DBManager(db_path, profile), usernames)
+    os.makedirs(output_dir, exist_ok=True)
+
+    empty = files = rows = size = 0
+    failures = []
+    # Spawned rather than forked workers: a fork would copy the caller's open
+    # connections and any lock a writer or cache thread happens to hold.
+    context = multiprocessing.get_context("spawn")
+    with ProcessPoolExecutor(workers, context, _init_worker, (db_path, profile)) as executor:
+        futures = {executor.submit(_export_user, username, formats, output_dir): username for username in users}
+        for future in as_completed(futures):
+            try:
+                report = future.result()
+            except Exception as e:  # The worker itself died, e.g. BrokenProcessPool
+                report = UserReport(futures[future], {}, f"{type(e).__name__}: {e}", 0.0)
+            if report.error is not None:
+                failures.append((report.username, report.error))
+            elif not report.files:
+                empty += 1
+            for result in report.files:
+                files += 1
+                rows += result.rows
+                size += os.path.getsize(result.path)
+            if on_report:
+                on_report(report)
+    return BatchSummary(len(users), empty, files, rows, size, time.perf_counter() - started, failures)
+
+
+def print_summary(summary):
+    print(f"Reported on {summary.users:,} user(s) in {summary.seconds:.1f}s "
+          f"({summary.users_per_second:.1f} users/s): {summary.files:,} file(s), "
+          f"{summary.rows:,} rows ({summary.rows_per_second:,.0f} rows/s), {summary.bytes / 1e6:.1f} MB")
+    if summary.empty:
+        print(f"{summary.empty:,} user(s) had no transactions to report.")
+    if summary.failures:
+        print(f"{len(summary.failures):,} user(s) failed:")
+        for username, error in sorted(summary.failures):
+            print(f"  {username}: {error}")
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Generate reports for every user in parallel.")
+    parser.add_argument("--db", default="data/finance.db", help="Path to the finance database")
+    parser.add_argument("--output-dir", default=None,
+                        help="Directory for the reports; defaults to $FINANCE_EXPORT_DIR or ~/Downloads")
+    parser.add_argument("--formats", nargs="+", default=["pdf"], choices=list(EXPORTERS))
+    parser.add_argument("--workers", type=int, default=None, help="Worker processes; defaults to the CPU count")
+    parser.add_argument("--user", dest="users", action="append", help="Only report on this user (repeatable)")
+    args = parser.parse_args(argv)
+
+    summary = run_batch(args.db, args.output_dir or report_generator.default_output_dir(), args.formats,
+                        args.workers, args.users)
+    print_summary(summary)
+    return 1 if summary.failures else 0
+
+
+if __name__ == "__main__":
+    raise SystemExit(main())
@@ -0,0 +1,186 @@
+"""
+Vectorized analytics against per-row Python loops.
+
+    python benchmarks/bench_analytics.py --rows 1000000 --years 10
+
+Fills one user's history with random spending in a few dozen categories plus
+monthly subscriptions, a salary and a weekly fare, then times loading the
+history (typed columns against Transaction records) and computing budgets,
+recurring payments and the cash-flow forecast, each with the analytics
+package and with a straightforward loop over the rows. The two sides are
+checked to agree before any timing is printed.
+"""
+import argparse
+import os
+import random
+import sys
+import tempfile
+import time
+from collections import defaultdict
+from datetime import date, timedelta
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import analytics  # noqa: E402
+from analytics.recurring import PERIODS  # noqa: E402
+from db_manager import DBManager  # noqa: E402
+
+SUBSCRIPTIONS = [("Entertainment", 1599), ("Entertainment", 999), ("Utilities", 4500), ("Health", 3200)]
+
+
+def populate(db_manager, rows, years):
+    rng = random.Random(9)
+    start = date(2024 - years, 1, 1)
+    days = years * 365
+
+    def generate():
+        scheduled = 0
+        for month in range(years * 12):
+            first = date(start.year + month // 12, month % 12 + 1, 1)
+            for offset, (category, cents) in enumerate(SUBSCRIPTIONS):
+                yield "expense", category, cents, (first + timedelta(days=offset * 3 + 2)).isoformat()
+            yield "income", "Salary", 350_000, (first + timedelta(days=24)).isoformat()
+            scheduled += len(SUBSCRIPTIONS) + 1
+        for week in range(years * 52):
+            yield "expense", "Transport", 1240, (start + timedelta(weeks=week)).isoformat()
+            scheduled += 1
+        for _ in range(max(rows - scheduled, 0)):
+            yield ("income" if rng.random() < 0.05 else "expense", f"category {rng.randrange(40)}",
+                   rng.randrange(100, 50_000), (start + timedelta(days=rng.randrange(days))).isoformat())
+
+    with db_manager.connection() as conn:
+        conn.execute("INSERT INTO users (username, password) VALUES ('bench', '')")
+        conn.executemany("""
+            INSERT INTO transactions (username, type, category, amount_cents, description, date)
+            VALUES ('bench', ?, ?, ?, '', ?)
+        """, generate())
+
+
+def timed(fn):
+    started = time.perf_counter()
+    result = fn()
+    return result, (time.perf_counter() - started) * 1000
+
+
+def to_rows(columns):
+    """The columns as the plain per-row tuples the loop baselines walk over."""
+    return list(zip(
+        columns.is_income.tolist(), columns.categories[columns.category_codes].tolist(),
+        columns.amount_cents.tolist(), columns.dates.astype("datetime64[D]").tolist(),
+    ))
+
+
+def loop_budgets(rows, window):
+    totals = defaultdict(int)
+    months = set()
+    categories = set()
+    for is_income, category, cents, day in rows:
+        if is_income:
+            continue
+        month = (day.year, day.month)
+        totals[category, month] += cents
+        months.add(month)
+        categories.add(category)
+    first, last = min(months), max(months)
+    span = [(first[0] + (first[1] - 1 + i) // 12, (first[1] - 1 + i) % 12 + 1)
+            for i in range((last[0] - first[0]) * 12 + last[1] - first[1] + 1)]
+    actual, budget = [], []
+    for category in sorted(categories):
+        series = [totals[category, month] for month in span]
+        actual.append(series)
+        means = []
+        for index in range(len(series)):
+            previous = series[max(0, index - window):index]
+            means.append((2 * sum(previous) + len(previous)) // (2 * len(previous)) if previous else 0)
+        budget.append(means)
+    return actual, budget
+
+
+def loop_recurring(rows, tolerance=0.03, min_occurrences=3, max_jitter=3.0, period_tolerance=0.1):
+    groups = defaultdict(list)
+    for is_income, category, cents, day in rows:
+        groups[is_income, category].append((cents, day.toordinal()))
+    found = set()
+    for (is_income, category), items in groups.items():
+        items.sort()
+        clusters = [[items[0]]]
+        for previous, item in zip(items, items[1:]):
+            if item[0] - previous[0] > previous[0] * tolerance:
+                clusters.append([])
+            clusters[-1].append(item)
+        for cluster in clusters:
+            if len(cluster) < min_occurrences:
+                continue
+            days = sorted(day for _, day in cluster)
+            intervals = [b - a for a, b in zip(days, days[1:])]
+            mean = sum(intervals) / len(intervals)
+            spread = max(sum(i * i for i in intervals) / len(intervals) - mean * mean, 0) ** 0.5
+            name, length = min(PERIODS.items(), key=lambda period: abs(mean - period[1]))
+            if abs(mean - length) <= length * period_tolerance and spread <= max_jitter:
+                found.add((category, round(sum(c for c, _ in cluster) / len(cluster)), name, len(cluster)))
+    return found
+
+
+def loop_forecast(rows, months, history):
+    totals = defaultdict(lambda: [0, 0])
+    for is_income, _, cents, day in rows:
+        totals[day.year * 12 + day.month - 1][0 if is_income else 1] += cents
+    first, last = min(totals), max(totals)
+    series = [totals.get(month, [0, 0]) for month in range(first, last + 1)]
+    complete = len(series) - 1
+    fitted = series[max(0, complete - history):complete]
+    count = len(fitted)
+    projections = []
+    for column in (0, 1):
+        ys = [month[column] for month in fitted]
+        mean_x, mean_y = (count - 1) / 2, sum(ys) / count
+        slope = (sum((x - mean_x) * (y - mean_y) for x, y in enumerate(ys))
+                 / sum((x - mean_x) ** 2 for x in range(count)))
+        projections.append([max(round(mean_y + slope * (step - mean_x)), 0) for step in range(count, count + months)])
+    return projections
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--rows", type=int, default=1_000_000)
+    parser.add_argument("--years", type=int, default=10)
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as tmp:
+        db_manager = DBManager(os.path.join(tmp, "analytics.db"))
+        populate(db_manager, args.rows, args.years)
+        columns, load_ms = timed(lambda: analytics.load_columns(db_manager, "bench"))
+        _, records_ms = timed(lambda: list(db_manager.iter_transactions("bench", chunk_size=5000)))
+        db_manager.writer.close()
+    rows = to_rows(columns)
+
+    report, budgets_ms = timed(lambda: analytics.monthly_budgets(columns))
+    (actual, budget), loop_budgets_ms = timed(lambda: loop_budgets(rows, 3))
+    assert report.actual_cents.tolist() == actual and report.budget_cents.tolist() == budget
+
+    recurring, recurring_ms = timed(lambda: analytics.detect_recurring(columns))
+    expected, loop_recurring_ms = timed(lambda: loop_recurring(rows))
+    found = {(p.category, int(p.amount * 100), p.period, p.occurrences) for p in recurring}
+    assert found == expected, (found ^ expected)
+
+    forecast, forecast_ms = timed(lambda: analytics.forecast_cash_flow(columns, 12))
+    projections, loop_forecast_ms = timed(lambda: loop_forecast(rows, 12, 12))
+    for vectorized, looped in ((forecast.income_cents, projections[0]), (forecast.expense_cents, projections[1])):
+        assert all(abs(a - b) <= 1 for a, b in zip(vectorized.tolist(), looped)), (vectorized, looped)
+
+    print(f"{len(columns.ids):,} transactions, {len(columns.categories)} categories, "
+          f"{len(report.months)} months, {len(recurring)} recurring payments found")
+    print(f"{'':22} {'vectorized':>12} {'loop':>12} {'speedup':>9}")
+    for name, fast, slow in (
+        ("load history", load_ms, records_ms),
+        ("rolling budgets", budgets_ms, loop_budgets_ms),
+        ("recurring payments", recurring_ms, loop_recurring_ms),
+        ("cash-flow forecast", forecast_ms, loop_forecast_ms),
+    ):
+        print(f"{name:22} {fast:9.1f} ms {slow:9.1f} ms {slow / fast:8.1f}x")
+    print("load history: columns vs Transaction records through iter_transactions")
+    return 0
+
+
+if __name__ == "__main__":
+    raise SystemExit(main())
@@ -0,0 +1,182 @@
+"""
+Load test for api_server: many concurrent keep-alive clients, p50/p99 latency.
+
+    python benchmarks/bench_api.py --clients 200 --requests 50
+    python benchmarks/bench_api.py --url http://127.0.0.1:8765 --clients 300
+
+Without --url a server is started in-process on a temporary database. Each
+client logs in as one of --users accounts, then issues a mix of inserts,
+page reads and summary reads. Latency is reported per request type; logins
+are excluded. The in-process server shares the GIL with the clients, so use
+--url against a separately started server for representative numbers.
+"""
+import argparse
+import asyncio
+import json
+import os
+import random
+import statistics
+import sys
+import tempfile
+import threading
+import time
+from urllib.parse import urlsplit
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from api_server import ApiServer  # noqa: E402
+from db_manager import DBManager  # noqa: E402
+
+MIX = [("insert", 0.4), ("page", 0.4), ("summary", 0.2)]
+
+
+class Client:
+    """Minimal HTTP/1.1 keep-alive JSON client."""
+
+    def __init__(self, host, port):
+        self.host = host
+        self.port = port
+        self.reader = None
+        self.writer = None
+        self.token = None
+
+    async def connect(self):
+        self.reader, self.writer = await asyncio.open_connection(self.host, self.port)
+
+    async def request(self, method, path, payload=None):
+        body = json.dumps(payload).encode() if payload is not None else b""
+        headers = f"{method} {path} HTTP/1.1\r\nHost: {self.host}\r\nContent-Length: {len(body)}\r\n"
+        if self.token:
+            headers += f"Authorization: Bearer {self.token}\r\n"
+        self.writer.write(headers.encode() + b"\r\n" + body)
+        await self.writer.drain()
+
+        status = int((await self.reader.readline()).split()[1])
+        length = 0
+        while True:
+            line = await self.reader.readline()
+            if line in (b"\r\n", b""):
+                break
+            name, _, value = line.decode().partition(":")
+            if name.lower() == "content-length":
+                length = int(value)
+        data = json.loads(await self.reader.readexactly(length)) if length else None
+        return status, data
+
+    async def close(self):
+        self.writer.close()
+
+
+def percentile(samples, fraction):
+    ordered = sorted(samples)
+    return ordered[min(int(len(ordered) * fraction), len(ordered) - 1)]
+
+
+async def run_client(host, port, index, args, latencies, failures, logged_in, start):
+    rng = random.Random(index)
+    client = Client(host, port)
+    await client.connect()
+    user = f"load{index % args.users}"
+    status, data = await client.request("POST", "/login", {"username": user, "password": "load-password"})
+    logged_in.release()
+    if status != 200:
+        failures.append(f"login {status}")
+        await client.close()
+        return
+    client.token = data["token"]
+    # Logins pay the KDF; measure only once every client is connected and authenticated.
+    await start.wait()
+
+    for i in range(args.requests):
+        kind = rng.choices([name for name, _ in MIX], [weight for _, weight in MIX])[0]
+        started = time.perf_counter()
+        if kind == "insert":
+            status, _ = await client.request("POST", "/transactions", {
+                "type": rng.choice(["income", "expense"]), "category": rng.choice(["food", "rent", "pay"]),
+                "amount": round(rng.uniform(1, 500), 2), "description": f"load {index}/{i}",
+            })
+        elif kind == "page":
+            status, _ = await client.request("GET", "/transactions?page_size=50")
+        else:
+            status, _ = await client.request("GET", "/summary")
+        latencies.setdefault(kind, []).append((time.perf_counter() - started) * 1000)
+        if status >= 400:
+            failures.append(f"{kind} {status}")
+    await client.close()
+
+
+async def prepare_users(host, port, users):
+    client = Client(host, port)
+    await client.connect()
+    for i in range(users):
+        status, _ = await client.request("POST", "/register", {"username": f"load{i}", "password": "load-password"})
+        if status not in (201, 409):
+            raise RuntimeError(f"Could not register load{i}: HTTP {status}")
+    await client.close()
+
+
+async def load(host, port, args):
+    await prepare_users(host, port, args.users)
+    latencies = {}
+    failures = []
+    logged_in = asyncio.Semaphore(0)
+    start = asyncio.Event()
+    clients = asyncio.gather(*(
+        run_client(host, port, i, args, latencies, failures, logged_in, start) for i in range(args.clients)
+    ))
+    for _ in range(args.clients):
+        await logged_in.acquire()
+    started = time.perf_counter()
+    start.set()
+    await clients
+    return latencies, failures, time.perf_counter() - started
+
+
+def start_local_server(db_path, workers):
+    """Run an ApiServer on its own event loop thread; returns (host, port)."""
+    ready = threading.Event()
+    address = {}
+
+    def serve():
+        loop = asyncio.new_event_loop()
+        asyncio.set_event_loop(loop)
+        server = ApiServer(DBManager(db_path), max_workers=workers)
+        started = loop.run_until_complete(server.start("127.0.0.1", 0))
+        address["host"], address["port"] = started.sockets[0].getsockname()[:2]
+        ready.set()
+        loop.run_forever()
+
+    threading.Thread(target=serve, daemon=True).start()
+    ready.wait()
+    return address["host"], address["port"]
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--url", help="Target an already running server instead of starting one")
+    parser.add_argument("--clients", type=int, default=200)
+    parser.add_argument("--requests", type=int, default=50, help="Requests per client after login")
+    parser.add_argument("--users", type=int, default=10, help="Distinct accounts shared by the clients")
+    parser.add_argument("--workers", type=int, default=8, help="Worker threads for the in-process server")
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as tmp:
+        if args.url:
+            url = urlsplit(args.url)
+            host, port = url.hostname, url.port
+        else:
+            host, port = start_local_server(os.path.join(tmp, "api.db"), args.workers)
+        latencies, failures, elapsed = asyncio.run(load(host, port, args))
+
+    total = sum(len(samples) for samples in latencies.values())
+    print(f"clients={args.clients} requests={total} seconds={elapsed:.2f} req/s={total / elapsed:,.0f} "
+          f"failures={len(failures)}")
+    everything = [ms for samples in latencies.values() for ms in samples]
+    for kind, samples in sorted(latencies.items()) + [("all", everything)]:
+        print(f"  {kind:8} n={len(samples):6}  p50={statistics.median(samples):7.1f} ms  "
+              f"p99={percentile(samples, 0.99):7.1f} ms  max={max(samples):7.1f} ms")
+    return 1 if failures else 0
+
+
+if __name__ == "__main__":
+    raise SystemExit(main())
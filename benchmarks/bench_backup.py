@@ -0,0 +1,130 @@
+"""
+Full snapshots against incremental syncs, and what journaling costs writers.
+
+    python benchmarks/bench_backup.py --users 20 --transactions 20000 --changes 1000
+
+Fills a database with benchmarks/datagen.py, snapshots it, then makes
+--changes edits (half inserts, the rest updates and deletes) and brings
+copies up to date three ways: a new snapshot, backup.sync_database on the
+first snapshot, and a changes file from backup.backup_directory. The copies
+must match the source. Last, inserts are timed with and without the change
+journal triggers.
+"""
+import argparse
+import os
+import random
+import sqlite3
+import sys
+import tempfile
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import backup  # noqa: E402
+import datagen  # noqa: E402
+from db_manager import DBManager  # noqa: E402
+from migrations import JOURNALED_TABLES  # noqa: E402
+
+# user_balances.version counts each database's own writes, so it is left out.
+QUERIES = {
+    "users": "SELECT * FROM users ORDER BY id",
+    "transactions": "SELECT * FROM transactions ORDER BY id",
+    "user_balances": "SELECT username, total_income_cents, total_expenses_cents, tx_count FROM user_balances ORDER BY username",
+    "monthly_rollups": "SELECT * FROM monthly_rollups ORDER BY 1, 2, 3",
+}
+
+
+def contents(path):
+    conn = sqlite3.connect(path)
+    try:
+        return {table: conn.execute(query).fetchall() for table, query in QUERIES.items()}
+    finally:
+        conn.close()
+
+
+def edit(db_manager, names, changes, seed):
+    """Insert ``changes // 2`` rows, then update and delete existing ones."""
+    rng = random.Random(seed)
+    with db_manager.connection() as conn:
+        ids = [row[0] for row in conn.execute("SELECT id FROM transactions")]
+        touched = rng.sample(ids, changes - changes // 2)
+        half = len(touched) // 2
+        conn.executemany("""
+            INSERT INTO transactions (username, type, category, amount_cents, description, date)
+            VALUES (?, 'expense', 'Coffee', ?, 'Benchmark', '2024-06-01')
+        """, [(rng.choice(names), rng.randrange(100, 1000)) for _ in range(changes // 2)])
+        conn.executemany("UPDATE transactions SET amount_cents = amount_cents + 1, category = 'Dining' WHERE id = ?",
+                         [(row_id,) for row_id in touched[:half]])
+        conn.executemany("DELETE FROM transactions WHERE id = ?", [(row_id,) for row_id in touched[half:]])
+
+
+def insert_seconds(db_path, names, rows, journaled):
+    conn = sqlite3.connect(db_path)
+    try:
+        if not journaled:
+            for table in JOURNALED_TABLES:
+                for op in ("insert", "update", "delete"):
+                    conn.execute(f"DROP TRIGGER IF EXISTS trg_{table}_journal_{op}")
+        started = time.perf_counter()
+        for index in range(rows):
+            conn.execute("""
+                INSERT INTO transactions (username, type, category, amount_cents, description, date)
+                VALUES (?, 'expense', 'Coffee', 350, 'Benchmark', '2024-06-01')
+            """, (names[index % len(names)],))
+            conn.commit()
+        return time.perf_counter() - started
+    finally:
+        conn.close()
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--users", type=int, default=20)
+    parser.add_argument("--transactions", type=int, default=20_000, help="Transactions per user")
+    parser.add_argument("--changes", type=int, default=1000, help="Rows edited between backups")
+    parser.add_argument("--inserts", type=int, default=2000, help="Committed inserts timed for the journal cost")
+    parser.add_argument("--seed", type=int, default=0)
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as tmp:
+        source_path = os.path.join(tmp, "source.db")
+        db_manager = DBManager(source_path)
+        names = datagen.populate(db_manager, args.users, args.transactions, args.seed)
+        first = backup.snapshot(db_manager, os.path.join(tmp, "replica.db"))
+        backup.backup_directory(db_manager, os.path.join(tmp, "backups"))
+        size = os.path.getsize(first.path)
+
+        edit(db_manager, names, args.changes, args.seed)
+        again = backup.snapshot(db_manager, os.path.join(tmp, "again.db"))
+        synced = backup.sync_database(db_manager, first.path)
+        segment = backup.backup_directory(db_manager, os.path.join(tmp, "backups"))
+        segment_size = os.path.getsize(segment.path)
+        restored_path = os.path.join(tmp, "restored.db")
+        started = time.perf_counter()
+        backup.restore_directory(os.path.join(tmp, "backups"), restored_path)
+        restore_s = time.perf_counter() - started
+
+        expected = contents(source_path)
+        for path in (again.path, first.path, restored_path):
+            assert contents(path) == expected, path
+
+        journaled_s = insert_seconds(source_path, names, args.inserts, journaled=True)
+        plain_s = insert_seconds(source_path, names, args.inserts, journaled=False)
+        db_manager.writer.close()
+
+    rows = args.users * args.transactions
+    print(f"{rows:,} transactions, {size / 2**20:,.1f} MiB; {args.changes:,} rows changed")
+    print(f"{'new snapshot':28} {again.seconds * 1000:10.1f} ms {again.pages:10,} pages")
+    print(f"{'sync_database':28} {synced.seconds * 1000:10.1f} ms {synced.upserted + synced.deleted:10,} rows"
+          f" {again.seconds / synced.seconds:8.1f}x")
+    print(f"{'backup_directory segment':28} {segment.seconds * 1000:10.1f} ms"
+          f" {segment_size:10,} bytes")
+    print(f"{'restore (base + segment)':28} {restore_s * 1000:10.1f} ms")
+    print(f"{'insert with journal':28} {journaled_s / args.inserts * 1e6:10.1f} µs/row")
+    print(f"{'insert without journal':28} {plain_s / args.inserts * 1e6:10.1f} µs/row"
+          f" {(journaled_s / plain_s - 1) * 100:+8.1f}%")
+    return 0
+
+
+if __name__ == "__main__":
+    raise SystemExit(main())
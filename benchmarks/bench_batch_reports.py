@@ -0,0 +1,88 @@
+"""
+Batch statements across a process pool against one user at a time.
+
+    python benchmarks/bench_batch_reports.py --users 200 --rows 2000 --formats pdf xlsx --workers 4
+
+Fills a database with --users users of --rows transactions each, then writes
+every user's reports twice: in one process calling the report_generator
+exports user after user, and with batch_reports.run_batch over --workers
+read-only worker processes. Both runs must produce the same files and rows.
+"""
+import argparse
+import os
+import random
+import sys
+import tempfile
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import batch_reports  # noqa: E402
+from db_manager import DBManager  # noqa: E402
+
+CATEGORIES = ["Groceries", "Transport", "Dining", "Utilities", "Shopping", "Entertainment", "Health", "Travel"]
+
+
+def populate(db_manager, users, rows):
+    rng = random.Random(5)
+    names = [f"user{i:05d}" for i in range(users)]
+
+    def generate():
+        for name in names:
+            # Uneven histories, as in production: a few users hold most of the rows.
+            for _ in range(int(rows * rng.paretovariate(2.0) / 2)):
+                yield (name, "income" if rng.random() < 0.1 else "expense", rng.choice(CATEGORIES),
+                       rng.randrange(100, 100_000), f"Payment {rng.randrange(10_000)}",
+                       f"2024-{rng.randrange(1, 13):02d}-{rng.randrange(1, 29):02d}")
+
+    with db_manager.connection() as conn:
+        conn.executemany("INSERT INTO users (username, password) VALUES (?, '')", [(name,) for name in names])
+        conn.executemany("""
+            INSERT INTO transactions (username, type, category, amount_cents, description, date)
+            VALUES (?, ?, ?, ?, ?, ?)
+        """, generate())
+    return names
+
+
+def sequential(db_path, names, formats, output_dir):
+    files = rows = 0
+    for name in names:
+        for export in formats:
+            result = batch_reports.EXPORTERS[export](name, output_dir=output_dir, db_manager=DBManager(db_path))
+            if result is not None:
+                files += 1
+                rows += result.rows
+    return files, rows
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--users", type=int, default=200)
+    parser.add_argument("--rows", type=int, default=2000, help="Typical transactions per user")
+    parser.add_argument("--formats", nargs="+", default=["pdf"], choices=list(batch_reports.EXPORTERS))
+    parser.add_argument("--workers", type=int, default=os.cpu_count())
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as tmp:
+        db_path = os.path.join(tmp, "batch.db")
+        names = populate(DBManager(db_path), args.users, args.rows)
+
+        started = time.perf_counter()
+        files, rows = sequential(db_path, names, args.formats, os.path.join(tmp, "sequential"))
+        sequential_s = time.perf_counter() - started
+
+        summary = batch_reports.run_batch(db_path, os.path.join(tmp, "batch"), args.formats, args.workers)
+        assert (summary.files, summary.rows) == (files, rows), (summary, files, rows)
+        assert not summary.failures, summary.failures
+        leftovers = [name for name in os.listdir(os.path.join(tmp, "batch")) if name.startswith(".")]
+        assert not leftovers, leftovers
+
+    print(f"{len(names):,} users, {rows:,} rows, {files:,} files ({', '.join(args.formats)})")
+    print(f"{'one at a time':24} {sequential_s:8.2f} s {rows / sequential_s:12,.0f} rows/s")
+    print(f"{f'{args.workers} worker processes':24} {summary.seconds:8.2f} s {summary.rows_per_second:12,.0f} rows/s"
+          f" {sequential_s / summary.seconds:6.1f}x")
+    return 0
+
+
+if __name__ == "__main__":
+    raise SystemExit(main())
@@ -0,0 +1,91 @@
+"""
+Visual Insights cost as categories and history grow.
+
+    python benchmarks/bench_charts.py --rows 200000 --categories 20 2000 --years 2 40
+
+For each combination the script times reading the aggregated data, building
+the figure and drawing it with Agg, once with the reduced data the app plots
+(top categories plus "Other", binned periods) and once with every category and
+month, plus reopening the charts while the data version is unchanged.
+"""
+import argparse
+import os
+import random
+import sys
+import tempfile
+import time
+from datetime import date, timedelta
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import charts  # noqa: E402
+from db_manager import DBManager  # noqa: E402
+
+
+def populate(db_manager, rows, categories, years):
+    rng = random.Random(5)
+    start = date(2024 - years, 1, 1)
+    days = years * 365
+
+    def generate():
+        for _ in range(rows):
+            yield (
+                "bench", "income" if rng.random() < 0.2 else "expense", f"category {rng.randrange(categories)}",
+                rng.randrange(100, 200_000), "", (start + timedelta(days=rng.randrange(days))).isoformat(),
+            )
+
+    with db_manager.connection() as conn:
+        conn.execute("INSERT INTO users (username, password) VALUES ('bench', '')")
+        conn.executemany("""
+            INSERT INTO transactions (username, type, category, amount_cents, description, date)
+            VALUES (?, ?, ?, ?, ?, ?)
+        """, generate())
+
+
+def timed(fn):
+    started = time.perf_counter()
+    result = fn()
+    return result, (time.perf_counter() - started) * 1000
+
+
+def render(data):
+    from matplotlib.backends.backend_agg import FigureCanvasAgg
+
+    figure, build_ms = timed(lambda: charts.build_figure(data))
+    _, draw_ms = timed(lambda: FigureCanvasAgg(figure).draw())
+    return build_ms, draw_ms
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--rows", type=int, default=200_000)
+    parser.add_argument("--categories", type=int, nargs="+", default=[20, 2000])
+    parser.add_argument("--years", type=int, nargs="+", default=[2, 40])
+    args = parser.parse_args()
+
+    import matplotlib
+    matplotlib.use("Agg")
+
+    print(f"{'categories':>10} {'years':>5}  {'variant':8} {'load':>9} {'build':>9} {'draw':>9}")
+    for categories in args.categories:
+        for years in args.years:
+            with tempfile.TemporaryDirectory() as tmp:
+                db_manager = DBManager(os.path.join(tmp, "charts.db"))
+                populate(db_manager, args.rows, categories, years)
+
+                reduced, load_ms = timed(lambda: charts.load_chart_data(db_manager, "bench"))
+                full = charts.load_chart_data(db_manager, "bench", max_categories=10 ** 9, max_periods=10 ** 9)
+                for name, data in (("reduced", reduced), ("full", full)):
+                    build_ms, draw_ms = render(data)
+                    print(f"{categories:10} {years:5}  {name:8} {load_ms:7.1f}ms {build_ms:7.1f}ms {draw_ms:7.1f}ms")
+
+                cache = charts.ChartCache()
+                charts.insights_figure(db_manager, "bench", cache)
+                _, reopen_ms = timed(lambda: charts.insights_figure(db_manager, "bench", cache))
+                print(f"{categories:10} {years:5}  {'reopen':8} {reopen_ms:7.1f}ms  (cached figure, version unchanged)")
+                db_manager.writer.close()
+    return 0
+
+
+if __name__ == "__main__":
+    raise SystemExit(main())
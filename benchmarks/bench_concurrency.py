@@ -0,0 +1,138 @@
+"""
+Reader/writer concurrency on one database file, per durability profile.
+
+    python benchmarks/bench_concurrency.py --seconds 5 --writers 2 --writer-threads 4 --readers 2
+
+Separate processes stand in for the Qt app, the tkinter app and an import
+script. Writer processes insert single transactions from several threads,
+either each committing on its own ("direct") or through the group-commit
+writer ("group"). Reader processes page through transactions and read
+summaries. Each scenario starts from a fresh database; "legacy" is the
+rollback-journal configuration used before WAL.
+"""
+import argparse
+import multiprocessing
+import os
+import sys
+import tempfile
+import threading
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from db_manager import DBManager  # noqa: E402
+from finance_tracker import INSERT_TRANSACTION, FinanceTracker  # noqa: E402
+
+SCENARIOS = [
+    ("legacy", "direct"),
+    ("balanced", "direct"),
+    ("balanced", "group"),
+    ("safe", "direct"),
+    ("safe", "group"),
+    ("fast", "group"),
+]
+
+
+def _percentile(samples, fraction):
+    ordered = sorted(samples)
+    return ordered[min(int(len(ordered) * fraction), len(ordered) - 1)] if ordered else 0.0
+
+
+def writer_process(db_path, profile, mode, threads, seconds, results):
+    db_manager = DBManager(db_path, profile)
+    latencies = []
+    errors = []
+    deadline = time.perf_counter() + seconds
+
+    def work(worker):
+        i = 0
+        while time.perf_counter() < deadline:
+            row = (f"user{worker % 4}", "expense", "groceries", 999, f"item {i}", None, "2024-05-01")
+            started = time.perf_counter()
+            try:
+                if mode == "group":
+                    db_manager.writer.execute(INSERT_TRANSACTION, row)
+                else:
+                    with db_manager.connection() as conn:
+                        conn.execute(INSERT_TRANSACTION, row)
+                latencies.append(time.perf_counter() - started)
+            except Exception as e:
+                errors.append(str(e))
+            i += 1
+
+    pool = [threading.Thread(target=work, args=(n,)) for n in range(threads)]
+    for thread in pool:
+        thread.start()
+    for thread in pool:
+        thread.join()
+    results.put(("write", latencies, errors))
+
+
+def reader_process(db_path, profile, seconds, results):
+    tracker = FinanceTracker("user0", DBManager(db_path, profile))
+    latencies = []
+    errors = []
+    deadline = time.perf_counter() + seconds
+    while time.perf_counter() < deadline:
+        started = time.perf_counter()
+        try:
+            tracker.get_transactions_page(page_size=100)
+            tracker.get_summary()
+            latencies.append(time.perf_counter() - started)
+        except Exception as e:
+            errors.append(str(e))
+    results.put(("read", latencies, errors))
+
+
+def run_scenario(profile, mode, args):
+    with tempfile.TemporaryDirectory(dir=args.dir) as tmp:
+        db_path = os.path.join(tmp, "concurrency.db")
+        DBManager(db_path, profile)  # create and migrate before the clock starts
+        ctx = multiprocessing.get_context("spawn")
+        results = ctx.Queue()
+        processes = [
+            ctx.Process(target=writer_process, args=(db_path, profile, mode, args.writer_threads, args.seconds, results))
+            for _ in range(args.writers)
+        ] + [
+            ctx.Process(target=reader_process, args=(db_path, profile, args.seconds, results))
+            for _ in range(args.readers)
+        ]
+        for process in processes:
+            process.start()
+        collected = [results.get() for _ in processes]
+        for process in processes:
+            process.join()
+
+    summary = {}
+    for kind in ("write", "read"):
+        latencies = [ms * 1000 for k, samples, _ in collected if k == kind for ms in samples]
+        errors = [e for k, _, errs in collected if k == kind for e in errs]
+        summary[kind] = (len(latencies) / args.seconds, _percentile(latencies, 0.5), _percentile(latencies, 0.99), errors)
+    return summary
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--seconds", type=float, default=5)
+    parser.add_argument("--writers", type=int, default=2, help="Writer processes")
+    parser.add_argument("--writer-threads", type=int, default=4, help="Threads per writer process")
+    parser.add_argument("--readers", type=int, default=2, help="Reader processes")
+    parser.add_argument("--dir", default=None,
+                        help="Directory for the database; use a real disk, tmpfs hides fsync costs")
+    args = parser.parse_args()
+
+    print(f"{'profile':9} {'writes':7} {'writes/s':>9} {'w p50':>8} {'w p99':>8} {'w err':>6} "
+          f"{'reads/s':>9} {'r p50':>8} {'r p99':>8} {'r err':>6}")
+    for profile, mode in SCENARIOS:
+        result = run_scenario(profile, mode, args)
+        w_rate, w_p50, w_p99, w_errors = result["write"]
+        r_rate, r_p50, r_p99, r_errors = result["read"]
+        print(f"{profile:9} {mode:7} {w_rate:9,.0f} {w_p50:7.2f}ms {w_p99:7.1f}ms {len(w_errors):6} "
+              f"{r_rate:9,.0f} {r_p50:7.2f}ms {r_p99:7.1f}ms {len(r_errors):6}")
+        for error in sorted(set(w_errors + r_errors))[:3]:
+            print(f"          error: {error}")
+    return 0
+
+
+if __name__ == "__main__":
+    raise SystemExit(main())
@@ -0,0 +1,129 @@
+"""
+Cost of encrypting transaction descriptions, against the same work in plaintext.
+
+    python benchmarks/bench_encryption.py --rows 20000 --check
+
+Measures single inserts, a 200-row page read where only the rows on screen
+(--visible) have their description read, the same page with every description
+read, bulk imports, the background re-encryption pass and unlocking the keys
+at login. With --check the script exits non-zero when encryption adds more
+than its budget to an insert or to an on-screen page read. The budgets are
+absolute: a Fernet token costs roughly 10 microseconds either way, which is a
+large fraction of a sub-millisecond query but far below a frame of UI time.
+"""
+import argparse
+import os
+import statistics
+import sys
+import tempfile
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from db_manager import DBManager  # noqa: E402
+from encryption import KeyRing  # noqa: E402
+from finance_tracker import FinanceTracker  # noqa: E402
+from passwords import SCRYPT_DEFAULTS  # noqa: E402
+
+INSERT_OVERHEAD_BUDGET_MS = 0.1
+PAGE_OVERHEAD_BUDGET_MS = 1.0
+PAGE_SIZE = 200
+# Cheap scrypt for the benchmark users; unlocking with the real cost is timed separately.
+FAST_SCRYPT = {"n": 2 ** 10, "r": 8, "p": 1}
+
+
+def make_rows(count, offset=0):
+    return [
+        ("expense" if i % 5 else "income", f"category {i % 12}", f"{(i % 5000) + 1}.{i % 100:02d}",
+         f"Card payment {offset + i} at merchant {i % 300}", f"2024-{(i % 12) + 1:02d}-{(i % 28) + 1:02d}")
+        for i in range(count)
+    ]
+
+
+def median_ms(fn, repeat):
+    samples = []
+    for _ in range(repeat):
+        started = time.perf_counter()
+        fn()
+        samples.append((time.perf_counter() - started) * 1000)
+    return statistics.median(samples)
+
+
+def read_page(tracker, visible):
+    # Straight to DBManager: repeated pages through the tracker would be served by its query cache.
+    rows, _ = tracker.db_manager.get_transactions_page(tracker.username, PAGE_SIZE, cipher=tracker.cipher)
+    for row in rows[:visible]:
+        row.description
+
+
+def measure(tracker, args):
+    results = {}
+    results["insert"] = median_ms(
+        lambda: tracker.add_transaction("expense", "coffee", "3.20", "Flat white at the corner shop"), args.inserts
+    )
+    results["page, on screen"] = median_ms(lambda: read_page(tracker, args.visible), args.repeat)
+    results["page, all rows"] = median_ms(lambda: read_page(tracker, PAGE_SIZE), args.repeat)
+    started = time.perf_counter()
+    tracker.add_transactions(make_rows(args.bulk, offset=args.rows))
+    results["bulk rows/s"] = args.bulk / (time.perf_counter() - started)
+    return results
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--rows", type=int, default=20_000, help="History size per user")
+    parser.add_argument("--inserts", type=int, default=500, help="Single inserts timed per user")
+    parser.add_argument("--bulk", type=int, default=10_000, help="Rows in the timed bulk import")
+    parser.add_argument("--repeat", type=int, default=200, help="Page reads timed per variant")
+    parser.add_argument("--visible", type=int, default=30, help="Rows of a page that are on screen")
+    parser.add_argument("--check", action="store_true", help="Exit non-zero when a budget is exceeded")
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as tmp:
+        db_manager = DBManager(os.path.join(tmp, "encryption.db"))
+        with db_manager.connection() as conn:
+            conn.executemany("INSERT INTO users (username, password) VALUES (?, '')", [("plain",), ("sealed",)])
+
+        plain = FinanceTracker("plain", db_manager)
+        sealed = FinanceTracker("sealed", db_manager, KeyRing.unlock(db_manager, "sealed", "pw", FAST_SCRYPT))
+        plain.add_transactions(make_rows(args.rows))
+        sealed.add_transactions(make_rows(args.rows))
+
+        plain_results = measure(plain, args)
+        sealed_results = measure(sealed, args)
+
+        # Rotation re-encrypts the whole history in the background.
+        started = time.perf_counter()
+        sealed.rotate_key()
+        rotated = args.rows + args.bulk + args.inserts
+        reencrypt_rate = rotated / (time.perf_counter() - started)
+
+        with db_manager.connection() as conn:
+            conn.execute("INSERT INTO users (username, password) VALUES ('login', '')")
+        KeyRing.unlock(db_manager, "login", "pw", SCRYPT_DEFAULTS)
+        unlock_ms = median_ms(lambda: KeyRing.unlock(db_manager, "login", "pw"), 5)
+        db_manager.writer.close()
+
+    print(f"{'':18} {'plaintext':>12} {'encrypted':>12} {'overhead':>18}")
+    for name in plain_results:
+        before, after = plain_results[name], sealed_results[name]
+        if name.endswith("/s"):
+            # Throughput falls as cost rises, so its overhead is the ratio inverted.
+            print(f"{name:18} {before:12,.0f} {after:12,.0f} {before / after - 1:+18.0%}")
+        else:
+            print(f"{name:18} {before:9.3f} ms {after:9.3f} ms {after - before:+9.3f} ms {after / before - 1:+5.0%}")
+    print(f"re-encryption      {reencrypt_rate:,.0f} rows/s")
+    print(f"unlock at login    {unlock_ms:.1f} ms (scrypt n={SCRYPT_DEFAULTS['n']})")
+
+    failures = []
+    for name, budget in (("insert", INSERT_OVERHEAD_BUDGET_MS), ("page, on screen", PAGE_OVERHEAD_BUDGET_MS)):
+        overhead = sealed_results[name] - plain_results[name]
+        if overhead > budget:
+            failures.append(f"{name} overhead {overhead:.3f} ms exceeds the {budget} ms budget")
+    for failure in failures:
+        print(f"FAIL: {failure}")
+    return 1 if args.check and failures else 0
+
+
+if __name__ == "__main__":
+    raise SystemExit(main())
@@ -0,0 +1,105 @@
+"""
+Query plans and timings for the transactions indexes.
+
+Builds a throwaway database at schema version 1 (no indexes), runs the hot
+queries, then applies the remaining migrations and runs them again.
+
+    python benchmarks/bench_indexes.py --rows 1000000 --users 200
+"""
+import argparse
+import os
+import random
+import sqlite3
+import sys
+import tempfile
+import time
+from datetime import date, timedelta
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from migrations import migrate  # noqa: E402
+
+CATEGORIES = ["groceries", "rent", "salary", "utilities", "dining", "transport", "freelance", "health"]
+
+QUERIES = {
+    "recent transactions": (
+        "SELECT id, type, category, {amount}, description, date FROM transactions "
+        "WHERE username = ? ORDER BY date DESC LIMIT 50"
+    ),
+    "income total": "SELECT SUM({amount}) FROM transactions WHERE username = ? AND type = 'income'",
+    "expense total": "SELECT SUM({amount}) FROM transactions WHERE username = ? AND type = 'expense'",
+    "full history": (
+        "SELECT id, type, category, {amount}, description, date FROM transactions "
+        "WHERE username = ? ORDER BY date DESC"
+    ),
+}
+
+
+def populate(conn, rows, users):
+    rng = random.Random(42)
+    start = date(2015, 1, 1)
+
+    def generate():
+        for _ in range(rows):
+            trans_type = "income" if rng.random() < 0.2 else "expense"
+            yield (
+                f"user{rng.randrange(users)}",
+                trans_type,
+                rng.choice(CATEGORIES),
+                round(rng.uniform(1, 2000), 2),
+                "",
+                (start + timedelta(days=rng.randrange(3650))).isoformat(),
+            )
+
+    conn.executemany("""
+        INSERT INTO transactions (username, type, category, amount, description, date)
+        VALUES (?, ?, ?, ?, ?, ?)
+    """, generate())
+    conn.commit()
+
+
+def run_queries(conn, username, repeat):
+    # Schema version 5 replaced the REAL amount column with integer amount_cents.
+    columns = {row[1] for row in conn.execute("PRAGMA table_info(transactions)")}
+    amount = "amount_cents" if "amount_cents" in columns else "amount"
+    for name, template in QUERIES.items():
+        sql = template.format(amount=amount)
+        plan = conn.execute(f"EXPLAIN QUERY PLAN {sql}", (username,)).fetchall()
+        started = time.perf_counter()
+        for _ in range(repeat):
+            conn.execute(sql, (username,)).fetchall()
+        elapsed_ms = (time.perf_counter() - started) * 1000 / repeat
+        print(f"  {name:<22} {elapsed_ms:9.3f} ms")
+        for row in plan:
+            print(f"      {row[-1]}")
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--rows", type=int, default=1_000_000)
+    parser.add_argument("--users", type=int, default=200)
+    parser.add_argument("--repeat", type=int, default=5)
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as tmp:
+        conn = sqlite3.connect(os.path.join(tmp, "bench.db"))
+        migrate(conn, target=1)
+        started = time.perf_counter()
+        populate(conn, args.rows, args.users)
+        print(f"Inserted {args.rows} rows in {time.perf_counter() - started:.1f}s")
+
+        print("\nWithout indexes (schema version 1):")
+        run_queries(conn, "user7", args.repeat)
+
+        started = time.perf_counter()
+        version = migrate(conn)
+        conn.execute("ANALYZE")
+        print(f"\nMigrated to version {version} in {time.perf_counter() - started:.1f}s")
+
+        print("\nWith indexes:")
+        run_queries(conn, "user7", args.repeat)
+        conn.close()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,71 @@
+"""
+Cost of password hashing for a range of work factors, to pick KDF settings.
+
+    python benchmarks/bench_kdf.py --target-ms 250
+
+Prints the time per hash for each scrypt N and PBKDF2 iteration count, the
+largest setting that fits the target, and the cost of a login served from the
+verification cache. Set FINANCE_KDF / FINANCE_SCRYPT_N /
+FINANCE_PBKDF2_ITERATIONS to apply a choice.
+"""
+import argparse
+import os
+import statistics
+import sys
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from passwords import PasswordHasher, VerificationCache  # noqa: E402
+
+SCRYPT_N = [2 ** 12, 2 ** 13, 2 ** 14, 2 ** 15, 2 ** 16, 2 ** 17]
+PBKDF2_ITERATIONS = [100_000, 200_000, 400_000, 600_000, 1_000_000]
+
+
+def time_hasher(hasher, repeat):
+    stored = hasher.hash("correct horse battery staple")
+    samples = []
+    for _ in range(repeat):
+        started = time.perf_counter()
+        hasher.verify("correct horse battery staple", stored)
+        samples.append((time.perf_counter() - started) * 1000)
+    return statistics.median(samples)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--target-ms", type=float, default=250, help="Acceptable time for one verification")
+    parser.add_argument("--repeat", type=int, default=3)
+    args = parser.parse_args()
+
+    best = {}
+    print("scheme          setting      ms/verify")
+    for n in SCRYPT_N:
+        ms = time_hasher(PasswordHasher("scrypt", n=n), args.repeat)
+        print(f"scrypt          N={n:<9} {ms:9.1f}")
+        if ms <= args.target_ms:
+            best["scrypt"] = f"FINANCE_KDF=scrypt FINANCE_SCRYPT_N={n}"
+    for iterations in PBKDF2_ITERATIONS:
+        ms = time_hasher(PasswordHasher("pbkdf2_sha256", iterations=iterations), args.repeat)
+        print(f"pbkdf2_sha256   i={iterations:<9} {ms:9.1f}")
+        if ms <= args.target_ms:
+            best["pbkdf2_sha256"] = f"FINANCE_KDF=pbkdf2_sha256 FINANCE_PBKDF2_ITERATIONS={iterations}"
+
+    cache = VerificationCache()
+    cache.add("bench", "secret", "stored-hash")
+    started = time.perf_counter()
+    for _ in range(10_000):
+        cache.check("bench", "secret", "stored-hash")
+    cached_us = (time.perf_counter() - started) / 10_000 * 1_000_000
+    print(f"cached re-auth: {cached_us:.1f} us")
+
+    print(f"Strongest settings within {args.target_ms:g} ms:")
+    for scheme, setting in best.items():
+        print(f"  {setting}")
+    if not best:
+        print("  none; raise --target-ms")
+    return 0
+
+
+if __name__ == "__main__":
+    raise SystemExit(main())
@@ -0,0 +1,75 @@
+"""
+Time and memory for rendering a PDF statement.
+
+    python benchmarks/bench_pdf.py --rows 100000 --max-seconds 120 --max-mb 512
+
+Exits non-zero when a budget is exceeded.
+"""
+import argparse
+import os
+import random
+import sys
+import tempfile
+import time
+import tracemalloc
+from datetime import date, timedelta
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from db_manager import DBManager  # noqa: E402
+from finance_tracker import FinanceTracker  # noqa: E402
+from report_generator import export_to_pdf  # noqa: E402
+
+CATEGORIES = ["groceries", "rent", "salary", "utilities", "dining", "transport", "freelance", "health"]
+
+
+def generate(rows):
+    rng = random.Random(42)
+    start = date(2018, 1, 1)
+    for i in range(rows):
+        yield (
+            "income" if rng.random() < 0.2 else "expense",
+            rng.choice(CATEGORIES),
+            round(rng.uniform(1, 2000), 2),
+            f"Payment reference {i:08d}",
+            (start + timedelta(days=rng.randrange(2000))).isoformat(),
+        )
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--rows", type=int, default=100_000)
+    parser.add_argument("--max-seconds", type=float, default=None)
+    parser.add_argument("--max-mb", type=float, default=None)
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as tmp:
+        db_manager = DBManager(os.path.join(tmp, "bench.db"))
+        FinanceTracker("bench", db_manager).add_transactions(generate(args.rows), batch_size=10_000)
+
+        started = time.perf_counter()
+        result = export_to_pdf("bench", output_dir=tmp, db_manager=db_manager)
+        elapsed = time.perf_counter() - started
+
+        # Second pass for memory; tracemalloc slows rendering down too much to time it.
+        tracemalloc.start()
+        export_to_pdf("bench", output_dir=tmp, db_manager=db_manager)
+        peak_mb = tracemalloc.get_traced_memory()[1] / 1024 / 1024
+        tracemalloc.stop()
+
+        size_mb = os.path.getsize(result.path) / 1024 / 1024
+        print(f"rows={result.rows} seconds={elapsed:.2f} rows/s={result.rows / elapsed:,.0f} "
+              f"peak_mb={peak_mb:.1f} file_mb={size_mb:.1f}")
+
+    failed = False
+    if args.max_seconds is not None and elapsed > args.max_seconds:
+        print(f"FAIL: {elapsed:.2f}s exceeds the {args.max_seconds}s budget")
+        failed = True
+    if args.max_mb is not None and peak_mb > args.max_mb:
+        print(f"FAIL: peak {peak_mb:.1f} MB exceeds the {args.max_mb} MB budget")
+        failed = True
+    return 1 if failed else 0
+
+
+if __name__ == "__main__":
+    raise SystemExit(main())
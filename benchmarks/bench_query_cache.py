@@ -0,0 +1,100 @@
+"""
+Dashboard reads with and without the query result cache.
+
+    python benchmarks/bench_query_cache.py --rows 100000 --reads 2000 --write-every 50
+
+Replays the reads the Qt and tkinter front ends repeat (summary, first page of
+transactions, category totals, monthly totals) for one user, with a write by
+another user and, every --write-every reads, a write by the user itself.
+"Uncached" calls the queries directly; "cached" goes through FinanceTracker
+and its QueryCache. Hit/miss counters are printed from the cache itself.
+"""
+import argparse
+import os
+import random
+import statistics
+import sys
+import tempfile
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from aggregations import category_totals, monthly_totals, summary_totals  # noqa: E402
+from db_manager import DBManager  # noqa: E402
+from finance_tracker import FinanceTracker  # noqa: E402
+
+
+def populate(db_manager, rows):
+    rng = random.Random(11)
+    with db_manager.connection() as conn:
+        conn.executemany("INSERT INTO users (username, password) VALUES (?, '')", [("reader",), ("other",)])
+        conn.executemany("""
+            INSERT INTO transactions (username, type, category, amount_cents, description, date)
+            VALUES (?, ?, ?, ?, '', ?)
+        """, (
+            (rng.choice(["reader", "other"]), rng.choice(["income", "expense"]), f"category {rng.randrange(30)}",
+             rng.randrange(100, 100_000), f"20{rng.randrange(10, 24)}-{rng.randrange(1, 13):02d}-15")
+            for _ in range(rows)
+        ))
+
+
+def uncached_reads(db_manager, username):
+    return [
+        lambda: summary_totals(db_manager, username),
+        lambda: db_manager.get_transactions_page(username, 200),
+        lambda: category_totals(db_manager, username),
+        lambda: monthly_totals(db_manager, username),
+    ]
+
+
+def cached_reads(tracker):
+    return [tracker.get_summary, lambda: tracker.get_transactions_page(200), tracker.get_category_totals,
+            tracker.get_monthly_totals]
+
+
+def run(reads, reader, other, args):
+    samples = []
+    for i in range(args.reads):
+        if i % 10 == 0:
+            other.add_transaction("expense", "noise", "1.00")
+        if args.write_every and i % args.write_every == 0:
+            reader.add_transaction("expense", "coffee", "3.50")
+        read = reads[i % len(reads)]
+        started = time.perf_counter()
+        read()
+        samples.append((time.perf_counter() - started) * 1000)
+    return samples
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--rows", type=int, default=100_000)
+    parser.add_argument("--reads", type=int, default=2000)
+    parser.add_argument("--write-every", type=int, default=50, help="Reads between the user's own writes; 0 for none")
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as tmp:
+        db_manager = DBManager(os.path.join(tmp, "cache.db"))
+        populate(db_manager, args.rows)
+        reader = FinanceTracker("reader", db_manager)
+        other = FinanceTracker("other", db_manager)
+
+        results = {
+            "uncached": run(uncached_reads(db_manager, "reader"), reader, other, args),
+            "cached": run(cached_reads(reader), reader, other, args),
+        }
+        stats = db_manager.cache.stats()
+        db_manager.writer.close()
+
+    for name, samples in results.items():
+        ordered = sorted(samples)
+        print(f"{name:9} mean {statistics.mean(samples):7.3f} ms  p50 {statistics.median(samples):7.3f} ms  "
+              f"p99 {ordered[int(len(ordered) * 0.99)]:7.3f} ms  total {sum(samples):8.1f} ms")
+    lookups = stats.hits + stats.misses
+    print(f"cache: {stats.hits} hits, {stats.misses} misses ({stats.hits / lookups:.0%} hit ratio), "
+          f"{stats.invalidated} invalidated, {stats.expired} expired, {stats.evicted} evicted, {stats.size} entries")
+    return 0
+
+
+if __name__ == "__main__":
+    raise SystemExit(main())
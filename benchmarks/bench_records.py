@@ -0,0 +1,77 @@
+"""
+Memory per row and fetch speed: REAL amounts as tuples vs. integer cents as
+records.Transaction.
+
+    python benchmarks/bench_records.py --rows 200000
+"""
+import argparse
+import os
+import random
+import sqlite3
+import sys
+import time
+import tracemalloc
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from records import Transaction  # noqa: E402
+
+CATEGORIES = ["groceries", "rent", "salary", "utilities", "dining", "transport"]
+
+
+def build(conn, rows):
+    rng = random.Random(3)
+    conn.execute("CREATE TABLE t (id INTEGER PRIMARY KEY, type TEXT, category TEXT, amount REAL, "
+                 "amount_cents INTEGER, description TEXT, date TEXT)")
+    data = []
+    for i in range(rows):
+        cents = rng.randrange(100, 200_000)
+        data.append((i, rng.choice(["income", "expense"]), rng.choice(CATEGORIES), cents / 100, cents,
+                     "", f"2024-{rng.randint(1, 12):02d}-{rng.randint(1, 28):02d}"))
+    conn.executemany("INSERT INTO t VALUES (?, ?, ?, ?, ?, ?, ?)", data)
+
+
+def fetch(conn, sql, row_factory=None):
+    cursor = conn.execute(sql)
+    if row_factory:
+        cursor.row_factory = row_factory
+    return cursor.fetchall()
+
+
+def measure(conn, sql, row_factory=None):
+    """:return: (rows, bytes retained, seconds); timed without tracemalloc running"""
+    started = time.perf_counter()
+    fetch(conn, sql, row_factory)
+    elapsed = time.perf_counter() - started
+    tracemalloc.start()
+    rows = fetch(conn, sql, row_factory)
+    size = tracemalloc.get_traced_memory()[0]
+    tracemalloc.stop()
+    return rows, size, elapsed
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--rows", type=int, default=200_000)
+    args = parser.parse_args()
+
+    conn = sqlite3.connect(":memory:")
+    build(conn, args.rows)
+
+    results = {}
+    rows, size, elapsed = measure(conn, "SELECT id, type, category, amount, description, date FROM t")
+    results["tuple + float"] = (size, elapsed, sum(row[3] for row in rows))
+    del rows
+    rows, size, elapsed = measure(
+        conn, "SELECT id, type, category, amount_cents, description, date FROM t", Transaction.from_row
+    )
+    results["Transaction"] = (size, elapsed, sum(row.amount_cents for row in rows) / 100)
+    del rows
+
+    for name, (size, elapsed, total) in results.items():
+        print(f"{name:14} {size / args.rows:6.1f} bytes/row  fetch {elapsed * 1000:8.1f} ms  total {total!r}")
+    return 0
+
+
+if __name__ == "__main__":
+    raise SystemExit(main())
@@ -0,0 +1,158 @@
+"""
+Full-text search latency over a large transaction history.
+
+    python benchmarks/bench_search.py --rows 1000000 --sealed-rows 50000 --check
+
+Fills one database with --rows plaintext transactions spread over several
+users, plus --sealed-rows for a user whose descriptions are encrypted and
+searched through the blind index. Times first pages of common and rare
+prefixes, multi-word queries, queries combined with type, amount and date
+filters, and a deep page reached by following cursors, against a
+``LIKE '%word%'`` scan of the same user's rows. With --check the script
+exits non-zero when the median of any search exceeds --budget milliseconds.
+"""
+import argparse
+import os
+import random
+import statistics
+import sys
+import tempfile
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import search  # noqa: E402
+from db_manager import DBManager  # noqa: E402
+from encryption import KeyRing  # noqa: E402
+from finance_tracker import FinanceTracker  # noqa: E402
+
+USERS = ["alice", "bob", "carol", "dave"]
+MERCHANTS = ["Tesco", "Sainsbury", "Amazon", "Starbucks", "Shell", "Uber", "Netflix", "Spotify", "Ikea", "Boots",
+             "Pret", "Waitrose", "Aldi", "Lidl", "Costa", "Deliveroo", "Trainline", "Apple", "Vodafone", "Octopus"]
+WORDS = ["card", "payment", "online", "refund", "monthly", "subscription", "groceries", "coffee", "fuel",
+         "transfer", "contactless", "order", "ticket", "bill", "energy", "mobile", "store", "market"]
+CATEGORIES = ["Groceries", "Transport", "Dining", "Utilities", "Shopping", "Entertainment", "Health", "Travel"]
+PAGE_SIZE = 100
+# Cheap scrypt for the benchmark user; unlocking cost is measured by bench_encryption.
+FAST_SCRYPT = {"n": 2 ** 10, "r": 8, "p": 1}
+
+
+def make_description(rng, serial):
+    return (f"{rng.choice(WORDS).capitalize()} {rng.choice(WORDS)} {rng.choice(MERCHANTS)} "
+            f"ref{serial} {rng.choice(WORDS)}")
+
+
+def populate(db_manager, rows):
+    rng = random.Random(3)
+
+    def generate():
+        for i in range(rows):
+            yield (
+                rng.choice(USERS), "income" if rng.random() < 0.1 else "expense", rng.choice(CATEGORIES),
+                rng.randrange(100, 100_000), make_description(rng, i),
+                f"20{rng.randrange(14, 25)}-{rng.randrange(1, 13):02d}-{rng.randrange(1, 29):02d}",
+            )
+
+    with db_manager.connection() as conn:
+        conn.executemany("INSERT INTO users (username, password) VALUES (?, '')", [(user,) for user in USERS])
+        conn.executemany("""
+            INSERT INTO transactions (username, type, category, amount_cents, description, date)
+            VALUES (?, ?, ?, ?, ?, ?)
+        """, generate())
+
+
+def populate_sealed(db_manager, rows):
+    rng = random.Random(4)
+    with db_manager.connection() as conn:
+        conn.execute("INSERT INTO users (username, password) VALUES ('sealed', '')")
+    tracker = FinanceTracker("sealed", db_manager, KeyRing.unlock(db_manager, "sealed", "pw", FAST_SCRYPT))
+    tracker.add_transactions(
+        ("expense", rng.choice(CATEGORIES), f"{rng.randrange(1, 1000)}.00", make_description(rng, i),
+         f"2024-{rng.randrange(1, 13):02d}-15")
+        for i in range(rows)
+    )
+    return tracker
+
+
+def median_ms(fn, repeat):
+    samples = []
+    for _ in range(repeat):
+        started = time.perf_counter()
+        fn()
+        samples.append((time.perf_counter() - started) * 1000)
+    return statistics.median(samples)
+
+
+def cursor_before_page(db_manager, username, query, page):
+    """The cursor that fetches page number ``page`` (1-based) of a search."""
+    cursor = None
+    for _ in range(page - 1):
+        _, cursor = search.search_transactions(db_manager, username, query, PAGE_SIZE, cursor)
+    return cursor
+
+
+def like_scan(db_manager, username, word):
+    with db_manager.connection() as conn:
+        return conn.execute(
+            "SELECT id FROM transactions WHERE username = ? AND description LIKE ? ORDER BY id DESC LIMIT ?",
+            (username, f"%{word}%", PAGE_SIZE)
+        ).fetchall()
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--rows", type=int, default=1_000_000, help="Plaintext rows over all users")
+    parser.add_argument("--sealed-rows", type=int, default=50_000, help="Rows of the encrypted user")
+    parser.add_argument("--repeat", type=int, default=20)
+    parser.add_argument("--budget", type=float, default=50.0, help="Median milliseconds allowed per search")
+    parser.add_argument("--check", action="store_true", help="Exit non-zero when a search exceeds the budget")
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as tmp:
+        db_manager = DBManager(os.path.join(tmp, "search.db"))
+        started = time.perf_counter()
+        populate(db_manager, args.rows)
+        print(f"indexed {args.rows:,} rows in {time.perf_counter() - started:.1f} s")
+        started = time.perf_counter()
+        sealed = populate_sealed(db_manager, args.sealed_rows)
+        print(f"sealed and indexed {args.sealed_rows:,} rows in {time.perf_counter() - started:.1f} s")
+
+        deep = cursor_before_page(db_manager, "alice", "card", 20)
+        # Search straight through the module: the tracker's query cache would serve repeats.
+        cases = {
+            "common prefix 'ca'": lambda: search.search_transactions(db_manager, "alice", "ca", PAGE_SIZE),
+            "word 'starbucks'": lambda: search.search_transactions(db_manager, "alice", "starbucks", PAGE_SIZE),
+            "rare 'ref12345'": lambda: search.search_transactions(db_manager, "alice", "ref12345", PAGE_SIZE),
+            "two words": lambda: search.search_transactions(db_manager, "alice", "coffee tesco", PAGE_SIZE),
+            "with filters": lambda: search.search_transactions(
+                db_manager, "alice", "card", PAGE_SIZE,
+                filters={"type": "income", "amount_min": "100", "amount_max": "500", "date_from": "2020-01-01"}
+            ),
+            "page 20 of 'card'": lambda: search.search_transactions(db_manager, "alice", "card", PAGE_SIZE, deep),
+            "sealed 'starb'": lambda: search.search_transactions(
+                db_manager, "sealed", "starb", PAGE_SIZE, cipher=sealed.cipher,
+                term_token=sealed.keyring.term_token
+            ),
+            "sealed two words": lambda: search.search_transactions(
+                db_manager, "sealed", "coffee tesco", PAGE_SIZE, cipher=sealed.cipher,
+                term_token=sealed.keyring.term_token
+            ),
+        }
+        results = {name: median_ms(case, args.repeat) for name, case in cases.items()}
+        baseline = median_ms(lambda: like_scan(db_manager, "alice", "ref12345"), max(1, args.repeat // 4))
+        consistent = db_manager.verify_search_index()
+        db_manager.writer.close()
+
+    for name, ms in results.items():
+        print(f"{name:22} {ms:9.3f} ms")
+    print(f"{'LIKE scan (baseline)':22} {baseline:9.3f} ms")
+    print(f"index consistent: {consistent}")
+
+    failures = [f"{name} took {ms:.3f} ms" for name, ms in results.items() if ms > args.budget]
+    for failure in failures:
+        print(f"FAIL: {failure} (budget {args.budget} ms)")
+    return 1 if args.check and (failures or not consistent) else 0
+
+
+if __name__ == "__main__":
+    raise SystemExit(main())
@@ -0,0 +1,110 @@
+"""
+Throughput of the headless service layer (Auth, FinanceTracker).
+
+    python benchmarks/bench_service.py --logins 200 --inserts 20000 --threads 4
+
+Reports logins per second with the configured KDF (cold) and from the
+verification cache (warm), and inserts per second for single add_transaction
+calls and for add_transactions batches. No GUI or stdout work is involved.
+"""
+import argparse
+import os
+import sys
+import tempfile
+import time
+from concurrent.futures import ThreadPoolExecutor
+from datetime import date, timedelta
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from auth import Auth  # noqa: E402
+from db_manager import DBManager  # noqa: E402
+from errors import InvalidCredentials  # noqa: E402
+from finance_tracker import FinanceTracker  # noqa: E402
+from passwords import VerificationCache  # noqa: E402
+
+
+def rate(count, seconds):
+    return count / seconds if seconds else float("inf")
+
+
+def run_parallel(fn, count, threads):
+    started = time.perf_counter()
+    if threads <= 1:
+        for i in range(count):
+            fn(i)
+    else:
+        with ThreadPoolExecutor(max_workers=threads) as pool:
+            list(pool.map(fn, range(count)))
+    return time.perf_counter() - started
+
+
+def bench_logins(db_manager, count, threads, users=20):
+    auth = Auth(db_manager, cache=VerificationCache(max_entries=users, ttl=3600))
+    for i in range(users):
+        auth.register_user(f"user{i}", f"password{i}")
+
+    def login(i):
+        auth.login_user(f"user{i % users}", f"password{i % users}")
+
+    def bad_login(i):
+        try:
+            auth.login_user(f"user{i % users}", "wrong")
+        except InvalidCredentials:
+            pass
+
+    auth.cache.clear()
+    cold = run_parallel(lambda i: (auth.cache.clear(), login(i)), count, threads)
+    run_parallel(login, users, 1)  # fill the cache
+    warm = run_parallel(login, count, threads)
+    failed = run_parallel(bad_login, count, threads)
+    return {
+        "kdf": f"{auth.hasher.scheme} {auth.hasher.scrypt_params if auth.hasher.scheme == 'scrypt' else auth.hasher.iterations}",
+        "cold_logins_per_s": rate(count, cold),
+        "cached_logins_per_s": rate(count, warm),
+        "failed_logins_per_s": rate(count, failed),
+    }
+
+
+def bench_inserts(db_manager, count, threads):
+    start = date(2020, 1, 1)
+    tracker = FinanceTracker("bench", db_manager)
+
+    def insert(i):
+        tracker.add_transaction("expense", "groceries", 12.5, f"item {i}", (start + timedelta(days=i % 1000)).isoformat())
+
+    single = run_parallel(insert, count, threads)
+
+    rows = [
+        ("income" if i % 5 == 0 else "expense", "groceries", 12.5, f"item {i}", (start + timedelta(days=i % 1000)).isoformat())
+        for i in range(count)
+    ]
+    started = time.perf_counter()
+    tracker.add_transactions(rows, batch_size=1000)
+    batched = time.perf_counter() - started
+    return {
+        "single_inserts_per_s": rate(count, single),
+        "batched_inserts_per_s": rate(count, batched),
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--logins", type=int, default=200)
+    parser.add_argument("--inserts", type=int, default=20_000)
+    parser.add_argument("--threads", type=int, default=1)
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as tmp:
+        db_manager = DBManager(os.path.join(tmp, "bench.db"))
+        results = bench_logins(db_manager, args.logins, args.threads)
+        results.update(bench_inserts(db_manager, args.inserts, args.threads))
+
+    print(f"threads={args.threads}")
+    for name, value in results.items():
+        print(f"{name:24} {value:,.0f}" if isinstance(value, float) else f"{name:24} {value}")
+    return 0
+
+
+if __name__ == "__main__":
+    raise SystemExit(main())
@@ -0,0 +1,138 @@
+"""
+Cold-start benchmark for the Qt entry point.
+
+Measures, each in a fresh interpreter:
+  * ``python -X importtime -c "import main"``: total and the slowest imports
+  * time from interpreter start to the first paint of LoginWindow
+
+and checks that pandas, matplotlib, fpdf and cryptography were not imported on the way.
+
+    python benchmarks/bench_startup.py --runs 5 --check
+
+With --check the script exits non-zero when a budget is exceeded or a
+deferred module was loaded, so it can gate CI.
+"""
+import argparse
+import json
+import os
+import statistics
+import subprocess
+import sys
+
+REPO = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+IMPORT_BUDGET_MS = 400
+FIRST_PAINT_BUDGET_MS = 1500
+DEFERRED_MODULES = ("pandas", "matplotlib", "fpdf", "openpyxl", "numpy", "cryptography")
+
+FIRST_PAINT_SCRIPT = r"""
+import json, sys, time
+from PyQt5.QtCore import QEvent, QObject, QTimer
+from PyQt5.QtWidgets import QApplication
+import main
+
+class PaintWatcher(QObject):
+    painted_at = None
+    def eventFilter(self, obj, event):
+        if event.type() == QEvent.Paint and self.painted_at is None:
+            self.painted_at = time.perf_counter()
+            QTimer.singleShot(0, app.quit)
+        return False
+
+app = QApplication(sys.argv)
+window = main.LoginWindow(main.Auth())
+watcher = PaintWatcher()
+window.installEventFilter(watcher)
+window.show()
+QTimer.singleShot(5000, app.quit)
+app.exec_()
+print(json.dumps({
+    "first_paint": watcher.painted_at,
+    "loaded": [name for name in sys.modules if name.split(".")[0] in %(deferred)r],
+}))
+"""
+
+
+def _env():
+    env = dict(os.environ)
+    env.setdefault("QT_QPA_PLATFORM", "offscreen")
+    env["PYTHONPATH"] = REPO + os.pathsep + env.get("PYTHONPATH", "")
+    return env
+
+
+def measure_imports():
+    """Run -X importtime and return (total_ms, [(cumulative_ms, module), ...])."""
+    result = subprocess.run(
+        [sys.executable, "-X", "importtime", "-c", "import main"],
+        cwd=REPO, env=_env(), capture_output=True, text=True, check=True
+    )
+    entries = []
+    for line in result.stderr.splitlines():
+        if not line.startswith("import time:") or "cumulative" in line:
+            continue
+        _, cumulative_us, name = line[len("import time:"):].split("|")
+        entries.append((int(cumulative_us) / 1000, name.rstrip()))
+    total = next((ms for ms, name in entries if name.strip() == "main"), 0.0)
+    return total, sorted(entries, reverse=True)
+
+
+def measure_first_paint():
+    """Milliseconds from interpreter start to LoginWindow's first paint event, plus deferred modules loaded."""
+    script = (
+        "import time; _t0 = time.perf_counter()\n"
+        + FIRST_PAINT_SCRIPT % {"deferred": DEFERRED_MODULES}
+        + "\nprint(json.dumps({'t0': _t0}))\n"
+    )
+    result = subprocess.run(
+        [sys.executable, "-c", script], cwd=REPO, env=_env(), capture_output=True, text=True, check=True
+    )
+    lines = [json.loads(line) for line in result.stdout.splitlines() if line.startswith("{")]
+    data = {key: value for line in lines for key, value in line.items()}
+    if data.get("first_paint") is None:
+        raise RuntimeError("LoginWindow was never painted")
+    return (data["first_paint"] - data["t0"]) * 1000, data["loaded"]
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--runs", type=int, default=5)
+    parser.add_argument("--top", type=int, default=10, help="How many of the slowest imports to list")
+    parser.add_argument("--check", action="store_true", help="Exit non-zero when a budget is exceeded")
+    args = parser.parse_args()
+
+    import_runs = []
+    top = []
+    for _ in range(args.runs):
+        total, top = measure_imports()
+        import_runs.append(total)
+    paint_runs = []
+    loaded = set()
+    for _ in range(args.runs):
+        elapsed, modules = measure_first_paint()
+        paint_runs.append(elapsed)
+        loaded.update(modules)
+
+    import_ms = statistics.median(import_runs)
+    paint_ms = statistics.median(paint_runs)
+    print(f"import main:     median {import_ms:7.1f} ms (budget {IMPORT_BUDGET_MS} ms)")
+    print(f"first paint:     median {paint_ms:7.1f} ms (budget {FIRST_PAINT_BUDGET_MS} ms)")
+    print("slowest imports (cumulative):")
+    for ms, name in top[:args.top]:
+        print(f"  {ms:8.1f} ms  {name}")
+    if loaded:
+        print(f"deferred modules loaded at startup: {', '.join(sorted(loaded))}")
+
+    failures = []
+    if import_ms > IMPORT_BUDGET_MS:
+        failures.append("import time")
+    if paint_ms > FIRST_PAINT_BUDGET_MS:
+        failures.append("first paint")
+    if loaded:
+        failures.append("deferred imports")
+    if failures:
+        print(f"Over budget: {', '.join(failures)}")
+    return 1 if args.check and failures else 0
+
+
+if __name__ == "__main__":
+    raise SystemExit(main())
@@ -0,0 +1,162 @@
+"""
+Deterministic synthetic transaction histories.
+
+    python benchmarks/datagen.py --db /tmp/finance.db --users 50 --transactions 10000 --seed 1
+
+Every user gets a salary on a fixed day each month, monthly bills
+(rent, utilities, phone, subscriptions) and day-to-day spending whose
+categories, amounts and dates follow rough real-world shapes: groceries
+and transport are frequent and cheap, travel and electronics rare and
+expensive, and more is spent on Fridays and Saturdays. Amounts are
+log-normal around each category's typical value.
+
+A user's history depends only on the seed and the username, so adding
+users or changing their order never changes anyone else's rows, and the
+same arguments always produce the same database. The suite
+(benchmarks/suite.py) and other benchmarks build their data with it.
+"""
+import argparse
+import math
+import os
+import random
+import sys
+from datetime import date, timedelta
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from db_manager import DBManager  # noqa: E402
+
+# category: (relative frequency, typical amount in cents, spread of the log-normal)
+SPENDING = {
+    "Groceries": (30, 4200, 0.6),
+    "Transport": (18, 1150, 0.5),
+    "Dining": (14, 2300, 0.5),
+    "Coffee": (12, 380, 0.3),
+    "Shopping": (9, 3900, 0.9),
+    "Entertainment": (5, 2500, 0.7),
+    "Health": (4, 3100, 0.8),
+    "Gifts": (3, 4500, 0.8),
+    "Electronics": (1.5, 18_000, 0.9),
+    "Travel": (1, 42_000, 0.8),
+}
+# (category, description, day of month, amount in cents)
+MONTHLY_BILLS = [
+    ("Rent", "Monthly rent", 1, 120_000),
+    ("Utilities", "Energy bill", 8, 9_500),
+    ("Utilities", "Water rates", 12, 3_200),
+    ("Phone", "Mobile plan", 15, 2_500),
+    ("Entertainment", "Streaming subscription", 19, 1_599),
+]
+MERCHANTS = {
+    "Groceries": ["Tesco", "Sainsbury's", "Aldi", "Lidl", "Waitrose"],
+    "Transport": ["Uber", "Trainline", "TfL", "Shell", "Bolt"],
+    "Dining": ["Pret", "Nando's", "Wagamama", "Deliveroo", "Dishoom"],
+    "Coffee": ["Starbucks", "Costa", "Caffe Nero", "Gail's"],
+    "Shopping": ["Amazon", "IKEA", "Zara", "John Lewis", "Uniqlo"],
+    "Entertainment": ["Odeon", "Spotify", "Steam", "Ticketmaster"],
+    "Health": ["Boots", "Superdrug", "PureGym", "Specsavers"],
+    "Gifts": ["Etsy", "Moonpig", "Hotel Chocolat"],
+    "Electronics": ["Apple", "Currys", "Argos"],
+    "Travel": ["British Airways", "easyJet", "Airbnb", "Booking.com"],
+}
+# Spending per weekday, Monday first.
+WEEKDAY_WEIGHTS = [0.8, 0.85, 0.9, 1.0, 1.35, 1.5, 1.0]
+SALARY_CENTS = 320_000
+SALARY_DAY = 25
+START = date(2022, 1, 1)
+
+
+def _months(start, end):
+    month = date(start.year, start.month, 1)
+    while month <= end:
+        yield month
+        month = date(month.year + month.month // 12, month.month % 12 + 1, 1)
+
+
+def _scheduled(start, end):
+    """Salary and bills between ``start`` and ``end``, as (type, category, cents, description, day)."""
+    for month in _months(start, end):
+        payday = month.replace(day=SALARY_DAY)
+        if start <= payday <= end:
+            yield "income", "Salary", SALARY_CENTS, "Salary", payday
+        for category, description, day, cents in MONTHLY_BILLS:
+            due = month.replace(day=day)
+            if start <= due <= end:
+                yield "expense", category, cents, description, due
+
+
+def generate_user(username, transactions, seed=0, start=START, days=730):
+    """
+    One user's history, oldest first.
+    :param transactions: Number of rows, scheduled ones included
+    :param days: Length of the history; shorter when ``transactions`` is small,
+        so every history still has its monthly bills
+    :return: list of (type, category, amount_cents, description, "YYYY-MM-DD")
+    """
+    rng = random.Random(f"{seed}:{username}")
+    end = start + timedelta(days=days - 1)
+    scheduled = list(_scheduled(start, end))
+    # Keep at least three quarters of the rows for day-to-day spending.
+    while len(scheduled) > transactions // 4 and days > 31:
+        days //= 2
+        end = start + timedelta(days=days - 1)
+        scheduled = list(_scheduled(start, end))
+
+    day_weights = [WEEKDAY_WEIGHTS[(start + timedelta(days=offset)).weekday()] for offset in range(days)]
+    categories = list(SPENDING)
+    weights = [SPENDING[category][0] for category in categories]
+    count = max(transactions - len(scheduled), 0)
+    picked = rng.choices(categories, weights, k=count)
+    offsets = rng.choices(range(days), day_weights, k=count)
+
+    rows = [(kind, category, cents, description, day) for kind, category, cents, description, day in scheduled]
+    for category, offset in zip(picked, offsets):
+        _, typical, spread = SPENDING[category]
+        cents = max(int(rng.lognormvariate(math.log(typical), spread)), 50)
+        # A few percent of card spending comes back as refunds, booked as income.
+        kind = "income" if rng.random() < 0.02 else "expense"
+        description = f"{rng.choice(MERCHANTS[category])} {'refund' if kind == 'income' else 'card payment'}"
+        rows.append((kind, category, cents, description, start + timedelta(days=offset)))
+    rows = rows[:transactions]
+    rows.sort(key=lambda row: row[4])
+    return [(kind, category, cents, description, day.isoformat()) for kind, category, cents, description, day in rows]
+
+
+def usernames(users, prefix="user"):
+    return [f"{prefix}{index:05d}" for index in range(users)]
+
+
+def populate(db_manager, users, transactions, seed=0, prefix="user"):
+    """
+    Insert ``users`` accounts with ``transactions`` rows each, as plaintext
+    rows without password hashes (so they cannot log in).
+    :return: The usernames
+    """
+    names = usernames(users, prefix)
+    with db_manager.connection() as conn:
+        conn.executemany("INSERT INTO users (username, password) VALUES (?, '')", [(name,) for name in names])
+        for name in names:
+            conn.executemany("""
+                INSERT INTO transactions (username, type, category, amount_cents, description, date)
+                VALUES (?, ?, ?, ?, ?, ?)
+            """, ((name, *row) for row in generate_user(name, transactions, seed)))
+    return names
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--db", required=True, help="Database file to create or extend")
+    parser.add_argument("--users", type=int, default=50)
+    parser.add_argument("--transactions", type=int, default=10_000, help="Transactions per user")
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--prefix", default="user", help="Usernames are <prefix>00000, <prefix>00001, ...")
+    args = parser.parse_args()
+
+    db_manager = DBManager(args.db)
+    names = populate(db_manager, args.users, args.transactions, args.seed, args.prefix)
+    print(f"{len(names):,} users with {args.transactions:,} transactions each written to {args.db}")
+    return 0
+
+
+if __name__ == "__main__":
+    raise SystemExit(main())
@@ -0,0 +1,352 @@
+"""
+Benchmark suite over the main user-facing operations, with a stored baseline.
+
+    python benchmarks/suite.py                          # run, save results, compare with the baseline
+    python benchmarks/suite.py --cases export qt --check
+    python benchmarks/suite.py --save-baseline          # accept this run as the new baseline
+
+Builds a temporary database with datagen (--users users of --transactions
+rows each) and times every case --repeat times after --warmup untimed runs:
+single and batched inserts, get_transactions, the first page, get_summary
+with and without the query cache, register_user and login_user with the
+configured KDF, Excel and PDF export, and filling the Qt transactions table.
+Inserts and registrations go to a second database so the read cases always
+see the same data, and every case but get_summary_cached starts with the
+user's query cache emptied.
+
+Results, with the instrumentation histograms of each case, are written as
+JSON to --output (benchmarks/results/<time>.json by default). They are
+compared with --baseline when it was recorded with the same parameters: a
+case regresses when its median is more than --tolerance slower and at least
+--min-delta-ms slower. With --check the script exits non-zero on any
+regression. Baselines only mean something on the machine that recorded
+them; the comparison warns when the machine differs.
+"""
+import argparse
+import json
+import os
+import platform
+import sqlite3
+import statistics
+import subprocess
+import sys
+import tempfile
+import time
+from datetime import datetime, timezone
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import datagen  # noqa: E402
+import instrumentation  # noqa: E402
+import report_generator  # noqa: E402
+from auth import Auth  # noqa: E402
+from db_manager import DBManager  # noqa: E402
+from finance_tracker import FinanceTracker  # noqa: E402
+from passwords import PasswordHasher, VerificationCache  # noqa: E402
+
+HERE = os.path.dirname(os.path.abspath(__file__))
+DEFAULT_BASELINE = os.path.join(HERE, "baseline.json")
+RESULTS_DIR = os.path.join(HERE, "results")
+# Parameters that change the workload; results are only compared when they match.
+WORKLOAD_PARAMS = ("users", "transactions", "inserts", "logins", "seed", "kdf")
+
+CASES = {}
+
+
+def case(name):
+    """
+    Register a case. The decorated function is called once per run with the
+    Context, does any untimed preparation and returns the callable to time,
+    which returns how many operations (rows or calls) it performed.
+    """
+    def register(prepare):
+        CASES[name] = prepare
+        return prepare
+    return register
+
+
+class Context:
+    def __init__(self, tmp, args):
+        self.tmp = tmp
+        self.args = args
+        self.db_manager = DBManager(os.path.join(tmp, "read.db"))
+        self.usernames = datagen.populate(self.db_manager, args.users, args.transactions, args.seed)
+        self.username = self.usernames[0]
+        self.write_db = DBManager(os.path.join(tmp, "write.db"))
+        self.hasher = PasswordHasher.from_env()
+        self._serial = 0
+
+    def fresh_name(self, prefix):
+        self._serial += 1
+        return f"{prefix}{self._serial:05d}"
+
+    def fresh_tracker(self):
+        """A tracker for a new, empty user of the write database."""
+        username = self.fresh_name("writer")
+        with self.write_db.connection() as conn:
+            conn.execute("INSERT INTO users (username, password) VALUES (?, '')", (username,))
+        return FinanceTracker(username, self.write_db)
+
+
+@case("insert.single")
+def insert_single(ctx):
+    tracker = ctx.fresh_tracker()
+    rows = datagen.generate_user(tracker.username, ctx.args.inserts, ctx.args.seed)
+
+    def run():
+        for kind, category, cents, description, day in rows:
+            tracker.add_transaction(kind, category, cents / 100, description, day)
+        return len(rows)
+    return run
+
+
+@case("insert.batch")
+def insert_batch(ctx):
+    tracker = ctx.fresh_tracker()
+    rows = [(kind, category, cents / 100, description, day)
+            for kind, category, cents, description, day in
+            datagen.generate_user(tracker.username, ctx.args.transactions, ctx.args.seed)]
+    return lambda: tracker.add_transactions(rows)["inserted"]
+
+
+@case("read.get_transactions")
+def get_transactions(ctx):
+    tracker = FinanceTracker(ctx.username, ctx.db_manager)
+    ctx.db_manager.cache.invalidate(ctx.username)
+    return lambda: len(tracker.get_transactions())
+
+
+@case("read.first_page")
+def first_page(ctx):
+    tracker = FinanceTracker(ctx.username, ctx.db_manager)
+    ctx.db_manager.cache.invalidate(ctx.username)
+    return lambda: len(tracker.get_transactions_page(100)[0])
+
+
+@case("read.get_summary")
+def get_summary(ctx):
+    tracker = FinanceTracker(ctx.username, ctx.db_manager)
+    ctx.db_manager.cache.invalidate(ctx.username)
+
+    def run():
+        tracker.get_summary()
+        return 1
+    return run
+
+
+@case("read.get_summary_cached")
+def get_summary_cached(ctx):
+    tracker = FinanceTracker(ctx.username, ctx.db_manager)
+    tracker.get_summary()
+
+    def run():
+        for _ in range(1000):
+            tracker.get_summary()
+        return 1000
+    return run
+
+
+@case("auth.register_user")
+def register_user(ctx):
+    auth = Auth(ctx.write_db, ctx.hasher, VerificationCache())
+    names = [ctx.fresh_name("member") for _ in range(ctx.args.logins)]
+
+    def run():
+        for name in names:
+            auth.register_user(name, f"{name} password")
+        return len(names)
+    return run
+
+
+@case("auth.login_user")
+def login_user(ctx):
+    auth = Auth(ctx.write_db, ctx.hasher, VerificationCache())
+    name = ctx.fresh_name("member")
+    auth.register_user(name, "correct horse")
+
+    def run():
+        for _ in range(ctx.args.logins):
+            auth.cache.clear()
+            auth.login_user(name, "correct horse")
+        return ctx.args.logins
+    return run
+
+
+@case("export.xlsx")
+def export_excel(ctx):
+    output_dir = os.path.join(ctx.tmp, "exports")
+    return lambda: report_generator.export_to_excel(
+        ctx.username, output_dir=output_dir, db_manager=ctx.db_manager
+    ).rows
+
+
+@case("export.pdf")
+def export_pdf(ctx):
+    output_dir = os.path.join(ctx.tmp, "exports")
+    return lambda: report_generator.export_to_pdf(
+        ctx.username, output_dir=output_dir, db_manager=ctx.db_manager
+    ).rows
+
+
+@case("qt.table")
+def qt_table(ctx):
+    """Every row of the user's history fetched into the transactions table."""
+    from PyQt5.QtWidgets import QApplication, QTableView
+    from transaction_model import TransactionTableModel
+
+    app = QApplication.instance() or QApplication(["suite", "-platform", "offscreen"])
+    view = QTableView()
+
+    # Pages go through the query cache; start from an empty one, as after a write.
+    ctx.db_manager.cache.invalidate(ctx.username)
+
+    def run():
+        model = TransactionTableModel(FinanceTracker(ctx.username, ctx.db_manager))
+        view.setModel(model)
+        while model.canFetchMore():
+            model.fetchMore()
+        app.processEvents()
+        return model.rowCount()
+    return run
+
+
+def run_case(ctx, name, repeat, warmup):
+    """:return: The case's result dict"""
+    prepare = CASES[name]
+    for _ in range(warmup):
+        prepare(ctx)()
+    instrumentation.METRICS.reset()
+    samples = []
+    for _ in range(repeat):
+        fn = prepare(ctx)
+        started = time.perf_counter()
+        ops = fn()
+        samples.append(time.perf_counter() - started)
+    median = statistics.median(samples)
+    operations = instrumentation.snapshot()["operations"]
+    return {
+        "median_s": median,
+        "min_s": min(samples),
+        "ops": ops,
+        "ops_per_s": ops / median if median else None,
+        "samples_s": samples,
+        "operations": {key: value for key, value in operations.items() if value["count"]},
+    }
+
+
+def machine():
+    return {
+        "python": platform.python_version(),
+        "platform": platform.platform(),
+        "processor": platform.processor() or platform.machine(),
+        "cpus": os.cpu_count(),
+        "sqlite": sqlite3.sqlite_version,
+    }
+
+
+def git_commit():
+    try:
+        return subprocess.run(["git", "rev-parse", "--short", "HEAD"], cwd=HERE, capture_output=True,
+                              text=True, check=True).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+
+def compare(results, baseline, tolerance, min_delta_ms):
+    """
+    Print each case against the baseline.
+    :return: Names of the regressed cases; empty if the baselines are not comparable
+    """
+    if {key: baseline["params"].get(key) for key in WORKLOAD_PARAMS} != \
+            {key: results["params"].get(key) for key in WORKLOAD_PARAMS}:
+        print("Baseline was recorded with different parameters; not comparing.")
+        return []
+    if baseline.get("machine") != results["machine"]:
+        print("Warning: baseline was recorded on a different machine or Python; differences may not be regressions.")
+    regressed = []
+    print(f"\n{'case':26} {'median':>11} {'baseline':>11} {'change':>8}")
+    for name, result in results["cases"].items():
+        before = baseline["cases"].get(name)
+        if before is None or "median_s" not in result:
+            continue
+        now_ms, before_ms = result["median_s"] * 1000, before["median_s"] * 1000
+        change = now_ms / before_ms - 1 if before_ms else 0.0
+        flag = ""
+        if change > tolerance and now_ms - before_ms >= min_delta_ms:
+            regressed.append(name)
+            flag = "  REGRESSION"
+        print(f"{name:26} {now_ms:8.2f} ms {before_ms:8.2f} ms {change:+7.1%}{flag}")
+    return regressed
+
+
+def write_json(path, data):
+    os.makedirs(os.path.dirname(os.path.abspath(path)), exist_ok=True)
+    with open(path, "w", encoding="utf-8") as f:
+        json.dump(data, f, indent=2)
+        f.write("\n")
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--users", type=int, default=20)
+    parser.add_argument("--transactions", type=int, default=5000, help="Transactions per user")
+    parser.add_argument("--inserts", type=int, default=500, help="Single inserts per insert.single run")
+    parser.add_argument("--logins", type=int, default=3, help="Registrations or logins per auth run")
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--repeat", type=int, default=5)
+    parser.add_argument("--warmup", type=int, default=1)
+    parser.add_argument("--cases", nargs="+", help="Only run cases whose names start with one of these")
+    parser.add_argument("--output", help="Results file; defaults to benchmarks/results/<time>.json")
+    parser.add_argument("--baseline", default=DEFAULT_BASELINE)
+    parser.add_argument("--save-baseline", action="store_true", help="Also write the results to --baseline")
+    parser.add_argument("--tolerance", type=float, default=0.25, help="Allowed slowdown of a median, as a fraction")
+    parser.add_argument("--min-delta-ms", type=float, default=1.0, help="Ignore slowdowns smaller than this")
+    parser.add_argument("--check", action="store_true", help="Exit non-zero when a case regresses")
+    args = parser.parse_args()
+
+    names = [name for name in CASES if not args.cases or name.startswith(tuple(args.cases))]
+    hasher = PasswordHasher.from_env()
+    params = {key: getattr(args, key) for key in WORKLOAD_PARAMS if key != "kdf"}
+    params["kdf"] = f"{hasher.scheme} {hasher.scrypt_params if hasher.scheme == 'scrypt' else hasher.iterations}"
+    params.update(repeat=args.repeat, warmup=args.warmup)
+    started_at = datetime.now(timezone.utc)
+    results = {"created": started_at.isoformat(timespec="seconds"), "commit": git_commit(), "machine": machine(),
+               "params": params, "cases": {}}
+
+    with tempfile.TemporaryDirectory() as tmp:
+        started = time.perf_counter()
+        ctx = Context(tmp, args)
+        print(f"generated {args.users:,} users x {args.transactions:,} transactions "
+              f"in {time.perf_counter() - started:.1f} s")
+        for name in names:
+            try:
+                result = run_case(ctx, name, args.repeat, args.warmup)
+            except ImportError as e:
+                print(f"{name:26} skipped: {e}")
+                results["cases"][name] = {"skipped": str(e)}
+                continue
+            results["cases"][name] = result
+            rate = f"{result['ops_per_s']:12,.0f} ops/s" if result["ops_per_s"] else ""
+            print(f"{name:26} {result['median_s'] * 1000:9.2f} ms  (min {result['min_s'] * 1000:8.2f} ms) {rate}")
+        ctx.write_db.writer.close()
+
+    output = args.output or os.path.join(RESULTS_DIR, f"{started_at:%Y%m%dT%H%M%SZ}.json")
+    write_json(output, results)
+    print(f"results written to {output}")
+
+    regressed = []
+    if args.save_baseline:
+        write_json(args.baseline, results)
+        print(f"baseline written to {args.baseline}")
+    elif os.path.exists(args.baseline):
+        with open(args.baseline, encoding="utf-8") as f:
+            regressed = compare(results, json.load(f), args.tolerance, args.min_delta_ms)
+        if regressed:
+            print(f"{len(regressed)} regression(s): {', '.join(regressed)}")
+    else:
+        print(f"no baseline at {args.baseline}; run with --save-baseline to record one")
+    return 1 if args.check and regressed else 0
+
+
+if __name__ == "__main__":
+    raise SystemExit(main())
@@ -0,0 +1,185 @@
+"""
+Visual Insights charts, shared by the Qt and tkinter front ends.
+
+Charts are drawn from pre-aggregated data (category sums and the
+monthly_rollups table), never from raw transactions. Large inputs are reduced
+before plotting: categories beyond the largest few are binned into "Other"
+and long month series are merged into wider periods, so a redraw costs the
+same for ten transactions or ten million.
+
+Built figures are cached per user under user_balances.version, which the
+rollup triggers bump on every change to a transaction's amount, type,
+category or date. Opening the charts again without new data reuses the
+figure; only a changed version triggers a rebuild.
+
+matplotlib is imported on first use so the entry points start fast.
+"""
+import math
+import threading
+from collections import OrderedDict, namedtuple
+from decimal import Decimal
+
+from aggregations import CategoryTotal, PeriodTotal, category_totals, monthly_totals
+
+ChartData = namedtuple("ChartData", ["version", "income_categories", "expense_categories", "periods"])
+
+MAX_CATEGORIES = 12
+MAX_PERIODS = 60
+OTHER = "Other"
+
+
+def data_version(db_manager, username):
+    """The user's user_balances.version; 0 before the first transaction."""
+    with db_manager.connection() as conn:
+        row = conn.execute("SELECT version FROM user_balances WHERE username = ?", (username,)).fetchone()
+    return row[0] if row else 0
+
+
+def top_categories(items, limit=MAX_CATEGORIES):
+    """
+    Keep the ``limit - 1`` largest categories and bin the rest into one "Other" entry.
+    :param items: CategoryTotal of a single type
+    :return: list of CategoryTotal, largest first, at most ``limit`` long
+    """
+    items = sorted(items, key=lambda item: item.total, reverse=True)
+    if len(items) <= limit:
+        return items
+    kept, rest = items[:limit - 1], items[limit - 1:]
+    other = CategoryTotal(rest[0].type, OTHER, sum((item.total for item in rest), Decimal("0.00")),
+                          sum(item.count for item in rest))
+    return kept + [other]
+
+
+def bin_periods(periods, max_points=MAX_PERIODS):
+    """
+    Merge consecutive periods so at most ``max_points`` remain. Each bin is
+    labelled with its first period and sums the periods it covers.
+    :param periods: PeriodTotal, oldest first
+    """
+    if len(periods) <= max_points:
+        return list(periods)
+    width = math.ceil(len(periods) / max_points)
+    binned = []
+    for start in range(0, len(periods), width):
+        chunk = periods[start:start + width]
+        binned.append(PeriodTotal(
+            chunk[0].period,
+            sum((p.income for p in chunk), Decimal("0.00")),
+            sum((p.expenses for p in chunk), Decimal("0.00")),
+        ))
+    return binned
+
+
+def load_chart_data(db_manager, username, max_categories=MAX_CATEGORIES, max_periods=MAX_PERIODS):
+    """
+    Read and reduce everything the charts show.
+    The version is read first, so data changing meanwhile is labelled with an
+    older version and picked up by the next refresh.
+    :return: ChartData
+    """
+    version = data_version(db_manager, username)
+    categories = category_totals(db_manager, username)
+    return ChartData(
+        version,
+        top_categories([c for c in categories if c.type == "income"], max_categories),
+        top_categories([c for c in categories if c.type == "expense"], max_categories),
+        bin_periods(monthly_totals(db_manager, username), max_periods),
+    )
+
+
+def build_figure(data):
+    """
+    Lay out the Visual Insights figure: expense and income categories as
+    horizontal bars, and income against expenses over time.
+    The figure has no GUI canvas yet, so it can be built on a worker thread
+    and attached to FigureCanvasQTAgg or FigureCanvasTkAgg afterwards.
+    :return: matplotlib.figure.Figure
+    """
+    from matplotlib.figure import Figure  # Deferred: matplotlib is slow to import
+
+    figure = Figure(figsize=(12, 7), layout="constrained")
+    grid = figure.add_gridspec(2, 2)
+    for axes, items, color, title in (
+        (figure.add_subplot(grid[0, 0]), data.expense_categories, "tab:red", "Expenses by category"),
+        (figure.add_subplot(grid[0, 1]), data.income_categories, "tab:green", "Income by category"),
+    ):
+        axes.set_title(title, fontsize=11)
+        if not items:
+            axes.text(0.5, 0.5, "No data", ha="center", va="center", transform=axes.transAxes)
+            axes.set_axis_off()
+            continue
+        # Largest at the top.
+        labels = [item.category for item in reversed(items)]
+        axes.barh(labels, [float(item.total) for item in reversed(items)], color=color, alpha=0.75)
+        axes.tick_params(axis="y", labelsize=8)
+        axes.set_xlabel("Amount ($)")
+
+    axes = figure.add_subplot(grid[1, :])
+    axes.set_title("Income vs expenses over time", fontsize=11)
+    if data.periods:
+        positions = range(len(data.periods))
+        axes.plot(positions, [float(p.income) for p in data.periods], color="tab:green", label="Income")
+        axes.plot(positions, [float(p.expenses) for p in data.periods], color="tab:red", label="Expenses")
+        # A bounded number of tick labels however many periods there are.
+        step = max(1, len(data.periods) // 12)
+        axes.set_xticks(list(positions)[::step], [p.period for p in data.periods][::step], rotation=45, ha="right")
+        axes.set_ylabel("Amount ($)")
+        axes.legend()
+    else:
+        axes.text(0.5, 0.5, "No data", ha="center", va="center", transform=axes.transAxes)
+        axes.set_axis_off()
+    return figure
+
+
+class ChartCache:
+    """
+    Built figures keyed by (database path, username), each valid for one data
+    version. Thread-safe, so workers can fill it while the UI thread reads it.
+    :param max_users: Least recently used users are dropped beyond this count
+    """
+
+    def __init__(self, max_users=4):
+        self.max_users = max_users
+        self._figures = OrderedDict()
+        self._lock = threading.Lock()
+
+    def get(self, key, version):
+        """:return: The cached figure for this version, or None"""
+        with self._lock:
+            entry = self._figures.get(key)
+            if entry is None or entry[0] != version:
+                return None
+            self._figures.move_to_end(key)
+            return entry[1]
+
+    def put(self, key, version, figure):
+        with self._lock:
+            self._figures[key] = (version, figure)
+            self._figures.move_to_end(key)
+            while len(self._figures) > self.max_users:
+                self._figures.popitem(last=False)
+
+    def clear(self):
+        with self._lock:
+            self._figures.clear()
+
+
+_cache = ChartCache()
+
+
+def insights_figure(db_manager, username, cache=None):
+    """
+    The Visual Insights figure for the user's current data, built only if the
+    cached one is out of date. Runs queries, so call it from a worker thread.
+    :return: matplotlib.figure.Figure
+    """
+    if cache is None:
+        cache = _cache
+    key = (db_manager.db_path, username)
+    figure = cache.get(key, data_version(db_manager, username))
+    if figure is not None:
+        return figure
+    data = load_chart_data(db_manager, username)
+    figure = build_figure(data)
+    cache.put(key, data.version, figure)
+    return figure
@@ -1,55 +1,441 @@
+import logging
 import sqlite3
 import os
-import pandas as pd
+import queue
+import threading
+from concurrent.futures import Future
+from contextlib import contextmanager
 from pathlib import Path
+from queue import LifoQueue, Empty
+from instrumentation import span, timed
+from migrations import migrate, get_version
+from aggregations import summary_totals
+from query_cache import QueryCache
+from records import Transaction, to_cents
+
+logger = logging.getLogger(__name__)
+
+# Durability/performance profiles. Each is a list of PRAGMAs applied once to
+# every connection right after it is opened. WAL lets readers run alongside a
+# writer (and other processes); synchronous=NORMAL in WAL mode only risks the
+# last transactions on power loss, never corruption. "legacy" is the old
+# rollback-journal behaviour, kept for comparison.
+PROFILES = {
+    "safe": (
+        ("journal_mode", "WAL"),
+        ("synchronous", "FULL"),
+        ("cache_size", -16000),
+        ("mmap_size", 0),
+        ("busy_timeout", 10000),
+        ("temp_store", "MEMORY"),
+    ),
+    "balanced": (
+        ("journal_mode", "WAL"),
+        ("synchronous", "NORMAL"),
+        ("cache_size", -32000),
+        ("mmap_size", 256 * 1024 * 1024),
+        ("busy_timeout", 5000),
+        ("temp_store", "MEMORY"),
+    ),
+    "fast": (
+        ("journal_mode", "WAL"),
+        ("synchronous", "OFF"),
+        ("cache_size", -64000),
+        ("mmap_size", 1024 * 1024 * 1024),
+        ("busy_timeout", 5000),
+        ("temp_store", "MEMORY"),
+    ),
+    "legacy": (
+        ("journal_mode", "DELETE"),
+        ("synchronous", "FULL"),
+        ("busy_timeout", 5000),
+        ("temp_store", "MEMORY"),
+    ),
+}
+DEFAULT_PROFILE = "balanced"
+
+
+def resolve_profile(profile=None):
+    """Pick the profile argument, else FINANCE_DB_PROFILE, else the default."""
+    name = profile or os.environ.get("FINANCE_DB_PROFILE") or DEFAULT_PROFILE
+    if name not in PROFILES:
+        raise ValueError(f"Unknown database profile {name!r}; choose from {', '.join(PROFILES)}")
+    return name
+
+
+class ConnectionPool:
+    """
+    Process-wide pool of SQLite connections for a single database file.
+
+    Connections are opened lazily, configured once and then reused. A thread
+    that asks for a connection while it already holds one gets the same
+    connection back, so nested ``connection()`` blocks share one transaction.
+    A read-only pool opens the file with ``mode=ro`` and ``query_only`` set,
+    and leaves its journal mode alone.
+    """
+
+    def __init__(self, db_path, max_size=8, profile=DEFAULT_PROFILE, read_only=False):
+        self.db_path = db_path
+        self.max_size = max_size
+        self.profile = profile
+        self.read_only = read_only
+        self._idle = LifoQueue()
+        self._created = 0
+        self._lock = threading.Lock()
+        self._local = threading.local()
+
+    def _open(self):
+        if not self.read_only:
+            conn = sqlite3.connect(self.db_path, check_same_thread=False)
+            for name, value in PROFILES[self.profile]:
+                conn.execute(f"PRAGMA {name} = {value}")
+            return conn
+
+        conn = sqlite3.connect(f"{Path(self.db_path).as_uri()}?mode=ro", uri=True, check_same_thread=False)
+        for name, value in PROFILES[self.profile]:
+            # The journal mode is stored in the file, which a read-only connection cannot change.
+            if name != "journal_mode":
+                conn.execute(f"PRAGMA {name} = {value}")
+        conn.execute("PRAGMA query_only = 1")
+        return conn
+
+    def holds_connection(self):
+        """True if the calling thread is inside a ``connection()`` block."""
+        return getattr(self._local, "conn", None) is not None
+
+    @timed("db.acquire_connection")
+    def _acquire(self):
+        try:
+            return self._idle.get_nowait()
+        except Empty:
+            pass
+        with self._lock:
+            if self._created < self.max_size:
+                self._created += 1
+                create = True
+            else:
+                create = False
+        if create:
+            try:
+                return self._open()
+            except sqlite3.Error:
+                with self._lock:
+                    self._created -= 1
+                raise
+        return self._idle.get()
+
+    def _release(self, conn):
+        self._idle.put(conn)
+
+    @contextmanager
+    def connection(self):
+        """
+        Check out a connection for the current thread.
+        Commits when the outermost block exits cleanly, rolls back otherwise.
+        """
+        held = getattr(self._local, "conn", None)
+        if held is not None:
+            self._local.depth += 1
+            try:
+                yield held
+            finally:
+                self._local.depth -= 1
+            return
+
+        conn = self._acquire()
+        self._local.conn = conn
+        self._local.depth = 1
+        try:
+            yield conn
+            conn.commit()
+        except BaseException:
+            conn.rollback()
+            raise
+        finally:
+            self._local.conn = None
+            self._local.depth = 0
+            self._release(conn)
+
+    def close(self):
+        """Close every idle connection. Checked-out connections are left alone."""
+        while True:
+            try:
+                conn = self._idle.get_nowait()
+            except Empty:
+                break
+            conn.close()
+            with self._lock:
+                self._created -= 1
+
+
+TRANSACTION_COLUMNS = ("id", "type", "category", "amount", "description", "date")
+
+# Each sort is a (column, ..., id) key matching an index on (username, column, ...),
+# so keyset pages are index range scans. Sort keys must never be NULL or the
+# row-value comparison drops rows, hence the COALESCE for description.
+SORT_KEYS = {
+    "id": ("id",),
+    "type": ("type", "amount_cents", "id"),
+    "category": ("category", "id"),
+    "amount": ("amount_cents", "id"),
+    "description": ("description", "id"),
+    "date": ("date", "id"),
+}
+SORT_EXPRESSIONS = {"description": "COALESCE(description, '')"}
+# Cursors hold the stored values; an encrypted description sorts by its ciphertext.
+CURSOR_ATTRIBUTES = {"description": "stored_description"}
+
+
+def _filter_clauses(filters):
+    """Translate a transaction filter dict into (SQL clause, parameter) pairs."""
+    if not filters:
+        return []
+    clauses = []
+    if filters.get("type"):
+        clauses.append(("type = ?", filters["type"]))
+    if filters.get("category"):
+        clauses.append(("category = ?", filters["category"]))
+    if filters.get("date_from"):
+        clauses.append(("date >= ?", filters["date_from"]))
+    if filters.get("date_to"):
+        clauses.append(("date < date(?, '+1 day')", filters["date_to"]))
+    if filters.get("amount_min") not in (None, ""):
+        clauses.append(("amount_cents >= ?", to_cents(filters["amount_min"])))
+    if filters.get("amount_max") not in (None, ""):
+        clauses.append(("amount_cents <= ?", to_cents(filters["amount_max"])))
+    return clauses
+
+
+class GroupCommitWriter:
+    """
+    A single writer thread that coalesces statements from many callers into
+    one transaction per batch, so N concurrent inserts cost one commit (and
+    one fsync) instead of N, and never contend for SQLite's write lock with
+    each other.
+
+    A failing statement (a constraint violation, say) only fails its own
+    caller. The batch is whatever queued up while the previous commit was in
+    progress, so an idle writer adds no latency.
+    :param pool: ConnectionPool the writer borrows its connection from
+    :param max_batch: Upper bound on statements per transaction
+    """
+
+    _STOP = object()
+
+    def __init__(self, pool, max_batch=1000):
+        self.pool = pool
+        self.max_batch = max_batch
+        self._queue = queue.Queue()
+        self._thread = threading.Thread(target=self._run, name="finance-db-writer", daemon=True)
+        self._thread.start()
+
+    def submit(self, sql, params=()):
+        """
+        Queue one write.
+        :return: Future resolving to the statement's lastrowid once committed
+        """
+        future = Future()
+        self._queue.put((sql, params, future))
+        return future
+
+    def execute(self, sql, params=()):
+        """Queue one write and wait for its commit. :return: lastrowid"""
+        return self.submit(sql, params).result()
+
+    def _next_batch(self):
+        first = self._queue.get()
+        if first is self._STOP:
+            return None
+        batch = [first]
+        while len(batch) < self.max_batch:
+            try:
+                item = self._queue.get_nowait()
+            except Empty:
+                break
+            if item is self._STOP:
+                self._queue.put(item)
+                break
+            batch.append(item)
+        return batch
+
+    def _run(self):
+        while True:
+            batch = self._next_batch()
+            if batch is None:
+                return
+            results = []
+            try:
+                with span("db.write_batch") as measured, self.pool.connection() as conn:
+                    measured.rows = len(batch)
+                    conn.execute("BEGIN IMMEDIATE")
+                    for sql, params, future in batch:
+                        try:
+                            cursor = conn.execute(sql, params)
+                            results.append((future, cursor.lastrowid, None))
+                        except sqlite3.Error as e:
+                            # A failed statement normally only undoes itself; if SQLite
+                            # aborted the whole transaction, fail the batch instead.
+                            if not conn.in_transaction:
+                                raise
+                            results.append((future, None, e))
+            except Exception as e:
+                for _, _, future in batch:
+                    if not future.done():
+                        future.set_exception(e)
+                continue
+            for future, value, error in results:
+                if error is None:
+                    future.set_result(value)
+                else:
+                    future.set_exception(error)
+
+    def close(self):
+        """Finish queued writes and stop the thread."""
+        self._queue.put(self._STOP)
+        self._thread.join()
+
+
+_pools = {}
+_writers = {}
+_caches = {}
+_initialized_paths = set()
+_registry_lock = threading.Lock()
+
+
+def get_pool(db_path, profile=None, read_only=False):
+    """Return the shared pool for ``db_path``, creating it on first use."""
+    key = os.path.abspath(db_path)
+    profile = resolve_profile(profile)
+    with _registry_lock:
+        pool = _pools.get((key, read_only))
+        if pool is None:
+            pool = _pools[key, read_only] = ConnectionPool(key, profile=profile, read_only=read_only)
+        elif pool.profile != profile:
+            logger.warning("%s is already open with the %r profile; ignoring %r", key, pool.profile, profile)
+        return pool
+
+
+def get_writer(pool):
+    """Return the group-commit writer for ``pool``, starting it on first use."""
+    if pool.read_only:
+        raise sqlite3.OperationalError(f"{pool.db_path} is open read-only")
+    with _registry_lock:
+        writer = _writers.get(pool.db_path)
+        if writer is None:
+            writer = _writers[pool.db_path] = GroupCommitWriter(pool)
+        return writer
+
+
+def get_cache(pool):
+    """Return the query result cache for ``pool``, creating it on first use."""
+    with _registry_lock:
+        cache = _caches.get(pool.db_path)
+        if cache is None:
+            cache = _caches[pool.db_path] = QueryCache(pool)
+        return cache
+
+
+def close_all_pools():
+    """Flush and stop the writers, close the idle connections of every pool and forget them."""
+    with _registry_lock:
+        writers = list(_writers.values())
+        _writers.clear()
+    for writer in writers:
+        writer.close()
+    with _registry_lock:
+        for cache in _caches.values():
+            cache.close()
+        _caches.clear()
+        for pool in _pools.values():
+            pool.close()
+        _pools.clear()
+        _initialized_paths.clear()
+
 
 class DBManager:
-    def __init__(self, db_path="data/finance.db"):
+    """
+    :param db_path: SQLite database file
+    :param profile: One of PROFILES; defaults to $FINANCE_DB_PROFILE or "balanced".
+        The first DBManager for a file decides the profile for the process.
+    :param read_only: Open existing database files without write access and
+        without running migrations, e.g. for report workers. The schema must
+        already be current.
+    """
+
+    def __init__(self, db_path="data/finance.db", profile=None, read_only=False):
         self.db_path = db_path
-        self._ensure_db_directory()
-        self._initialize_database()
+        self.read_only = read_only
+        self.pool = get_pool(db_path, profile, read_only)
+        if read_only:
+            return
+        key = self.pool.db_path
+        with _registry_lock:
+            if key in _initialized_paths:
+                return
+            self._ensure_db_directory()
+            self._initialize_database()
+            _initialized_paths.add(key)
 
     def _ensure_db_directory(self):
         db_dir = os.path.dirname(self.db_path)
-        if not os.path.exists(db_dir):
+        if db_dir and not os.path.exists(db_dir):
             os.makedirs(db_dir)
 
     def _initialize_database(self):
+        """
+        Bring the schema up to date. The path only counts as initialized once
+        this succeeds, so a failure (e.g. "database is locked" while another
+        process migrates) is raised and the next DBManager tries again.
+        :raises sqlite3.Error: If the migrations fail
+        """
         try:
-            conn = self.get_connection()
-            cursor = conn.cursor()
-
-            cursor.execute("""
-                CREATE TABLE IF NOT EXISTS users (
-                    id INTEGER PRIMARY KEY AUTOINCREMENT,
-                    username TEXT UNIQUE NOT NULL,
-                    password TEXT NOT NULL
-                )
-            """)
-
-            cursor.execute("""
-                CREATE TABLE IF NOT EXISTS transactions (
-                    id INTEGER PRIMARY KEY AUTOINCREMENT,
-                    username TEXT NOT NULL,
-                    type TEXT NOT NULL CHECK (type IN ('income', 'expense')),
-                    category TEXT NOT NULL,
-                    amount REAL NOT NULL,
-                    description TEXT,
-                    date TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
-                    FOREIGN KEY (username) REFERENCES users (username)
-                )
-            """)
-            conn.commit()
+            with self.connection() as conn:
+                migrate(conn)
         except sqlite3.Error as e:
-            print(f"Error initializing database: {e}")
-        finally:
-            conn.close()
+            logger.error("Error initializing database: %s", e)
+            raise
+
+    @property
+    def writer(self):
+        """Shared GroupCommitWriter for this database."""
+        return get_writer(self.pool)
+
+    @property
+    def cache(self):
+        """Shared QueryCache for this database."""
+        return get_cache(self.pool)
+
+    @timed("db.write")
+    def write(self, sql, params=()):
+        """
+        Run one write statement through the group-commit writer.
+        Falls back to a direct write if this thread is already inside a
+        ``connection()`` block, since the writer would wait on its lock.
+        :return: lastrowid
+        """
+        if self.pool.holds_connection():
+            with self.connection() as conn:
+                return conn.execute(sql, params).lastrowid
+        return self.writer.execute(sql, params)
 
+    def schema_version(self):
+        with self.connection() as conn:
+            return get_version(conn)
+
+    def connection(self):
+        """
+        Context manager handing out a pooled connection.
+        The transaction is committed on exit, or rolled back if an error escapes.
+        """
+        return self.pool.connection()
+
+    @timed("db.open_connection")
     def get_connection(self):
+        """Open a standalone connection; the caller is responsible for closing it."""
         try:
-            return sqlite3.connect(self.db_path)
+            return self.pool._open()
         except sqlite3.Error as e:
-            print(f"Error connecting to database: {e}")
+            logger.error("Error connecting to database: %s", e)
             raise
 
     def close_connection(self, conn):
@@ -57,67 +443,199 @@ class DBManager:
             if conn:
                 conn.close()
         except sqlite3.Error as e:
-            print(f"Error closing the connection: {e}")
+            logger.warning("Error closing the connection: %s", e)
+
+    def rebuild_rollups(self, username=None):
+        """
+        Recompute user_balances and monthly_rollups from the transactions table.
+        :param username: Limit the rebuild to one user; rebuild everyone when None
+        """
+        where = "WHERE username = ?" if username else ""
+        params = (username,) if username else ()
+        with self.connection() as conn:
+            conn.execute(f"DELETE FROM monthly_rollups {where}", params)
+            conn.execute(f"""
+                INSERT INTO monthly_rollups (username, month, type, total_cents, tx_count)
+                SELECT username, COALESCE(substr(date, 1, 7), ''), type, SUM(amount_cents), COUNT(*)
+                FROM transactions {where}
+                GROUP BY username, COALESCE(substr(date, 1, 7), ''), type
+            """, params)
+            # Keep the version counter moving so cached results are invalidated.
+            conn.execute(f"""
+                UPDATE user_balances
+                SET total_income_cents = 0, total_expenses_cents = 0, tx_count = 0, version = version + 1
+                {where}
+            """, params)
+            conn.execute(f"""
+                INSERT INTO user_balances (username, total_income_cents, total_expenses_cents, tx_count)
+                SELECT username,
+                       SUM(CASE WHEN type = 'income' THEN amount_cents ELSE 0 END),
+                       SUM(CASE WHEN type = 'expense' THEN amount_cents ELSE 0 END),
+                       COUNT(*)
+                FROM transactions {where}
+                GROUP BY username
+                ON CONFLICT (username) DO UPDATE SET
+                    total_income_cents = excluded.total_income_cents,
+                    total_expenses_cents = excluded.total_expenses_cents,
+                    tx_count = excluded.tx_count
+            """, params)
+
+    def verify_rollups(self, repair=False):
+        """
+        Compare the materialized tables against the transactions they summarize.
+        :param repair: Rebuild the rollups of every user that has drifted
+        :return: Sorted list of usernames whose rollups did not match
+        """
+        with self.connection() as conn:
+            rows = conn.execute("""
+                WITH actual AS (
+                    SELECT username, type, COALESCE(substr(date, 1, 7), '') AS month,
+                           SUM(amount_cents) AS total, COUNT(*) AS tx_count
+                    FROM transactions
+                    GROUP BY username, type, month
+                ),
+                stored AS (
+                    SELECT username, type, month, total_cents, tx_count
+                    FROM monthly_rollups
+                    WHERE tx_count > 0
+                ),
+                balances AS (
+                    SELECT username,
+                           SUM(CASE WHEN type = 'income' THEN amount_cents ELSE 0 END),
+                           SUM(CASE WHEN type = 'expense' THEN amount_cents ELSE 0 END),
+                           COUNT(*)
+                    FROM transactions
+                    GROUP BY username
+                ),
+                stored_balances AS (
+                    SELECT username, total_income_cents, total_expenses_cents, tx_count
+                    FROM user_balances
+                    WHERE tx_count <> 0 OR total_income_cents <> 0 OR total_expenses_cents <> 0
+                )
+                SELECT username FROM (SELECT * FROM actual EXCEPT SELECT * FROM stored)
+                UNION SELECT username FROM (SELECT * FROM stored EXCEPT SELECT * FROM actual)
+                UNION SELECT username FROM (SELECT * FROM balances EXCEPT SELECT * FROM stored_balances)
+                UNION SELECT username FROM (SELECT * FROM stored_balances EXCEPT SELECT * FROM balances)
+            """).fetchall()
+        drifted = sorted(row[0] for row in rows)
+
+        if repair:
+            for username in drifted:
+                self.rebuild_rollups(username)
+        return drifted
+
+    def verify_search_index(self, repair=False):
+        """
+        Check transactions_fts against the transactions it indexes.
+        :param repair: Rebuild the index if it does not match
+        :return: True if the index was consistent
+        """
+        try:
+            with self.connection() as conn:
+                # rank = 1 also compares the index with the indexed rows, not only with itself.
+                conn.execute("INSERT INTO transactions_fts (transactions_fts, rank) VALUES ('integrity-check', 1)")
+            return True
+        except sqlite3.DatabaseError as e:
+            logger.warning("Search index is inconsistent: %s", e)
+        if repair:
+            with self.connection() as conn:
+                conn.execute("INSERT INTO transactions_fts (transactions_fts) VALUES ('rebuild')")
+        return False
+
+    @timed("db.get_transactions_page", rows=lambda page: len(page[0]))
+    def get_transactions_page(self, username, page_size=100, after=None, filters=None,
+                              sort_column="date", descending=True, cipher=None):
+        """
+        One page of a user's transactions using keyset pagination.
+        :param username: The user whose transactions are listed
+        :param page_size: Maximum number of rows to return
+        :param after: The cursor returned with the previous page, or None for the first page
+        :param filters: Optional dict with type, category, date_from and date_to (inclusive, YYYY-MM-DD),
+            amount_min and amount_max (inclusive, currency units)
+        :param sort_column: One of TRANSACTION_COLUMNS; ties are broken by id
+        :param descending: Sort direction
+        :param cipher: encryption.FieldCipher for the user's sealed descriptions
+        :return: (rows, cursor) where rows are records.Transaction and cursor is None
+            once the results are exhausted
+        """
+        if sort_column not in SORT_KEYS:
+            raise ValueError(f"Cannot sort transactions by {sort_column!r}")
+        key_columns = SORT_KEYS[sort_column]
+        key_expressions = [SORT_EXPRESSIONS.get(column, column) for column in key_columns]
+        direction = "DESC" if descending else "ASC"
+
+        query = """
+            SELECT id, type, category, amount_cents, description, date
+            FROM transactions
+            WHERE username = ?
+        """
+        params = [username]
+        for clause, value in _filter_clauses(filters):
+            query += f" AND {clause}"
+            params.append(value)
+        if after is not None:
+            placeholders = ", ".join("?" for _ in key_columns)
+            query += f" AND ({', '.join(key_expressions)}) {'<' if descending else '>'} ({placeholders})"
+            params.extend(after)
+        order = ", ".join(f"{expression} {direction}" for expression in key_expressions)
+        query += f" ORDER BY {order} LIMIT ?"
+        params.append(page_size)
+
+        with self.connection() as conn:
+            result = conn.execute(query, params)
+            result.row_factory = Transaction.from_row if cipher is None else cipher.row_factory
+            rows = result.fetchall()
+        cursor = None
+        if len(rows) == page_size:
+            last = rows[-1]
+            values = (getattr(last, CURSOR_ATTRIBUTES.get(column, column)) for column in key_columns)
+            cursor = tuple("" if value is None else value for value in values)
+        return rows, cursor
+
+    @timed("db.count_transactions")
+    def count_transactions(self, username, filters=None):
+        """Number of a user's transactions matching ``filters``."""
+        query = "SELECT COUNT(*) FROM transactions WHERE username = ?"
+        params = [username]
+        for clause, value in _filter_clauses(filters):
+            query += f" AND {clause}"
+            params.append(value)
+        with self.connection() as conn:
+            return conn.execute(query, params).fetchone()[0]
+
+    def iter_transactions(self, username, chunk_size=500, cipher=None):
+        """
+        Yield a user's transactions newest first, fetching ``chunk_size`` rows at a time.
+        No connection is held between chunks.
+        """
+        cursor = None
+        while True:
+            rows, cursor = self.get_transactions_page(username, chunk_size, cursor, cipher=cipher)
+            yield from rows
+            if cursor is None:
+                return
 
     def get_transactions(self, username):
         try:
-            conn = self.get_connection()
-            cursor = conn.cursor()
-            cursor.execute("""
-                SELECT id, type, category, amount, description, date 
-                FROM transactions WHERE username = ? ORDER BY date DESC
-            """, (username,))
-            return cursor.fetchall()
+            return list(self.iter_transactions(username))
         except sqlite3.Error as e:
-            print(f"Error fetching transactions: {e}")
+            logger.error("Error fetching transactions: %s", e)
             return []
-        finally:
-            conn.close()
 
     def export_to_excel(self, username):
-        transactions = self.get_transactions(username)
-        if not transactions:
-            print("No transactions available for export.")
-            return
-        
-        df = pd.DataFrame(transactions, columns=["ID", "Type", "Category", "Amount", "Description", "Date"])
-        downloads_path = str(Path.home() / "Downloads")
-        file_path = os.path.join(downloads_path, f"{username}_transactions.xlsx")
-        
-        df.to_excel(file_path, index=False)
-        print(f"Transactions exported to Excel at {file_path}")
+        from report_generator import export_to_excel
+        return export_to_excel(username, db_manager=self)
 
     def export_to_pdf(self, username):
-        try:
-            from fpdf import FPDF
-
-            transactions = self.get_transactions(username)
-            if not transactions:
-                print("No transactions available for export.")
-                return
-            
-            pdf = FPDF()
-            pdf.add_page()
-            pdf.set_font("Arial", size=12)
-            pdf.cell(200, 10, txt="Financial Transactions Report", ln=True, align='C')
-            
-            for trans in transactions:
-                pdf.cell(0, 10, txt=f"{trans}", ln=True)
-            
-            downloads_path = str(Path.home() / "Downloads")
-            file_path = os.path.join(downloads_path, f"{username}_transactions.pdf")
-            pdf.output(file_path)
-            print(f"Transactions exported to PDF at {file_path}")
-        except ImportError:
-            print("fpdf module not installed. Install it using 'pip install fpdf'.")
+        from report_generator import export_to_pdf
+        return export_to_pdf(username, db_manager=self)
 
     def generate_visual_insights(self, username):
-        transactions = self.get_transactions(username)
-        if not transactions:
+        totals = summary_totals(self, username)
+        if not totals.count:
             print("No transactions available for visual insights.")
             return
 
-        df = pd.DataFrame(transactions, columns=["ID", "Type", "Category", "Amount", "Description", "Date"])
-        summary = df.groupby("Type")["Amount"].sum()
         print("Visual insights:")
-        print(summary)
+        print(f"expense    {totals.total_expenses}")
+        print(f"income     {totals.total_income}")
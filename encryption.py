@@ -0,0 +1,411 @@
+"""
+Field-level encryption of transaction descriptions.
+
+Every user has a random data key (a Fernet key). It is stored in user_keys
+wrapped by a key-encryption key that scrypt derives from the login password,
+so nothing usable is stored in plaintext and a rotation never touches the
+password hash. Descriptions are stored as ``enc1:<fernet token>`` and are only
+decrypted when a record's ``description`` is read, so listing a page costs
+nothing for rows that are never displayed.
+
+Amounts, categories and dates stay in plaintext: the rollup triggers, SQL sums,
+filters and keyset sorting all depend on them.
+
+Sealed descriptions are made searchable by a blind index: every word prefix is
+stored as a short keyed BLAKE2b hash under a separate per-user search key (see
+``search``). The index shows which of a user's rows share a word prefix, but
+not the words. The search key is not rotated with the data key, so rotation
+does not have to rebuild the index.
+"""
+import base64
+import hashlib
+import logging
+import os
+from functools import lru_cache, partial
+
+from cryptography.fernet import Fernet, InvalidToken, MultiFernet
+
+from errors import EncryptionError
+from passwords import SALT_BYTES, SCRYPT_DEFAULTS, _b64decode, _b64encode
+from records import Transaction
+from search import word_prefixes, words
+
+SEALED_PREFIX = "enc1:"
+# Bytes of keyed hash kept per blind-index token, written as hex.
+TERM_BYTES = 5
+
+logger = logging.getLogger(__name__)
+
+# Stored descriptions that are neither empty nor sealed, written as ranges over
+# the (username, COALESCE(description, '')) index; ';' sorts right after ':'.
+_PLAINTEXT = """
+    COALESCE(description, '') > ''
+    AND (COALESCE(description, '') < 'enc1:' OR COALESCE(description, '') >= 'enc1;')
+"""
+# Sealed rows without blind-index terms, matching idx_transactions_unsearchable.
+_UNSEARCHABLE = "(search_terms IS NULL AND substr(description, 1, 5) = 'enc1:')"
+
+
+def _wrapped_keys(wrapped_key, old_keys):
+    """The wrapped data keys of a user_keys row, newest first."""
+    return [token.encode("ascii") for token in [wrapped_key] + (old_keys.split() if old_keys else [])]
+
+
+def derive_kek(password, salt, n, r, p):
+    """Key-encryption key for ``password``, as a Fernet key."""
+    key = hashlib.scrypt(password.encode(), salt=salt, n=n, r=r, p=p, maxmem=256 * r * n + 1024 * 1024, dklen=32)
+    return base64.urlsafe_b64encode(key)
+
+
+class FieldCipher:
+    """
+    Seals and opens single text values.
+    :param keys: Fernet data keys, newest first; values are encrypted with the
+        first and decrypted with whichever one matches
+    :param reload: Optional callable returning the current key list, tried once
+        when no key opens a value (another session may have rotated the keys)
+    """
+
+    def __init__(self, keys, reload=None):
+        self._fernet = MultiFernet([Fernet(key) for key in keys])
+        self._reload = reload
+        self.row_factory = partial(Transaction.from_row, cipher=self)
+
+    @staticmethod
+    def is_sealed(value):
+        return isinstance(value, str) and value.startswith(SEALED_PREFIX)
+
+    def encrypt(self, text):
+        """Empty and None values are stored as they are."""
+        if not text:
+            return text
+        return SEALED_PREFIX + self._fernet.encrypt(str(text).encode()).decode("ascii")
+
+    def reload(self):
+        """Replace the keys with the ones ``reload`` returns now."""
+        self._fernet = MultiFernet([Fernet(key) for key in self._reload()])
+
+    def _open(self, value, method):
+        token = value[len(SEALED_PREFIX):].encode("ascii")
+        try:
+            return method(self._fernet, token)
+        except InvalidToken:
+            if self._reload is None:
+                raise EncryptionError("A description could not be decrypted with this user's keys.")
+        self.reload()
+        try:
+            return method(self._fernet, token)
+        except InvalidToken:
+            raise EncryptionError("A description could not be decrypted with this user's keys.")
+
+    def decrypt(self, value):
+        """
+        Plaintext values, written before encryption was enabled, pass through.
+        :raises EncryptionError: If no data key of this user opens the value
+        """
+        if not self.is_sealed(value):
+            return value
+        return self._open(value, MultiFernet.decrypt).decode()
+
+    def reseal(self, value):
+        """Re-encrypt ``value`` under the newest key, encrypting plaintext values."""
+        if not self.is_sealed(value):
+            return self.encrypt(value)
+        return SEALED_PREFIX + self._open(value, MultiFernet.rotate).decode("ascii")
+
+
+class RedactingCipher:
+    """
+    Stands in for a FieldCipher where the user's keys are not available, such
+    as batch statements: sealed descriptions read as ``placeholder`` instead of
+    ciphertext, and plaintext values pass through.
+    """
+
+    def __init__(self, placeholder="[encrypted]"):
+        self.placeholder = placeholder
+        self.row_factory = partial(Transaction.from_row, cipher=self)
+
+    is_sealed = staticmethod(FieldCipher.is_sealed)
+
+    def decrypt(self, value):
+        return self.placeholder if self.is_sealed(value) else value
+
+
+class KeyRing:
+    """
+    A logged-in user's data keys. Build one with ``unlock``.
+
+    Keys replaced by ``rotate`` stay in user_keys, wrapped like the current
+    one, until the re-encryption pass has moved every row to the current key.
+    Other sessions may still hold the replaced key, so writers call ``refresh``
+    before sealing and pick up a rotation instead of sealing with a retired key.
+    """
+
+    def __init__(self, db_manager, username, kek, keys, reencrypt_after, search_key, wrapped_key):
+        self.db_manager = db_manager
+        self.username = username
+        self._kek = kek
+        # The stored form of keys[0], compared by ``refresh`` to spot rotations.
+        self._wrapped_key = wrapped_key
+        self.reencrypt_after = reencrypt_after
+        self._search_hash = hashlib.blake2b(key=search_key, digest_size=TERM_BYTES)
+        # Descriptions repeat the same merchants and words, so tokens are kept per word.
+        self._word_tokens = lru_cache(maxsize=4096)(self._prefix_tokens)
+        self.cipher = FieldCipher(keys, reload=self._load_keys)
+
+    @classmethod
+    def unlock(cls, db_manager, username, password, scrypt_params=None):
+        """
+        Unwrap the user's data keys, creating them on the user's first login.
+        Runs scrypt, so call it from a worker thread, and only after the
+        password has been verified.
+        :param scrypt_params: {"n", "r", "p"} for new users; existing users keep theirs
+        :raises EncryptionError: If the stored keys cannot be unwrapped with ``password``
+        """
+        with db_manager.connection() as conn:
+            row = conn.execute(
+                "SELECT kdf, wrapped_key, old_keys, reencrypt_after, wrapped_search_key FROM user_keys "
+                "WHERE username = ?",
+                (username,)
+            ).fetchone()
+        if row is None:
+            return cls._create(db_manager, username, password, scrypt_params or SCRYPT_DEFAULTS)
+
+        kdf, wrapped_key, old_keys, reencrypt_after, wrapped_search_key = row
+        params, salt = kdf.split("$")
+        values = {name: int(value) for name, value in (item.split("=") for item in params.split(","))}
+        kek = Fernet(derive_kek(password, _b64decode(salt), **values))
+        try:
+            keys = [kek.decrypt(token) for token in _wrapped_keys(wrapped_key, old_keys)]
+            if wrapped_search_key is None:
+                search_key = cls._add_search_key(db_manager, username, kek)
+            else:
+                search_key = kek.decrypt(wrapped_search_key.encode("ascii"))
+        except InvalidToken:
+            raise EncryptionError(f"The data keys of {username!r} could not be unlocked.")
+        return cls(db_manager, username, kek, keys, reencrypt_after, search_key, wrapped_key)
+
+    @staticmethod
+    def _add_search_key(db_manager, username, kek):
+        """Give keys created before search existed a search key, unless another login just did."""
+        key = os.urandom(32)
+        with db_manager.connection() as conn:
+            conn.execute(
+                "UPDATE user_keys SET wrapped_search_key = ? WHERE username = ? AND wrapped_search_key IS NULL",
+                (kek.encrypt(key).decode("ascii"), username)
+            )
+            wrapped = conn.execute(
+                "SELECT wrapped_search_key FROM user_keys WHERE username = ?", (username,)
+            ).fetchone()[0]
+        return kek.decrypt(wrapped.encode("ascii"))
+
+    @classmethod
+    def _create(cls, db_manager, username, password, scrypt_params):
+        salt = os.urandom(SALT_BYTES)
+        kdf = f"n={scrypt_params['n']},r={scrypt_params['r']},p={scrypt_params['p']}${_b64encode(salt)}"
+        kek = Fernet(derive_kek(password, salt, scrypt_params["n"], scrypt_params["r"], scrypt_params["p"]))
+        key = Fernet.generate_key()
+        wrapped_key = kek.encrypt(key).decode("ascii")
+        search_key = os.urandom(32)
+        with db_manager.connection() as conn:
+            cursor = conn.execute(
+                "INSERT OR IGNORE INTO user_keys (username, kdf, wrapped_key, wrapped_search_key) VALUES (?, ?, ?, ?)",
+                (username, kdf, wrapped_key, kek.encrypt(search_key).decode("ascii"))
+            )
+        if not cursor.rowcount:
+            # Another login created the keys first; use those.
+            return cls.unlock(db_manager, username, password)
+        logger.info("Created data key for %s", username)
+        return cls(db_manager, username, kek, [key], None, search_key, wrapped_key)
+
+    def term_token(self, word):
+        """Blind-index token of one normalized word or word prefix."""
+        digest = self._search_hash.copy()
+        digest.update(word.encode())
+        return digest.hexdigest()
+
+    def _prefix_tokens(self, word):
+        return [self.term_token(prefix) for prefix in word_prefixes(word)]
+
+    def search_terms(self, text):
+        """
+        The blind-index terms stored with a sealed description: a token for
+        every prefix of every word, without repeats.
+        :return: Space-separated tokens, or None for an empty description
+        """
+        if not text:
+            return None
+        tokens = dict.fromkeys(token for word in words(text) for token in self._word_tokens(word))
+        return " ".join(tokens)
+
+    def seal(self, description):
+        """:return: (stored description, search terms) to write for ``description``"""
+        return self.cipher.encrypt(description), self.search_terms(description)
+
+    @property
+    def rotating(self):
+        return self.reencrypt_after is not None
+
+    def _load_keys(self):
+        with self.db_manager.connection() as conn:
+            wrapped_key, old_keys = conn.execute(
+                "SELECT wrapped_key, old_keys FROM user_keys WHERE username = ?", (self.username,)
+            ).fetchone()
+        keys = [self._kek.decrypt(token) for token in _wrapped_keys(wrapped_key, old_keys)]
+        self._wrapped_key = wrapped_key
+        return keys
+
+    def refresh(self):
+        """
+        Pick up the stored keys if another session rotated them since this
+        keyring last looked, so the next values are sealed with the current key.
+        Call before sealing: a finished rotation retires the replaced keys, and
+        values sealed with one of those could no longer be opened.
+        """
+        with self.db_manager.connection() as conn:
+            wrapped_key = conn.execute(
+                "SELECT wrapped_key FROM user_keys WHERE username = ?", (self.username,)
+            ).fetchone()[0]
+        if wrapped_key != self._wrapped_key:
+            self.cipher.reload()
+            logger.info("Picked up rotated data key for %s", self.username)
+
+    def rotate(self):
+        """
+        Switch to a fresh data key. New writes use it at once; existing rows
+        move over when ``reencrypt`` runs, which should follow in the background.
+        """
+        key = Fernet.generate_key()
+        with self.db_manager.connection() as conn:
+            # Build on the stored keys, which another session may have rotated since this one unlocked.
+            wrapped_key, old_keys = conn.execute(
+                "SELECT wrapped_key, old_keys FROM user_keys WHERE username = ?", (self.username,)
+            ).fetchone()
+            wrapped = _wrapped_keys(wrapped_key, old_keys)
+            conn.execute(
+                "UPDATE user_keys SET wrapped_key = ?, old_keys = ?, reencrypt_after = 0 WHERE username = ?",
+                (self._kek.encrypt(key).decode("ascii"), " ".join(token.decode("ascii") for token in wrapped),
+                 self.username)
+            )
+        self.reencrypt_after = 0
+        # Reloaded in place: a re-encryption pass running on this keyring keeps using the same cipher.
+        self.cipher.reload()
+        logger.info("Rotated data key for %s", self.username)
+
+    def reencrypt(self, batch_size=500, progress=None):
+        """
+        Bring the user's descriptions under the current key: after a rotation
+        every sealed row is re-encrypted, otherwise only plaintext rows are
+        sealed. Rows without search terms get them on the way. Rows are handled in id order, a batch per short transaction,
+        with the encryption done outside it; each row is only replaced if it
+        has not changed meanwhile. The last id done is saved, so an
+        interrupted rotation resumes where it stopped; a finished one retires
+        the replaced keys (see ``_retire_old_keys``).
+        :param progress: Optional callable(done, total)
+        :return: Number of rows rewritten
+        """
+        rotating = self.rotating
+        condition = "COALESCE(description, '') > ''" if rotating else f"({_PLAINTEXT} OR {_UNSEARCHABLE})"
+        after = self.reencrypt_after or 0
+        with self.db_manager.connection() as conn:
+            total = conn.execute(
+                f"SELECT COUNT(*) FROM transactions WHERE username = ? AND id > ? AND {condition}",
+                (self.username, after)
+            ).fetchone()[0]
+
+        done = 0
+        cipher = self.cipher
+        while True:
+            self.refresh()
+            with self.db_manager.connection() as conn:
+                rows = conn.execute(
+                    "SELECT id, description, search_terms FROM transactions "
+                    f"WHERE username = ? AND id > ? AND {condition} ORDER BY id LIMIT ?",
+                    (self.username, after, batch_size)
+                ).fetchall()
+            if not rows:
+                break
+            updates = []
+            for trans_id, description, terms in rows:
+                if terms is None:
+                    plaintext = cipher.decrypt(description)
+                    terms = self.search_terms(plaintext)
+                    if rotating or not cipher.is_sealed(description):
+                        description_out = cipher.encrypt(plaintext)
+                    else:
+                        description_out = description
+                else:
+                    description_out = cipher.reseal(description)
+                updates.append((description_out, terms, trans_id, description))
+            after = rows[-1][0]
+            with self.db_manager.connection() as conn:
+                conn.executemany(
+                    "UPDATE transactions SET description = ?, search_terms = ? WHERE id = ? AND description = ?",
+                    updates
+                )
+                if rotating:
+                    conn.execute("UPDATE user_keys SET reencrypt_after = ? WHERE username = ?", (after, self.username))
+            done += len(rows)
+            if progress:
+                progress(done, total)
+
+        if rotating:
+            done += self._retire_old_keys(batch_size)
+        logger.info("Re-encrypted %d descriptions for %s", done, self.username)
+        return done
+
+    def _retire_old_keys(self, batch_size):
+        """
+        Finish a rotation by dropping the data keys it replaced, so a leaked old
+        key no longer opens anything and old_keys does not grow with every
+        rotation. Sealed rows still under an old key, e.g. written meanwhile by
+        a session unlocked before the rotation, are resealed first. If one of
+        them changes under us, or the keys were rotated again, the rotation is
+        left unfinished and the next ``reencrypt`` tries again.
+        :return: Number of rows resealed
+        """
+        with self.db_manager.connection() as conn:
+            wrapped_key = conn.execute(
+                "SELECT wrapped_key FROM user_keys WHERE username = ?", (self.username,)
+            ).fetchone()[0]
+        key = self._kek.decrypt(wrapped_key.encode("ascii"))
+        newest = FieldCipher([key])
+        after = resealed = skipped = 0
+        while True:
+            with self.db_manager.connection() as conn:
+                rows = conn.execute(
+                    "SELECT id, description FROM transactions "
+                    "WHERE username = ? AND id > ? AND substr(description, 1, 5) = 'enc1:' ORDER BY id LIMIT ?",
+                    (self.username, after, batch_size)
+                ).fetchall()
+            if not rows:
+                break
+            updates = []
+            for trans_id, description in rows:
+                try:
+                    newest.decrypt(description)
+                except EncryptionError:
+                    updates.append((newest.encrypt(self.cipher.decrypt(description)), trans_id, description))
+            if updates:
+                with self.db_manager.connection() as conn:
+                    updated = conn.executemany(
+                        "UPDATE transactions SET description = ? WHERE id = ? AND description = ?", updates
+                    ).rowcount
+                resealed += updated
+                skipped += len(updates) - updated
+            after = rows[-1][0]
+
+        if skipped:
+            logger.info("Keeping old data keys of %s: %d rows changed while resealing", self.username, skipped)
+            return resealed
+        with self.db_manager.connection() as conn:
+            retired = conn.execute(
+                "UPDATE user_keys SET old_keys = NULL, reencrypt_after = NULL WHERE username = ? AND wrapped_key = ?",
+                (self.username, wrapped_key)
+            ).rowcount
+        if retired:
+            self.reencrypt_after = None
+            self.cipher.reload()
+            logger.info("Retired old data keys of %s", self.username)
+        return resealed
+
@@ -0,0 +1,40 @@
+"""
+Exceptions raised by the service layer (Auth, FinanceTracker).
+Front ends catch these and decide how to present them.
+"""
+
+
+class FinanceError(Exception):
+    """Base class for errors reported by the service layer."""
+
+
+class StorageError(FinanceError):
+    """The database could not be read or written."""
+
+
+class InvalidTransaction(FinanceError, ValueError):
+    """A transaction failed validation."""
+
+
+class AuthError(FinanceError):
+    """Base class for authentication and registration failures."""
+
+
+class InvalidCredentials(AuthError):
+    """Unknown username or wrong password."""
+
+
+class UsernameTaken(AuthError):
+    """Registration with a username that already exists."""
+
+
+class InvalidRegistration(AuthError, ValueError):
+    """Registration details were rejected before reaching the database."""
+
+
+class EncryptionError(FinanceError):
+    """A data key could not be unlocked, or stored data could not be decrypted."""
+
+
+class BackupError(StorageError):
+    """A copy of the database cannot be brought up to date from the change journal."""
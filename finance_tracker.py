@@ -1,114 +1,436 @@
-import os
+import logging
 import sqlite3
 from db_manager import DBManager
+import report_generator
+import charts
+import search
+from aggregations import aggregate, category_totals, monthly_totals, summary_totals
+from errors import EncryptionError, InvalidTransaction, StorageError
+from instrumentation import timed
+from records import to_cents
+import re
 from datetime import datetime
-import pandas as pd  # For exporting to Excel and PDF
+from itertools import islice
+
+INSERT_TRANSACTION = """
+    INSERT INTO transactions (username, type, category, amount_cents, description, search_terms, date)
+    VALUES (?, ?, ?, ?, ?, ?, ?)
+"""
+
+ISO_DATE = re.compile(r"[0-9]{4}-[0-9]{2}-[0-9]{2}")
+
+logger = logging.getLogger(__name__)
+
+
+def validate_transaction(trans_type, amount_cents):
+    """Check the type/amount rules shared by single and bulk inserts."""
+    if trans_type not in ['income', 'expense']:
+        raise InvalidTransaction("Transaction type must be either 'income' or 'expense'.")
+    if amount_cents < 0:
+        raise InvalidTransaction("Transaction amount must be non-negative.")
+
+
+def validate_date(date):
+    """Check that a bulk-inserted date is a real YYYY-MM-DD date."""
+    try:
+        # Much cheaper per row than strptime; the pattern keeps out the other
+        # formats fromisoformat accepts.
+        valid = ISO_DATE.fullmatch(date) is not None and datetime.fromisoformat(date) is not None
+    except (TypeError, ValueError):
+        valid = False
+    if not valid:
+        raise InvalidTransaction(f"Invalid date {date!r}; expected YYYY-MM-DD.")
+
 
 class FinanceTracker:
-    def __init__(self, username):
+    """
+    :param keyring: encryption.KeyRing from Auth.unlock_keys; descriptions are
+        encrypted with it, and stored in plaintext without one
+    """
+
+    def __init__(self, username, db_manager=None, keyring=None):
         self.username = username
-        self.db_manager = DBManager()
-        self.downloads_folder = os.path.join(os.path.expanduser("~"), "Downloads")
+        self.db_manager = db_manager or DBManager()
+        self.keyring = keyring
+        self.downloads_folder = report_generator.default_output_dir()
+
+    @property
+    def cipher(self):
+        return self.keyring.cipher if self.keyring is not None else None
+
+    def _refresh_keys(self):
+        """
+        Pick up a data key rotated by another session before sealing (see KeyRing.refresh).
+        :raises StorageError: If the keys cannot be read
+        """
+        if self.keyring is None:
+            return
+        try:
+            self.keyring.refresh()
+        except sqlite3.Error as e:
+            raise StorageError(str(e)) from e
+
+    def _seal(self, description):
+        """:return: (stored description, blind-index search terms or None)"""
+        if self.keyring is None:
+            return description, None
+        return self.keyring.seal(description)
 
+    def _cached(self, kind, params, compute):
+        """Serve a read through the database's QueryCache (see query_cache)."""
+        return self.db_manager.cache.get(self.username, kind, params, compute)
+
+    def _invalidate(self):
+        self.db_manager.cache.invalidate(self.username)
+
+    @timed("tracker.add_transaction")
     def add_transaction(self, trans_type, category, amount, description="", date=None):
-        if trans_type not in ['income', 'expense']:
-            raise ValueError("Transaction type must be either 'income' or 'expense'.")
-        if amount < 0:
-            raise ValueError("Transaction amount must be non-negative.")
+        """
+        Insert one transaction.
+        :param amount: Amount in currency units (str, int, float or Decimal); stored as cents
+        :return: The new transaction id
+        :raises InvalidTransaction: If the type, category or amount is rejected
+        :raises StorageError: If the database write fails
+        """
+        if not category:
+            raise InvalidTransaction("Category cannot be empty.")
+        amount_cents = to_cents(amount)
+        validate_transaction(trans_type, amount_cents)
         date = date or datetime.now().strftime('%Y-%m-%d')
+        self._refresh_keys()
+        row = (self.username, trans_type, category, amount_cents, *self._seal(description), date)
         try:
-            conn = self.db_manager.get_connection()
-            cursor = conn.cursor()
-            cursor.execute("""
-                INSERT INTO transactions (username, type, category, amount, description, date)
-                VALUES (?, ?, ?, ?, ?, ?)
-            """, (self.username, trans_type, category, amount, description, date))
-            conn.commit()
-            print("Transaction added successfully.")
-        except Exception as e:
-            print(f"Error adding transaction: {e}")
+            # Concurrent single inserts are coalesced into group commits by the writer thread.
+            trans_id = self.db_manager.write(INSERT_TRANSACTION, row)
+        except sqlite3.Error as e:
+            raise StorageError(str(e)) from e
         finally:
-            conn.close()
+            self._invalidate()
+        logger.debug("Transaction %s added for %s", trans_id, self.username)
+        return trans_id
+
+    def _prepare_row(self, item, today):
+        """Turn one bulk-insert item (dict or positional sequence) into insert parameters."""
+        if isinstance(item, dict):
+            trans_type = item.get("type")
+            category = item.get("category")
+            amount = item.get("amount")
+            description = item.get("description") or ""
+            date = item.get("date")
+        else:
+            trans_type, category, amount, *rest = item
+            description = rest[0] if len(rest) > 0 and rest[0] else ""
+            date = rest[1] if len(rest) > 1 else None
+        if not category:
+            raise InvalidTransaction("Category cannot be empty.")
+        amount_cents = to_cents(amount)
+        validate_transaction(trans_type, amount_cents)
+        if date:
+            validate_date(date)
+        return (self.username, trans_type, category, amount_cents, *self._seal(description), date or today)
+
+    @timed("tracker.add_transactions", rows=lambda result: result["inserted"])
+    def add_transactions(self, transactions, batch_size=1000):
+        """
+        Insert many transactions, consuming the iterable in fixed-size batches.
+        Each batch is validated up front and written with executemany in one
+        transaction. Rows that fail are reported instead of aborting the import.
+        :param transactions: Iterable of dicts with type/category/amount/description/date
+            keys, or sequences in add_transaction argument order
+        :param batch_size: Number of rows per transaction
+        :return: {"inserted": count, "errors": [(row_index, message), ...]}
+        """
+        today = datetime.now().strftime('%Y-%m-%d')
+        inserted = 0
+        errors = []
+        items = iter(transactions)
+        offset = 0
+
+        while True:
+            batch = list(islice(items, batch_size))
+            if not batch:
+                break
+
+            self._refresh_keys()
+            rows = []
+            indexes = []
+            for index, item in enumerate(batch, start=offset):
+                try:
+                    rows.append(self._prepare_row(item, today))
+                    indexes.append(index)
+                except (ValueError, TypeError) as e:
+                    errors.append((index, str(e)))
+            offset += len(batch)
+
+            if not rows:
+                continue
+            with self.db_manager.connection() as conn:
+                # A savepoint per batch: the caller may already hold this connection
+                # in an open transaction, which a failed executemany does not roll back.
+                conn.execute("SAVEPOINT add_transactions")
+                try:
+                    conn.executemany(INSERT_TRANSACTION, rows)
+                    inserted += len(rows)
+                except sqlite3.Error:
+                    # Undo the rows inserted before the failure, then find the
+                    # offending ones by retrying the batch one row at a time.
+                    conn.execute("ROLLBACK TO add_transactions")
+                    for index, row in zip(indexes, rows):
+                        try:
+                            conn.execute(INSERT_TRANSACTION, row)
+                            inserted += 1
+                        except sqlite3.Error as e:
+                            errors.append((index, str(e)))
+                conn.execute("RELEASE add_transactions")
+
+        self._invalidate()
+        logger.info("%d transactions added for %s, %d rejected", inserted, self.username, len(errors))
+        return {"inserted": inserted, "errors": errors}
+
+    def update_transaction(self, trans_id, **fields):
+        """
+        Update fields of one of this user's transactions.
+        :param trans_id: The transaction id
+        :param fields: Any of type, category, amount (currency units), description, date
+        :return: True if a row was updated
+        :raises InvalidTransaction: If a field or the resulting type/amount is rejected
+        :raises StorageError: If the database write fails
+        """
+        allowed = {"type", "category", "amount", "description", "date"}
+        unknown = set(fields) - allowed
+        if unknown:
+            raise InvalidTransaction(f"Unknown transaction fields: {', '.join(sorted(unknown))}")
+        if not fields:
+            return False
+        if "amount" in fields:
+            fields["amount_cents"] = to_cents(fields.pop("amount"))
+        if "description" in fields:
+            self._refresh_keys()
+            fields["description"], fields["search_terms"] = self._seal(fields["description"])
+
+        try:
+            with self.db_manager.connection() as conn:
+                if "type" in fields or "amount_cents" in fields:
+                    current = conn.execute(
+                        "SELECT type, amount_cents FROM transactions WHERE id = ? AND username = ?",
+                        (trans_id, self.username)
+                    ).fetchone()
+                    if current is None:
+                        return False
+                    validate_transaction(fields.get("type", current[0]), fields.get("amount_cents", current[1]))
+                assignments = ", ".join(f"{name} = ?" for name in fields)
+                cursor = conn.execute(
+                    f"UPDATE transactions SET {assignments} WHERE id = ? AND username = ?",
+                    (*fields.values(), trans_id, self.username)
+                )
+        except sqlite3.Error as e:
+            raise StorageError(str(e)) from e
+        self._invalidate()
+        return cursor.rowcount > 0
+
+    def delete_transaction(self, trans_id):
+        """
+        Delete one of this user's transactions.
+        :return: True if a row was deleted
+        :raises StorageError: If the database write fails
+        """
+        try:
+            with self.db_manager.connection() as conn:
+                cursor = conn.execute(
+                    "DELETE FROM transactions WHERE id = ? AND username = ?", (trans_id, self.username)
+                )
+        except sqlite3.Error as e:
+            raise StorageError(str(e)) from e
+        self._invalidate()
+        return cursor.rowcount > 0
 
     def get_transactions(self, limit=None):
+        """
+        The user's transactions, newest first.
+        :raises StorageError: If the query fails
+        """
         try:
-            conn = self.db_manager.get_connection()
-            cursor = conn.cursor()
-            query = """
-                SELECT id, type, category, amount, description, date
-                FROM transactions
-                WHERE username = ?
-                ORDER BY date DESC
-            """
             if limit:
-                query += f" LIMIT {limit}"
-            cursor.execute(query, (self.username,))
-            transactions = cursor.fetchall()
-            print("Transactions retrieved successfully.")
-            return transactions
-        except Exception as e:
-            print(f"Error retrieving transactions: {e}")
-            return []
-        finally:
-            conn.close()
+                transactions, _ = self.get_transactions_page(page_size=int(limit))
+                return transactions
+            return list(self.iter_transactions())
+        except sqlite3.Error as e:
+            raise StorageError(str(e)) from e
+
+    def get_transactions_page(self, page_size=100, after=None, filters=None, sort_column="date", descending=True):
+        """
+        One page of transactions, newest first unless another sort is requested.
+        Pass the returned cursor as ``after`` to get the next page; it is None on the last page.
+        :return: (rows, cursor)
+        """
+        cipher = self.cipher
+        filter_key = tuple(sorted(filters.items())) if filters else None
+        # Rows carry the cipher that opens their descriptions, so it is part of the key.
+        return self._cached(
+            "page", (page_size, after, filter_key, sort_column, descending, cipher),
+            lambda: self.db_manager.get_transactions_page(
+                self.username, page_size, after, filters=filters, sort_column=sort_column, descending=descending,
+                cipher=cipher
+            )
+        )
+
+    def search_transactions(self, query, page_size=100, after=None, filters=None):
+        """
+        One page of transactions whose category or description has words
+        starting with every word of ``query``, most recently added first.
+        Pass the returned cursor as ``after`` to get the next page.
+        :return: (rows, cursor)
+        :raises StorageError: If the query fails
+        """
+        cipher = self.cipher
+        term_token = self.keyring.term_token if self.keyring is not None else None
+        filter_key = tuple(sorted(filters.items())) if filters else None
+        try:
+            return self._cached(
+                "search", (query, page_size, after, filter_key, cipher),
+                lambda: search.search_transactions(
+                    self.db_manager, self.username, query, page_size, after, filters, cipher, term_token
+                )
+            )
+        except sqlite3.Error as e:
+            raise StorageError(str(e)) from e
+
+    def count_transactions(self, filters=None):
+        filter_key = tuple(sorted(filters.items())) if filters else None
+        return self._cached("count", filter_key, lambda: self.db_manager.count_transactions(self.username, filters))
+
+    def iter_transactions(self, chunk_size=500):
+        """Stream transactions newest first in fixed-size chunks."""
+        return self.db_manager.iter_transactions(self.username, chunk_size, self.cipher)
 
     def generate_summary(self):
         summary = self.get_summary()
-        print(f"Total Income: {summary['total_income']}")
-        print(f"Total Expenses: {summary['total_expenses']}")
-        print(f"Balance: {summary['balance']}")
-        print("Report generated successfully.")
-
-    def export_to_excel(self):
-        transactions = self.get_transactions()
-        df = pd.DataFrame(transactions, columns=['ID', 'Type', 'Category', 'Amount', 'Description', 'Date'])
-        filepath = os.path.join(self.downloads_folder, f"{self.username}_transactions.xlsx")
-        df.to_excel(filepath, index=False)
-        print(f"Transactions exported to Excel: {filepath}")
-
-    def export_to_pdf(self):
-        transactions = self.get_transactions()
-        df = pd.DataFrame(transactions, columns=['ID', 'Type', 'Category', 'Amount', 'Description', 'Date'])
-        filepath = os.path.join(self.downloads_folder, f"{self.username}_transactions.pdf")
-        df.to_html("temp.html")  # Save as HTML first
-        os.system(f"wkhtmltopdf temp.html {filepath}")  # Convert HTML to PDF using wkhtmltopdf
-        os.remove("temp.html")  # Clean up temp file
-        print(f"Transactions exported to PDF: {filepath}")
+        logger.info("Summary for %s: income=%s expenses=%s balance=%s", self.username,
+                    summary['total_income'], summary['total_expenses'], summary['balance'])
+        return summary
 
-    def get_summary(self):
+    def export_to_excel(self, progress=None):
+        return report_generator.export_to_excel(
+            self.username, progress, output_dir=self.downloads_folder, db_manager=self.db_manager,
+            cipher=self.cipher
+        )
+
+    def export_to_csv(self, progress=None):
+        return report_generator.export_to_csv(
+            self.username, progress, output_dir=self.downloads_folder, db_manager=self.db_manager,
+            cipher=self.cipher
+        )
+
+    def export_to_pdf(self, progress=None):
+        return report_generator.export_to_pdf(
+            self.username, progress, output_dir=self.downloads_folder, db_manager=self.db_manager,
+            cipher=self.cipher
+        )
+
+    def reencrypt(self, progress=None):
+        """
+        Seal descriptions still stored in plaintext and finish an interrupted
+        key rotation. Meant to run as a background task after login.
+        :return: Number of rows rewritten (0 without a keyring)
+        :raises StorageError: If the database read or write fails
+        """
+        if self.keyring is None:
+            return 0
         try:
-            conn = self.db_manager.get_connection()
-            cursor = conn.cursor()
-            cursor.execute("""
-                SELECT SUM(amount) FROM transactions
-                WHERE username = ? AND type = 'income'
-            """, (self.username,))
-            total_income = cursor.fetchone()[0] or 0
-            cursor.execute("""
-                SELECT SUM(amount) FROM transactions
-                WHERE username = ? AND type = 'expense'
-            """, (self.username,))
-            total_expenses = cursor.fetchone()[0] or 0
-            return {
-                "total_income": total_income,
-                "total_expenses": total_expenses,
-                "balance": total_income - total_expenses
-            }
-        except Exception as e:
-            print(f"Error generating summary: {e}")
-            return {"total_income": 0, "total_expenses": 0, "balance": 0}
+            return self.keyring.reencrypt(progress=progress)
+        except sqlite3.Error as e:
+            raise StorageError(str(e)) from e
         finally:
-            conn.close()
+            self._invalidate()
+
+    def rotate_key(self, progress=None):
+        """
+        Switch to a new data key and re-encrypt every description under it.
+        :return: Number of rows rewritten
+        :raises EncryptionError: If the tracker has no keyring
+        :raises StorageError: If the database read or write fails
+        """
+        if self.keyring is None:
+            raise EncryptionError("Encryption keys are not unlocked for this session.")
+        try:
+            self.keyring.rotate()
+        except sqlite3.Error as e:
+            raise StorageError(str(e)) from e
+        return self.reencrypt(progress)
+
+    @timed("tracker.get_summary")
+    def get_summary(self):
+        """
+        :return: {"total_income", "total_expenses", "balance"}
+        :raises StorageError: If the query fails
+        """
+        try:
+            totals = self._cached("summary", (), lambda: summary_totals(self.db_manager, self.username))
+        except sqlite3.Error as e:
+            raise StorageError(str(e)) from e
+        return {
+            "total_income": totals.total_income,
+            "total_expenses": totals.total_expenses,
+            "balance": totals.balance
+        }
+
+    def get_category_totals(self):
+        """Per type and category sums, computed in SQL."""
+        return self._cached("categories", (), lambda: category_totals(self.db_manager, self.username))
+
+    def get_monthly_totals(self):
+        """Income and expenses per month from the materialized rollups."""
+        return self._cached("months", (), lambda: monthly_totals(self.db_manager, self.username))
+
+    def get_aggregates(self):
+        """Totals, category sums and monthly/weekly rollups for charts and reports."""
+        return self._cached("aggregates", (), lambda: aggregate(self.db_manager, self.username))
+
+    def get_insights_figure(self):
+        """Visual Insights figure for the current data, rebuilt only when transactions changed."""
+        try:
+            return charts.insights_figure(self.db_manager, self.username)
+        except sqlite3.Error as e:
+            raise StorageError(str(e)) from e
+
+    def get_columns(self):
+        """
+        The user's history as typed NumPy columns (analytics.TransactionColumns),
+        read once and then served from the query cache until it changes.
+        :raises StorageError: If the query fails
+        """
+        import analytics  # Deferred: numpy is slow to import and only needed here
+        try:
+            return self._cached("columns", (), lambda: analytics.load_columns(self.db_manager, self.username))
+        except sqlite3.Error as e:
+            raise StorageError(str(e)) from e
+
+    def get_budget_report(self, budgets=None, window=3):
+        """
+        Monthly expenses per category against ``budgets`` ({category: amount}),
+        or against each category's rolling mean over ``window`` months.
+        :return: analytics.BudgetReport
+        """
+        import analytics
+        return analytics.monthly_budgets(self.get_columns(), budgets, window)
+
+    def find_recurring_payments(self):
+        """:return: list of analytics.RecurringPayment, soonest next payment first"""
+        import analytics
+        return analytics.detect_recurring(self.get_columns())
+
+    def forecast_cash_flow(self, months=6):
+        """:return: analytics.CashFlowForecast for the next ``months`` months"""
+        import analytics
+        return analytics.forecast_cash_flow(self.get_columns(), months)
 
     def get_data(self):
         """Retrieve data for visualization or analysis."""
-        transactions = self.get_transactions()
-        data = pd.DataFrame(transactions, columns=['ID', 'Type', 'Category', 'Amount', 'Description', 'Date'])
-        print("Data retrieved successfully for visualization.")
+        import pandas as pd  # Deferred: pandas is slow to import and only needed here
+        data = pd.DataFrame.from_records(self.iter_transactions(), columns=['ID', 'Type', 'Category', 'Amount', 'Description', 'Date'])
         return data
 
     def view_transactions(self):
-        transactions = self.get_transactions()
-        for trans in transactions:
+        """Print the transactions to stdout (console use only)."""
+        for trans in self.iter_transactions():
             print(f"ID: {trans[0]}, Type: {trans[1]}, Category: {trans[2]}, Amount: {trans[3]}, Date: {trans[5]}")
-        print("Transactions displayed successfully.")
@@ -1,17 +1,26 @@
+import logging
 import tkinter as tk
 from tkinter import messagebox
 from auth import Auth
+from errors import AuthError, InvalidCredentials
 from finance_tracker import FinanceTracker
-from report_generator import export_to_excel, export_to_pdf
 from pathlib import Path
+from tasks import TaskCancelled, TkTaskExecutor
 import os
 
+logger = logging.getLogger(__name__)
+
+# Rows listed by View Transactions; a message box cannot usefully show more.
+TRANSACTIONS_SHOWN = 50
+
 class FinanceApp:
     def __init__(self, root):
         self.root = root
         self.auth = Auth()
+        self.executor = TkTaskExecutor(root)
         self.finance_tracker = None
         self.username = None
+        self.current_task = None
         self._build_login_screen()
 
     def _build_login_screen(self):
@@ -27,17 +36,36 @@ class FinanceApp:
         password_entry = tk.Entry(self.root, show="*")
         password_entry.pack()
 
+        def login_finished(username, keyring):
+            login_button.config(state=tk.NORMAL)
+            self.username = username
+            self.finance_tracker = FinanceTracker(username, keyring=keyring)
+            self._build_dashboard()
+            # Seal descriptions left in plaintext, or finish an interrupted key rotation.
+            self.executor.submit(
+                self.finance_tracker.reencrypt,
+                on_error=lambda e: logger.warning("Background re-encryption failed: %s", e)
+            )
+
+        def login_failed(error):
+            login_button.config(state=tk.NORMAL)
+            if isinstance(error, InvalidCredentials):
+                messagebox.showerror("Login Failed", "Invalid username or password.")
+            else:
+                messagebox.showerror("Database Error", f"An error occurred: {error}")
+
         def login():
             username = username_entry.get()
             password = password_entry.get()
-            if self.auth.login_user(username, password):
-                self.username = username
-                self.finance_tracker = FinanceTracker(username)
-                self._build_dashboard()
-            else:
-                messagebox.showerror("Login Failed", "Invalid username or password.")
-
-        tk.Button(self.root, text="Login", command=login).pack()
+            login_button.config(state=tk.DISABLED)
+            self.executor.submit(
+                self.auth.unlock_keys, username, password,
+                on_done=lambda keyring: login_finished(username, keyring),
+                on_error=login_failed
+            )
+
+        login_button = tk.Button(self.root, text="Login", command=login)
+        login_button.pack()
         tk.Button(self.root, text="Register", command=self._build_registration_screen).pack()
 
     def _build_registration_screen(self):
@@ -53,16 +81,26 @@ class FinanceApp:
         password_entry = tk.Entry(self.root, show="*")
         password_entry.pack()
 
-        def register():
-            username = username_entry.get()
-            password = password_entry.get()
-            if self.auth.register_user(username, password):
-                messagebox.showinfo("Registration Successful", "You can now log in.")
-                self._build_login_screen()
+        def registered(_):
+            messagebox.showinfo("Registration Successful", "You can now log in.")
+            self._build_login_screen()
+
+        def registration_failed(error):
+            register_button.config(state=tk.NORMAL)
+            if isinstance(error, AuthError):
+                messagebox.showerror("Registration Failed", str(error))
             else:
-                messagebox.showerror("Registration Failed", "Username already exists.")
+                messagebox.showerror("Database Error", f"An error occurred: {error}")
 
-        tk.Button(self.root, text="Register", command=register).pack()
+        def register():
+            register_button.config(state=tk.DISABLED)
+            self.executor.submit(
+                self.auth.register_user, username_entry.get(), password_entry.get(),
+                on_done=registered, on_error=registration_failed
+            )
+
+        register_button = tk.Button(self.root, text="Register", command=register)
+        register_button.pack()
         tk.Button(self.root, text="Back to Login", command=self._build_login_screen).pack()
 
     def _build_dashboard(self):
@@ -70,10 +108,22 @@ class FinanceApp:
         self.root.title(f"Finance Tracker - {self.username}")
         self.clear_screen()
 
-        summary = self.finance_tracker.get_summary()
-        tk.Label(self.root, text=f"Total Income: ${summary['total_income']}").pack()
-        tk.Label(self.root, text=f"Total Expenses: ${summary['total_expenses']}").pack()
-        tk.Label(self.root, text=f"Balance: ${summary['balance']}").pack()
+        income_label = tk.Label(self.root, text="Total Income: ...")
+        income_label.pack()
+        expenses_label = tk.Label(self.root, text="Total Expenses: ...")
+        expenses_label.pack()
+        balance_label = tk.Label(self.root, text="Balance: ...")
+        balance_label.pack()
+
+        def show_summary(summary):
+            income_label.config(text=f"Total Income: ${summary['total_income']}")
+            expenses_label.config(text=f"Total Expenses: ${summary['total_expenses']}")
+            balance_label.config(text=f"Balance: ${summary['balance']}")
+
+        def summary_failed(error):
+            balance_label.config(text=f"Summary unavailable: {error}")
+
+        self.executor.submit(self.finance_tracker.get_summary, on_done=show_summary, on_error=summary_failed)
 
         tk.Button(self.root, text="View Transactions", command=self._view_transactions).pack()
         tk.Button(self.root, text="Export to Excel", command=self._export_to_excel).pack()
@@ -81,31 +131,96 @@ class FinanceApp:
         tk.Button(self.root, text="Generate Report", command=self._generate_report).pack()
         tk.Button(self.root, text="Visual Insights", command=self._generate_analytics).pack()
 
+        self.status_label = tk.Label(self.root, text="")
+        self.status_label.pack()
+        self.cancel_button = tk.Button(self.root, text="Cancel", command=self._cancel_task)
+
     def _view_transactions(self):
-        """View the user's transactions."""
-        transactions = self.finance_tracker.get_transactions()
-        if transactions:
-            messagebox.showinfo("Transactions", "\n".join(str(t) for t in transactions))
-        else:
-            messagebox.showinfo("Transactions", "No transactions found.")
+        """View the user's most recent transactions, loaded in the background."""
+        tracker = self.finance_tracker
+
+        def load():
+            # Runs on a worker: only one page is read, and str() decrypts its descriptions here.
+            transactions = tracker.get_transactions(limit=TRANSACTIONS_SHOWN)
+            lines = [str(t) for t in transactions]
+            if len(lines) == TRANSACTIONS_SHOWN:
+                total = tracker.count_transactions()
+                if total > TRANSACTIONS_SHOWN:
+                    lines.append(f"... showing the {TRANSACTIONS_SHOWN} most recent of {total}.")
+            return lines
+
+        def show(lines):
+            messagebox.showinfo("Transactions", "\n".join(lines) if lines else "No transactions found.")
+
+        def failed(error):
+            messagebox.showerror("Transactions", f"An error occurred: {error}")
+
+        self.executor.submit(load, on_done=show, on_error=failed)
 
     def _export_to_excel(self):
         """Export data to Excel in the Downloads folder."""
-        export_to_excel(self.username)
-        messagebox.showinfo("Export Successful", "Excel file exported to Downloads folder.")
+        self._run_export(self.finance_tracker.export_to_excel, "Excel")
 
     def _export_to_pdf(self):
         """Export data to PDF in the Downloads folder."""
-        export_to_pdf(self.username)
-        messagebox.showinfo("Export Successful", "PDF file exported to Downloads folder.")
+        self._run_export(self.finance_tracker.export_to_pdf, "PDF")
+
+    def _run_export(self, export_fn, kind):
+        """Run an export in the background, showing progress and a Cancel button."""
+        if self.current_task is not None:
+            messagebox.showinfo("Export", "Another export is still running.")
+            return
+
+        def on_progress(done, total):
+            self.status_label.config(text=f"Exporting {kind}: {done}/{total or '?'} rows")
+
+        def finish():
+            self.current_task = None
+            self.status_label.config(text="")
+            self.cancel_button.pack_forget()
+
+        def on_done(result):
+            finish()
+            if result:
+                messagebox.showinfo("Export Successful", f"{kind} file exported to {result.path}")
+            else:
+                messagebox.showinfo("Export", "No transactions to export.")
+
+        def on_error(error):
+            finish()
+            if not isinstance(error, TaskCancelled):
+                messagebox.showerror("Export Failed", f"An error occurred: {error}")
+
+        self.status_label.config(text=f"Exporting {kind}...")
+        self.cancel_button.pack()
+        self.current_task = self.executor.submit(
+            export_fn, on_done=on_done, on_error=on_error, on_progress=on_progress
+        )
+
+    def _cancel_task(self):
+        if self.current_task is not None:
+            self.current_task.cancel()
 
     def _generate_report(self):
         """Generate a placeholder report."""
         messagebox.showinfo("Generate Report", "Report generated successfully!")
 
     def _generate_analytics(self):
-        """Generate visual insights."""
-        messagebox.showinfo("Visual Insights", "Visual insights generated successfully!")
+        """Show the Visual Insights charts in their own window."""
+        def show(figure):
+            from matplotlib.backends.backend_tkagg import FigureCanvasTkAgg  # Deferred: loads matplotlib
+
+            window = tk.Toplevel(self.root)
+            window.title("Visual Insights")
+            canvas = FigureCanvasTkAgg(figure, master=window)
+            canvas.draw()
+            canvas.get_tk_widget().pack(fill=tk.BOTH, expand=True)
+
+        self.executor.submit(
+            self.finance_tracker.get_insights_figure,
+            on_done=show,
+            on_error=lambda e: messagebox.showerror("Visual Insights", f"An error occurred: {e}")
+        )
 
     def clear_screen(self):
         """Clear all widgets from the root window."""
@@ -114,6 +229,7 @@ class FinanceApp:
 
 
 if __name__ == "__main__":
+    logging.basicConfig(level=logging.INFO, format="%(asctime)s %(name)s %(levelname)s %(message)s")
     root = tk.Tk()
     app = FinanceApp(root)
     root.mainloop()
@@ -0,0 +1,129 @@
+"""
+Streaming bank-statement importers.
+
+Readers yield one transaction dict at a time, so files of any size are
+imported without being loaded into memory. ``import_file`` feeds them to
+``FinanceTracker.add_transactions`` which writes in batches.
+"""
+import csv
+import re
+from datetime import datetime
+from decimal import Decimal
+
+DEFAULT_CATEGORY = "Uncategorized"
+
+_OFX_FIELD = re.compile(r"<(\w+)>([^<\r\n]*)")
+
+
+def _signed(amount, trans_type):
+    """Derive the type from the sign of the amount when the file has no type column."""
+    value = Decimal(str(amount).strip())
+    if trans_type:
+        return trans_type.strip().lower(), abs(value)
+    return ("income" if value >= 0 else "expense"), abs(value)
+
+
+def read_csv_transactions(path, encoding="utf-8-sig"):
+    """
+    Yield transactions from a CSV file with a header row.
+    Recognised columns (case-insensitive): type, category, amount, description, date.
+    When there is no type column, negative amounts are expenses. Dates are
+    YYYY-MM-DD; rows with other dates are rejected by add_transactions.
+    :param path: Path to the CSV file
+    """
+    with open(path, newline="", encoding=encoding) as f:
+        reader = csv.DictReader(f)
+        for record in reader:
+            record = {(key or "").strip().lower(): (value or "").strip() for key, value in record.items()}
+            try:
+                trans_type, amount = _signed(record.get("amount"), record.get("type"))
+            except (TypeError, ValueError, ArithmeticError):
+                # Left for add_transactions to reject with a per-row error.
+                trans_type, amount = record.get("type"), record.get("amount")
+            yield {
+                "type": trans_type,
+                "category": record.get("category") or DEFAULT_CATEGORY,
+                "amount": amount,
+                "description": record.get("description", ""),
+                "date": record.get("date") or None,
+            }
+
+
+def _ofx_date(value):
+    try:
+        return datetime.strptime(value[:8], "%Y%m%d").strftime("%Y-%m-%d")
+    except ValueError:
+        return value  # Left for add_transactions to reject with a per-row error.
+
+
+def read_ofx_transactions(path, encoding="latin-1"):
+    """
+    Yield transactions from an OFX/QFX statement, one <STMTTRN> block at a time.
+    Works with both the SGML (OFX 1.x) and XML (OFX 2.x) flavours.
+    :param path: Path to the OFX file
+    """
+    current = None
+    with open(path, encoding=encoding) as f:
+        for line in f:
+            upper = line.upper()
+            if "<STMTTRN>" in upper:
+                current = {}
+            if current is not None:
+                for tag, value in _OFX_FIELD.findall(line):
+                    current[tag.upper()] = value.strip()
+            if "</STMTTRN>" in upper and current is not None:
+                try:
+                    trans_type, amount = _signed(current.get("TRNAMT", "0"), None)
+                except (TypeError, ValueError, ArithmeticError):
+                    trans_type, amount = None, current.get("TRNAMT")
+                yield {
+                    "type": trans_type,
+                    "category": DEFAULT_CATEGORY,
+                    "amount": amount,
+                    "description": current.get("NAME") or current.get("MEMO", ""),
+                    "date": _ofx_date(current["DTPOSTED"]) if current.get("DTPOSTED") else None,
+                }
+                current = None
+
+
+READERS = {
+    ".csv": read_csv_transactions,
+    ".ofx": read_ofx_transactions,
+    ".qfx": read_ofx_transactions,
+}
+
+
+def import_file(finance_tracker, path, batch_size=1000):
+    """
+    Import a statement file into the tracker's account.
+    :param finance_tracker: The FinanceTracker of the importing user
+    :param path: A .csv, .ofx or .qfx file
+    :return: The add_transactions result; error indexes are 0-based record numbers
+    """
+    extension = path[path.rfind("."):].lower() if "." in path else ""
+    reader = READERS.get(extension)
+    if reader is None:
+        raise ValueError(f"Unsupported statement format: {path}")
+    return finance_tracker.add_transactions(reader(path), batch_size=batch_size)
+
+
+if __name__ == "__main__":
+    import argparse
+    import getpass
+    from auth import Auth
+    from finance_tracker import FinanceTracker
+
+    parser = argparse.ArgumentParser(description="Import a bank statement into the finance tracker.")
+    parser.add_argument("username")
+    parser.add_argument("path")
+    parser.add_argument("--batch-size", type=int, default=1000)
+    args = parser.parse_args()
+
+    # The password unlocks the data key that encrypts the imported descriptions.
+    auth = Auth()
+    keyring = auth.unlock_keys(args.username, getpass.getpass(f"Password for {args.username}: "))
+    tracker = FinanceTracker(args.username, auth.db_manager, keyring)
+    result = import_file(tracker, args.path, batch_size=args.batch_size)
+    for index, message in result["errors"]:
+        print(f"Record {index + 1}: {message}")
+    print(f"{result['inserted']} transactions added, {len(result['errors'])} rejected.")
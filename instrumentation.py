@@ -0,0 +1,328 @@
+"""
+Timing histograms for the hot paths, and opt-in profiling.
+
+Instrumented operations (pool checkouts, queries, transaction writes, password
+hashing, exports) record their duration, and where it means something the
+number of rows they returned or wrote, into a Histogram named after the
+operation, e.g. "db.get_transactions_page" or "export.pdf". Recording costs a
+couple of microseconds: a fixed set of logarithmic buckets is bumped under a
+lock, and p50/p95/p99 are estimated from the buckets only when read.
+
+    @timed("db.category_totals", rows=len)
+    def category_totals(db_manager, username): ...
+
+    with span(f"export.{extension}") as measured:
+        ...
+        measured.rows = written
+
+Metrics are read with ``snapshot()`` and written with ``write_metrics(path)``
+as JSON or in the Prometheus text format; the API server also serves them at
+``GET /metrics``. Environment variables:
+
+* FINANCE_METRICS_FILE: write the metrics there when the process exits
+  (Prometheus text if the name ends in .prom or .txt, JSON otherwise).
+* FINANCE_PROFILING: "cpu", "memory" or "cpu,memory" starts cProfile and/or
+  tracemalloc at import; the results go to FINANCE_PROFILING_DIR (default
+  "profiles") at exit, as cpu-<pid>.prof (open with pstats or snakeviz) and
+  memory-<pid>.txt. On Python before 3.12 cProfile only follows the thread
+  that imported this module.
+"""
+import atexit
+import logging
+import os
+import threading
+import time
+from bisect import bisect_left
+from functools import wraps
+
+logger = logging.getLogger(__name__)
+
+METRICS_FILE_ENV = "FINANCE_METRICS_FILE"
+PROFILING_ENV = "FINANCE_PROFILING"
+PROFILING_DIR_ENV = "FINANCE_PROFILING_DIR"
+
+# Upper bounds in seconds, 1 µs to 750 s with ten steps per decade; a duration
+# counts in the first bucket whose bound is not below it.
+BUCKET_BOUNDS = tuple(float(f"{mantissa}e{exponent}") for exponent in range(-6, 3)
+                      for mantissa in (1, 1.25, 1.5, 2, 2.5, 3, 4, 5, 6, 7.5))
+# The bounds published as Prometheus buckets, 10 µs to 50 s.
+PROMETHEUS_BOUNDS = tuple(bound for bound in BUCKET_BOUNDS
+                          if 1e-5 <= bound <= 50 and f"{bound:e}"[:4] in ("1.00", "2.50", "5.00"))
+QUANTILES = (0.5, 0.95, 0.99)
+
+
+class Histogram:
+    """Duration histogram of one operation, with row and error counters."""
+
+    __slots__ = ("name", "count", "errors", "total", "max", "rows", "_buckets", "_lock")
+
+    def __init__(self, name):
+        self.name = name
+        self._lock = threading.Lock()
+        self.reset()
+
+    def reset(self):
+        with self._lock:
+            self.count = 0
+            self.errors = 0
+            self.total = 0.0
+            self.max = 0.0
+            self.rows = 0
+            self._buckets = [0] * (len(BUCKET_BOUNDS) + 1)
+
+    def record(self, seconds, rows=None, error=False):
+        index = bisect_left(BUCKET_BOUNDS, seconds)
+        with self._lock:
+            self._buckets[index] += 1
+            self.count += 1
+            self.total += seconds
+            if seconds > self.max:
+                self.max = seconds
+            if rows:
+                self.rows += rows
+            if error:
+                self.errors += 1
+
+    def quantile(self, q):
+        """
+        Estimate of the ``q`` quantile in seconds, interpolated within its bucket.
+        :return: The estimate, or 0.0 before anything was recorded
+        """
+        with self._lock:
+            buckets, count, largest = list(self._buckets), self.count, self.max
+        if not count:
+            return 0.0
+        rank = q * count
+        seen = 0
+        for index, in_bucket in enumerate(buckets):
+            if in_bucket and seen + in_bucket >= rank:
+                lower = BUCKET_BOUNDS[index - 1] if index else 0.0
+                upper = BUCKET_BOUNDS[index] if index < len(BUCKET_BOUNDS) else largest
+                return min(lower + (upper - lower) * (rank - seen) / in_bucket, largest)
+            seen += in_bucket
+        return largest
+
+    def cumulative(self, bounds):
+        """:return: (bound, recorded at or below it) pairs for each of ``bounds``"""
+        with self._lock:
+            buckets = list(self._buckets)
+        pairs, seen, index = [], 0, 0
+        for bound in bounds:
+            while index < len(BUCKET_BOUNDS) and BUCKET_BOUNDS[index] <= bound:
+                seen += buckets[index]
+                index += 1
+            pairs.append((bound, seen))
+        return pairs
+
+    def summary(self):
+        """Counters and quantiles in milliseconds, as a JSON-ready dict."""
+        summary = {"count": self.count, "errors": self.errors, "rows": self.rows,
+                   "total_ms": round(self.total * 1000, 3)}
+        for q in QUANTILES:
+            summary[f"p{round(q * 100)}_ms"] = round(self.quantile(q) * 1000, 3)
+        summary["max_ms"] = round(self.max * 1000, 3)
+        return summary
+
+
+class Metrics:
+    """Registry of Histograms by operation name."""
+
+    def __init__(self):
+        self._histograms = {}
+        self._lock = threading.Lock()
+
+    def histogram(self, name):
+        histogram = self._histograms.get(name)
+        if histogram is None:
+            with self._lock:
+                histogram = self._histograms.setdefault(name, Histogram(name))
+        return histogram
+
+    def histograms(self):
+        with self._lock:
+            return sorted(self._histograms.values(), key=lambda histogram: histogram.name)
+
+    def reset(self):
+        """Zero every histogram; decorated functions keep recording into the same objects."""
+        for histogram in self.histograms():
+            histogram.reset()
+
+
+METRICS = Metrics()
+
+
+class span:
+    """
+    Context manager timing one operation; set ``rows`` on it before leaving.
+    Exceptions are counted as errors and re-raised.
+    """
+
+    __slots__ = ("histogram", "rows", "_started")
+
+    def __init__(self, name, metrics=METRICS):
+        self.histogram = metrics.histogram(name)
+        self.rows = None
+
+    def __enter__(self):
+        self._started = time.perf_counter()
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        self.histogram.record(time.perf_counter() - self._started, self.rows, exc_type is not None)
+        return False
+
+
+def timed(name, rows=None, metrics=METRICS):
+    """
+    Decorator recording every call of the function in histogram ``name``.
+    :param rows: Optional callable mapping the return value to a row count
+    """
+    histogram = metrics.histogram(name)
+
+    def decorate(fn):
+        @wraps(fn)
+        def wrapper(*args, **kwargs):
+            started = time.perf_counter()
+            try:
+                result = fn(*args, **kwargs)
+            except BaseException:
+                histogram.record(time.perf_counter() - started, error=True)
+                raise
+            histogram.record(time.perf_counter() - started, rows(result) if rows else None)
+            return result
+        return wrapper
+    return decorate
+
+
+def snapshot(metrics=METRICS):
+    """:return: JSON-ready dict of every operation's summary"""
+    return {
+        "generated_at": time.time(),
+        "pid": os.getpid(),
+        "operations": {histogram.name: histogram.summary() for histogram in metrics.histograms()},
+    }
+
+
+def _label(value):
+    return value.replace("\\", "\\\\").replace('"', '\\"').replace("\n", "\\n")
+
+
+def prometheus_text(metrics=METRICS):
+    """The metrics in the Prometheus text exposition format."""
+    histograms = metrics.histograms()
+    lines = [
+        "# HELP finance_operation_seconds Duration of instrumented operations.",
+        "# TYPE finance_operation_seconds histogram",
+    ]
+    for histogram in histograms:
+        label = f'operation="{_label(histogram.name)}"'
+        for bound, seen in histogram.cumulative(PROMETHEUS_BOUNDS):
+            lines.append(f'finance_operation_seconds_bucket{{{label},le="{bound:g}"}} {seen}')
+        lines.append(f'finance_operation_seconds_bucket{{{label},le="+Inf"}} {histogram.count}')
+        lines.append(f"finance_operation_seconds_sum{{{label}}} {histogram.total:.9f}")
+        lines.append(f"finance_operation_seconds_count{{{label}}} {histogram.count}")
+    for metric, attribute, help_text in (
+        ("finance_operation_rows_total", "rows", "Rows returned or written by instrumented operations."),
+        ("finance_operation_errors_total", "errors", "Instrumented operations that raised."),
+    ):
+        lines.append(f"# HELP {metric} {help_text}")
+        lines.append(f"# TYPE {metric} counter")
+        for histogram in histograms:
+            lines.append(f'{metric}{{operation="{_label(histogram.name)}"}} {getattr(histogram, attribute)}')
+    return "\n".join(lines) + "\n"
+
+
+def write_metrics(path, fmt=None, metrics=METRICS):
+    """
+    Write the metrics to ``path`` atomically.
+    :param fmt: "json" or "prometheus"; by default Prometheus for .prom and .txt files, else JSON
+    :return: path
+    """
+    import json  # Deferred with tempfile: only needed when writing, and off the startup path
+    import tempfile
+
+    if fmt is None:
+        fmt = "prometheus" if path.endswith((".prom", ".txt")) else "json"
+    if fmt == "prometheus":
+        text = prometheus_text(metrics)
+    elif fmt == "json":
+        text = json.dumps(snapshot(metrics), indent=2)
+    else:
+        raise ValueError(f"Unknown metrics format {fmt!r}; choose json or prometheus")
+    directory = os.path.dirname(os.path.abspath(path))
+    os.makedirs(directory, exist_ok=True)
+    fd, temp_path = tempfile.mkstemp(prefix=f".{os.path.basename(path)}.", dir=directory)
+    try:
+        with os.fdopen(fd, "w", encoding="utf-8") as f:
+            f.write(text)
+        os.replace(temp_path, path)
+    except BaseException:
+        os.remove(temp_path)
+        raise
+    return path
+
+
+class Profiler:
+    """
+    cProfile and/or tracemalloc for the whole process.
+    :param cpu: Collect a cProfile profile
+    :param memory: Trace allocations with tracemalloc
+    :param output_dir: Where ``stop`` writes its results
+    """
+
+    def __init__(self, cpu=True, memory=False, output_dir="profiles"):
+        self.output_dir = output_dir
+        self._profile = None
+        self._memory = memory
+        if cpu:
+            import cProfile
+            self._profile = cProfile.Profile()
+            self._profile.enable()
+        if memory:
+            import tracemalloc
+            tracemalloc.start(10)
+
+    def stop(self, top=50):
+        """
+        Stop profiling and write the results.
+        :param top: Allocation sites listed in the memory report
+        :return: Paths of the files written
+        """
+        os.makedirs(self.output_dir, exist_ok=True)
+        paths = []
+        if self._profile is not None:
+            self._profile.disable()
+            path = os.path.join(self.output_dir, f"cpu-{os.getpid()}.prof")
+            self._profile.dump_stats(path)
+            self._profile = None
+            paths.append(path)
+        if self._memory:
+            import tracemalloc
+            current, peak = tracemalloc.get_traced_memory()
+            statistics = tracemalloc.take_snapshot().statistics("lineno")
+            tracemalloc.stop()
+            self._memory = False
+            path = os.path.join(self.output_dir, f"memory-{os.getpid()}.txt")
+            with open(path, "w", encoding="utf-8") as f:
+                f.write(f"current {current / 1e6:.1f} MB, peak {peak / 1e6:.1f} MB\n")
+                f.writelines(f"{statistic}\n" for statistic in statistics[:top])
+            paths.append(path)
+        for path in paths:
+            logger.info("Profile written to %s", path)
+        return paths
+
+
+def _configure_from_env():
+    modes = {mode.strip() for mode in os.environ.get(PROFILING_ENV, "").lower().split(",") if mode.strip()}
+    unknown = modes - {"cpu", "memory"}
+    if unknown:
+        logger.warning("Ignoring unknown %s mode(s): %s", PROFILING_ENV, ", ".join(sorted(unknown)))
+    if modes & {"cpu", "memory"}:
+        profiler = Profiler("cpu" in modes, "memory" in modes, os.environ.get(PROFILING_DIR_ENV) or "profiles")
+        atexit.register(profiler.stop)
+    metrics_file = os.environ.get(METRICS_FILE_ENV)
+    if metrics_file:
+        atexit.register(write_metrics, metrics_file)
+
+
+_configure_from_env()
@@ -1,24 +1,30 @@
+import logging
 import sys
-import pandas as pd
-import matplotlib.pyplot as plt
 from PyQt5.QtWidgets import (
     QApplication, QMainWindow, QWidget, QVBoxLayout, QHBoxLayout, 
     QPushButton, QLabel, QLineEdit, QComboBox, QMessageBox, 
-    QTableWidget, QTableWidgetItem, QDialog, QStackedWidget
+    QTableView, QDialog, QStackedWidget, QProgressDialog
 )
 from PyQt5.QtGui import QFont, QIcon
-from PyQt5.QtCore import Qt
+from PyQt5.QtCore import Qt, QTimer
 
 # Import your existing modules
 from auth import Auth
+from errors import AuthError, FinanceError, InvalidCredentials, InvalidTransaction
 from finance_tracker import FinanceTracker
-from report_generator import export_to_excel, export_to_pdf
 from db_manager import DBManager
+from transaction_model import TransactionTableModel
+from tasks import TaskCancelled
+from qt_tasks import QtTaskExecutor
+from records import to_cents
+
+logger = logging.getLogger(__name__)
 
 class LoginWindow(QDialog):
-    def __init__(self, auth):
+    def __init__(self, auth, executor=None):
         super().__init__()
         self.auth = auth
+        self.executor = executor or QtTaskExecutor()
         self.setWindowTitle("Finance Tracker - Login")
         self.setGeometry(300, 300, 400, 250)
         self.initUI()
@@ -45,12 +51,12 @@ class LoginWindow(QDialog):
 
         # Button Layout
         button_layout = QHBoxLayout()
-        login_btn = QPushButton("Login")
+        self.login_btn = login_btn = QPushButton("Login")
         register_btn = QPushButton("Register")
-        
+
         login_btn.clicked.connect(self.login)
         register_btn.clicked.connect(self.register)
-        
+
         button_layout.addWidget(login_btn)
         button_layout.addWidget(register_btn)
         layout.addLayout(button_layout)
@@ -84,29 +90,157 @@ class LoginWindow(QDialog):
     def login(self):
         username = self.username_input.text()
         password = self.password_input.text()
-        
-        if self.auth.login_user(username, password):
-            self.finance_tracker = FinanceTracker(username)
-            self.main_window = FinanceTrackerApp(self.finance_tracker, username)
-            self.main_window.show()
-            self.close()
-        else:
+
+        self.login_btn.setEnabled(False)
+        self.executor.submit(
+            self.auth.unlock_keys, username, password,
+            on_done=lambda keyring: self.login_finished(username, keyring),
+            on_error=self.login_failed
+        )
+
+    def login_finished(self, username, keyring):
+        self.login_btn.setEnabled(True)
+        self.finance_tracker = FinanceTracker(username, keyring=keyring)
+        self.main_window = FinanceTrackerApp(self.finance_tracker, username, self.executor)
+        self.main_window.show()
+        # Seal descriptions left in plaintext, or finish an interrupted key rotation.
+        self.executor.submit(
+            self.finance_tracker.reencrypt,
+            on_error=lambda e: logger.warning("Background re-encryption failed: %s", e)
+        )
+        self.close()
+
+    def login_failed(self, error):
+        self.login_btn.setEnabled(True)
+        if isinstance(error, InvalidCredentials):
             QMessageBox.warning(self, "Login Failed", "Invalid username or password")
+        else:
+            QMessageBox.critical(self, "Database Error", f"An error occurred: {error}")
 
     def register(self):
         username = self.username_input.text()
         password = self.password_input.text()
-        
-        if self.auth.register_user(username, password):
-            QMessageBox.information(self, "Registration", "Account created successfully!")
-        else:
-            QMessageBox.warning(self, "Registration Failed", "Username already exists")
+
+        def on_error(error):
+            if isinstance(error, AuthError):
+                QMessageBox.warning(self, "Registration Failed", str(error))
+            else:
+                QMessageBox.critical(self, "Database Error", f"An error occurred: {error}")
+
+        self.executor.submit(
+            self.auth.register_user, username, password,
+            on_done=lambda _: QMessageBox.information(self, "Registration", "Account created successfully!"),
+            on_error=on_error
+        )
+
+class TransactionsDialog(QDialog):
+    # Milliseconds of typing pause before the search runs.
+    SEARCH_DELAY = 250
+
+    def __init__(self, finance_tracker, parent=None):
+        super().__init__(parent)
+        self.setWindowTitle("Transactions")
+        self.resize(800, 500)
+        self.model = TransactionTableModel(finance_tracker, parent=self)
+        self.initUI()
+
+    def initUI(self):
+        layout = QVBoxLayout()
+
+        # Searches as you type, once typing pauses, so each keystroke does not hit the index.
+        self.search_input = QLineEdit()
+        self.search_input.setPlaceholderText("Search category or description")
+        self.search_input.setClearButtonEnabled(True)
+        self.search_timer = QTimer(self)
+        self.search_timer.setSingleShot(True)
+        self.search_timer.setInterval(self.SEARCH_DELAY)
+        self.search_timer.timeout.connect(lambda: self.model.set_search(self.search_input.text()))
+        self.search_input.textChanged.connect(self.search_timer.start)
+        layout.addWidget(self.search_input)
+
+        # Filters are applied in SQL by the model
+        filter_layout = QHBoxLayout()
+        self.type_combo = QComboBox()
+        self.type_combo.addItems(["All", "income", "expense"])
+        self.category_input = QLineEdit()
+        self.category_input.setPlaceholderText("Category")
+        self.date_from_input = QLineEdit()
+        self.date_from_input.setPlaceholderText("From (YYYY-MM-DD)")
+        self.date_to_input = QLineEdit()
+        self.date_to_input.setPlaceholderText("To (YYYY-MM-DD)")
+        self.amount_min_input = QLineEdit()
+        self.amount_min_input.setPlaceholderText("Min amount")
+        self.amount_max_input = QLineEdit()
+        self.amount_max_input.setPlaceholderText("Max amount")
+        filter_btn = QPushButton("Filter")
+        filter_btn.clicked.connect(self.apply_filters)
+        for widget in (self.type_combo, self.category_input, self.date_from_input, self.date_to_input,
+                       self.amount_min_input, self.amount_max_input, filter_btn):
+            filter_layout.addWidget(widget)
+        layout.addLayout(filter_layout)
+
+        table = QTableView()
+        table.setModel(self.model)
+        table.setSortingEnabled(True)
+        table.sortByColumn(5, Qt.DescendingOrder)
+        table.verticalHeader().setVisible(False)
+        layout.addWidget(table)
+
+        self.setLayout(layout)
+
+    def apply_filters(self):
+        trans_type = self.type_combo.currentText()
+        amount_min = self.amount_min_input.text().strip() or None
+        amount_max = self.amount_max_input.text().strip() or None
+        try:
+            for amount in (amount_min, amount_max):
+                if amount is not None:
+                    to_cents(amount)
+        except InvalidTransaction as e:
+            QMessageBox.warning(self, "Invalid Filter", str(e))
+            return
+        self.model.set_filters(
+            trans_type=None if trans_type == "All" else trans_type,
+            category=self.category_input.text().strip() or None,
+            date_from=self.date_from_input.text().strip() or None,
+            date_to=self.date_to_input.text().strip() or None,
+            amount_min=amount_min,
+            amount_max=amount_max,
+        )
+
+class InsightsDialog(QDialog):
+    """
+    Visual Insights embedded with FigureCanvasQTAgg. The canvas is kept while
+    the figure is current, so reopening without new data does not redraw.
+    """
+
+    def __init__(self, parent=None):
+        super().__init__(parent)
+        self.setWindowTitle("Visual Insights")
+        self.resize(1100, 700)
+        self.setLayout(QVBoxLayout())
+        self.canvas = None
+
+    def show_figure(self, figure):
+        from matplotlib.backends.backend_qt5agg import FigureCanvasQTAgg  # Deferred: loads matplotlib
+
+        if self.canvas is None or self.canvas.figure is not figure:
+            if self.canvas is not None:
+                self.layout().removeWidget(self.canvas)
+                self.canvas.deleteLater()
+            self.canvas = FigureCanvasQTAgg(figure)
+            self.layout().addWidget(self.canvas)
+        self.show()
+        self.raise_()
+        self.activateWindow()
 
 class FinanceTrackerApp(QMainWindow):
-    def __init__(self, finance_tracker, username):
+    def __init__(self, finance_tracker, username, executor=None):
         super().__init__()
         self.finance_tracker = finance_tracker
         self.username = username
+        self.executor = executor or QtTaskExecutor()
+        self.insights_dialog = None
         self.initUI()
 
     def initUI(self):
@@ -153,6 +287,7 @@ class FinanceTrackerApp(QMainWindow):
             ("Generate Report", self.generate_report),
             ("Export Excel", self.export_excel),
             ("Export PDF", self.export_pdf),
+            ("Rotate Key", self.rotate_key),
             ("Logout", self.logout)
         ]
 
@@ -227,83 +362,95 @@ class FinanceTrackerApp(QMainWindow):
 
     def save_transaction(self, amount, category, type_, dialog):
         try:
-            amount = float(amount)
-            if not category:
-                raise ValueError("Category cannot be empty")
-            
             self.finance_tracker.add_transaction(type_, category, amount)
             QMessageBox.information(self, "Success", "Transaction added successfully!")
             dialog.accept()
-        except ValueError as e:
+        except (ValueError, FinanceError) as e:
             QMessageBox.warning(self, "Error", str(e))
 
     def view_transactions(self):
-        transactions = self.finance_tracker.get_transactions()
-        dialog = QDialog(self)
-        dialog.setWindowTitle("Transactions")
-        layout = QVBoxLayout()
-
-        table = QTableWidget()
-        table.setColumnCount(6)
-        table.setHorizontalHeaderLabels(["ID", "Type", "Category", "Amount", "Description", "Date"])
-        table.setRowCount(len(transactions))
-
-        for row, transaction in enumerate(transactions):
-            for col, value in enumerate(transaction):
-                table.setItem(row, col, QTableWidgetItem(str(value)))
-
-        layout.addWidget(table)
-        dialog.setLayout(layout)
+        dialog = TransactionsDialog(self.finance_tracker, self)
         dialog.exec_()
 
     def visual_insights(self):
-        data = self.finance_tracker.get_transactions()
-        df = pd.DataFrame(data, columns=['ID', 'Type', 'Category', 'Amount', 'Description', 'Date'])
-        
-        category_summary = df.groupby(['Type', 'Category'])['Amount'].sum().unstack(fill_value=0)
-        
-        income_categories = category_summary.loc['income'] if 'income' in category_summary.index else pd.Series()
-        expense_categories = category_summary.loc['expense'] if 'expense' in category_summary.index else pd.Series()
-
-        plt.figure(figsize=(12, 6))
-        bar_width = 0.35
-        index = range(len(set(income_categories.index) | set(expense_categories.index)))
-        
-        plt.bar(index, income_categories, bar_width, label='Income', color='green', alpha=0.7)
-        plt.bar([i + bar_width for i in index], expense_categories, bar_width, label='Expenses', color='red', alpha=0.7)
-        
-        plt.xlabel('Categories', fontsize=10)
-        plt.ylabel('Amount ($)', fontsize=10)
-        plt.title('Financial Insights: Income vs Expenses by Category', fontsize=12)
-        plt.xticks([i + bar_width/2 for i in index], 
-                   list(set(income_categories.index) | set(expense_categories.index)), 
-                   rotation=45, 
-                   ha='right')
-        plt.legend()
-        plt.tight_layout()
-        plt.show()
+        self.executor.submit(
+            self.finance_tracker.get_insights_figure,
+            on_done=self.show_visual_insights,
+            on_error=lambda e: self.show_error("Visual Insights", e)
+        )
+
+    def show_visual_insights(self, figure):
+        if self.insights_dialog is None:
+            self.insights_dialog = InsightsDialog(self)
+        self.insights_dialog.show_figure(figure)
 
     def generate_report(self):
-        summary = self.finance_tracker.get_summary()
+        self.executor.submit(
+            self.finance_tracker.get_summary,
+            on_done=self.show_report,
+            on_error=lambda e: self.show_error("Financial Report", e)
+        )
+
+    def show_report(self, summary):
         report = (f"Total Income: ${summary['total_income']}\n"
                   f"Total Expenses: ${summary['total_expenses']}\n"
                   f"Balance: ${summary['balance']}")
         QMessageBox.information(self, "Financial Report", report)
 
     def export_excel(self):
-        export_to_excel(self.username)
-        QMessageBox.information(self, "Export", "Excel report exported successfully!")
+        self.run_export("Exporting Excel report...", self.finance_tracker.export_to_excel, "Excel")
 
     def export_pdf(self):
-        export_to_pdf(self.username)
-        QMessageBox.information(self, "Export", "PDF report exported successfully!")
+        self.run_export("Exporting PDF report...", self.finance_tracker.export_to_pdf, "PDF")
+
+    def run_export(self, label, export_fn, kind):
+        """Run an export on the worker pool behind a cancellable progress dialog."""
+        progress_dialog = QProgressDialog(label, "Cancel", 0, 0, self)
+        progress_dialog.setWindowModality(Qt.WindowModal)
+        progress_dialog.setMinimumDuration(300)
+
+        def on_progress(done, total):
+            progress_dialog.setMaximum(total or 0)
+            progress_dialog.setValue(done)
+
+        def on_done(result):
+            progress_dialog.close()
+            if result:
+                QMessageBox.information(self, "Export", f"{kind} report exported to {result.path}")
+            else:
+                QMessageBox.information(self, "Export", "No transactions to export.")
+
+        def on_error(error):
+            progress_dialog.close()
+            if not isinstance(error, TaskCancelled):
+                self.show_error("Export", error)
+
+        task = self.executor.submit(export_fn, on_done=on_done, on_error=on_error, on_progress=on_progress)
+        progress_dialog.canceled.connect(task.cancel)
+
+    def rotate_key(self):
+        """Move every description to a new encryption key on the worker pool."""
+        answer = QMessageBox.question(
+            self, "Rotate Key", "Re-encrypt all transaction descriptions with a new key?"
+        )
+        if answer != QMessageBox.Yes:
+            return
+        self.executor.submit(
+            self.finance_tracker.rotate_key,
+            on_done=lambda count: QMessageBox.information(self, "Rotate Key", f"{count} descriptions re-encrypted."),
+            on_error=lambda e: self.show_error("Rotate Key", e)
+        )
+
+    def show_error(self, title, error):
+        QMessageBox.warning(self, title, f"An error occurred: {error}")
 
     def logout(self):
         self.close()
-        login_window = LoginWindow(Auth())
-        login_window.show()
+        self.login_window = LoginWindow(Auth(), self.executor)
+        self.login_window.show()
 
 def main():
+    logging.basicConfig(level=logging.INFO, format="%(asctime)s %(name)s %(levelname)s %(message)s")
     app = QApplication(sys.argv)
     login_window = LoginWindow(Auth())
     login_window.show()
@@ -0,0 +1,116 @@
+"""
+Database maintenance commands.
+
+    python maintenance.py verify-rollups [--repair]
+    python maintenance.py rebuild-rollups [--user USERNAME]
+    python maintenance.py snapshot DEST [--pages N]
+    python maintenance.py sync REPLICA
+    python maintenance.py backup DIRECTORY [--full]
+    python maintenance.py restore DIRECTORY DEST
+    python maintenance.py prune-journal --through SEQ
+"""
+import argparse
+import backup
+from db_manager import DBManager
+from errors import BackupError
+
+
+def verify_rollups(db_manager, repair=False):
+    drifted = db_manager.verify_rollups(repair=repair)
+    if not drifted:
+        print("Rollups are consistent with transactions.")
+    else:
+        action = "Repaired" if repair else "Drift detected for"
+        print(f"{action} {len(drifted)} user(s): {', '.join(drifted)}")
+    return drifted
+
+
+def rebuild_rollups(db_manager, username=None):
+    db_manager.rebuild_rollups(username)
+    print(f"Rollups rebuilt for {username or 'all users'}.")
+
+
+def snapshot(db_manager, dest, pages):
+    def progress(done, total):
+        print(f"\r{done:,}/{total:,} pages", end="", flush=True)
+
+    result = backup.snapshot(db_manager, dest, pages, progress)
+    print(f"\nSnapshot written to {result.path} in {result.seconds:.1f}s (checkpoint {result.checkpoint}).")
+
+
+def sync(db_manager, replica):
+    result = backup.sync_database(db_manager, replica)
+    print(f"{replica} synced to {result.to_seq}: {result.upserted} row(s) copied, "
+          f"{result.deleted} deleted in {result.seconds:.2f}s.")
+
+
+def backup_directory(db_manager, directory, full=False):
+    result = backup.backup_directory(db_manager, directory, full)
+    if isinstance(result, backup.SnapshotResult):
+        print(f"Base snapshot written to {result.path} in {result.seconds:.1f}s.")
+    elif result.path is None:
+        print("No changes since the last backup.")
+    else:
+        print(f"Changes {result.from_seq + 1}-{result.to_seq} written to {result.path}: "
+              f"{result.upserted} row(s), {result.deleted} deletion(s) in {result.seconds:.2f}s.")
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Finance tracker database maintenance.")
+    parser.add_argument("--db", default="data/finance.db", help="Path to the finance database")
+    commands = parser.add_subparsers(dest="command", required=True)
+
+    verify = commands.add_parser("verify-rollups", help="Check balances and monthly rollups for drift")
+    verify.add_argument("--repair", action="store_true", help="Rebuild the rollups of drifted users")
+
+    rebuild = commands.add_parser("rebuild-rollups", help="Recompute balances and monthly rollups")
+    rebuild.add_argument("--user", help="Only rebuild this user")
+
+    snap = commands.add_parser("snapshot", help="Copy the database while it is in use")
+    snap.add_argument("dest", help="File to write the copy to")
+    snap.add_argument("--pages", type=int, default=backup.SNAPSHOT_PAGES, help="Pages copied per step")
+
+    sync_parser = commands.add_parser("sync", help="Bring a snapshot up to date from the change journal")
+    sync_parser.add_argument("replica", help="A database made by the snapshot command")
+
+    backup_parser = commands.add_parser("backup", help="Incremental backup into a directory")
+    backup_parser.add_argument("directory")
+    backup_parser.add_argument("--full", action="store_true", help="Start again from a new base snapshot")
+
+    restore = commands.add_parser("restore", help="Rebuild a database from a backup directory")
+    restore.add_argument("directory")
+    restore.add_argument("dest", help="Database file to create")
+
+    prune = commands.add_parser("prune-journal", help="Drop change journal entries every copy has replayed")
+    prune.add_argument("--through", type=int, required=True, help="Last sequence number to drop")
+
+    args = parser.parse_args(argv)
+    if args.command == "restore":
+        try:
+            seq = backup.restore_directory(args.directory, args.dest)
+        except BackupError as e:
+            parser.exit(1, f"{e}\n")
+        print(f"Restored {args.dest} up to change {seq}.")
+        return 0
+    db_manager = DBManager(args.db)
+
+    if args.command == "verify-rollups":
+        return 1 if verify_rollups(db_manager, args.repair) and not args.repair else 0
+    if args.command == "rebuild-rollups":
+        rebuild_rollups(db_manager, args.user)
+    try:
+        if args.command == "snapshot":
+            snapshot(db_manager, args.dest, args.pages)
+        elif args.command == "sync":
+            sync(db_manager, args.replica)
+        elif args.command == "backup":
+            backup_directory(db_manager, args.directory, args.full)
+    except BackupError as e:
+        parser.exit(1, f"{e}\n")
+    if args.command == "prune-journal":
+        print(f"Dropped {backup.prune_journal(db_manager, args.through)} journal entries.")
+    return 0
+
+
+if __name__ == "__main__":
+    raise SystemExit(main())
@@ -0,0 +1,498 @@
+"""
+Versioned schema migrations for the finance database.
+
+The schema version lives in ``PRAGMA user_version``. Each migration is a
+``(version, steps)`` pair where every step is either an SQL statement or a
+callable taking the connection. Pending migrations run in order, each one in
+its own transaction, so a failure leaves the database at the last good version.
+"""
+
+
+def _rebuild_transactions_in_cents(conn):
+    """
+    Rebuild transactions with an INTEGER amount_cents column in place of the
+    REAL amount (SQLite cannot change a column's type in place), keeping ids
+    and the AUTOINCREMENT high-water mark.
+    """
+    sequence = conn.execute("SELECT seq FROM sqlite_sequence WHERE name = 'transactions'").fetchone()
+    conn.execute("""
+        CREATE TABLE transactions_new (
+            id INTEGER PRIMARY KEY AUTOINCREMENT,
+            username TEXT NOT NULL,
+            type TEXT NOT NULL CHECK (type IN ('income', 'expense')),
+            category TEXT NOT NULL,
+            amount_cents INTEGER NOT NULL,
+            description TEXT,
+            date TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
+            FOREIGN KEY (username) REFERENCES users (username)
+        )
+    """)
+    conn.execute("""
+        INSERT INTO transactions_new (id, username, type, category, amount_cents, description, date)
+        SELECT id, username, type, category, CAST(ROUND(amount * 100) AS INTEGER), description, date
+        FROM transactions
+    """)
+    # Dropping the table also drops its indexes and rollup triggers; both are recreated below.
+    conn.execute("DROP TABLE transactions")
+    conn.execute("ALTER TABLE transactions_new RENAME TO transactions")
+    if sequence is not None:
+        conn.execute("UPDATE sqlite_sequence SET seq = MAX(seq, ?) WHERE name = 'transactions'", sequence)
+
+    # Rollups move to cents too; their version counters carry over so caches stay valid.
+    conn.execute("ALTER TABLE user_balances RENAME TO user_balances_old")
+    conn.execute("DROP TABLE monthly_rollups")
+    conn.execute("""
+        CREATE TABLE user_balances (
+            username TEXT PRIMARY KEY,
+            total_income_cents INTEGER NOT NULL DEFAULT 0,
+            total_expenses_cents INTEGER NOT NULL DEFAULT 0,
+            tx_count INTEGER NOT NULL DEFAULT 0,
+            version INTEGER NOT NULL DEFAULT 0
+        ) WITHOUT ROWID
+    """)
+    conn.execute("""
+        CREATE TABLE monthly_rollups (
+            username TEXT NOT NULL,
+            month TEXT NOT NULL,
+            type TEXT NOT NULL,
+            total_cents INTEGER NOT NULL DEFAULT 0,
+            tx_count INTEGER NOT NULL DEFAULT 0,
+            PRIMARY KEY (username, month, type)
+        ) WITHOUT ROWID
+    """)
+    conn.execute("""
+        INSERT INTO user_balances (username, total_income_cents, total_expenses_cents, tx_count, version)
+        SELECT old.username,
+               COALESCE(SUM(CASE WHEN t.type = 'income' THEN t.amount_cents ELSE 0 END), 0),
+               COALESCE(SUM(CASE WHEN t.type = 'expense' THEN t.amount_cents ELSE 0 END), 0),
+               COUNT(t.id), old.version + 1
+        FROM user_balances_old AS old
+        LEFT JOIN transactions AS t ON t.username = old.username
+        GROUP BY old.username
+    """)
+    conn.execute("DROP TABLE user_balances_old")
+    conn.execute("""
+        INSERT OR IGNORE INTO user_balances (username, total_income_cents, total_expenses_cents, tx_count)
+        SELECT username,
+               SUM(CASE WHEN type = 'income' THEN amount_cents ELSE 0 END),
+               SUM(CASE WHEN type = 'expense' THEN amount_cents ELSE 0 END),
+               COUNT(*)
+        FROM transactions
+        GROUP BY username
+    """)
+    conn.execute("""
+        INSERT INTO monthly_rollups (username, month, type, total_cents, tx_count)
+        SELECT username, COALESCE(substr(date, 1, 7), ''), type, SUM(amount_cents), COUNT(*)
+        FROM transactions
+        GROUP BY username, COALESCE(substr(date, 1, 7), ''), type
+    """)
+
+
+# Trigger bodies shared by the cents schema; {row} is "new" or "old" and {sign} is + or -.
+_BALANCE_DELTA = """
+            UPDATE user_balances
+            SET total_income_cents = total_income_cents {sign} (CASE WHEN {row}.type = 'income' THEN {row}.amount_cents ELSE 0 END),
+                total_expenses_cents = total_expenses_cents {sign} (CASE WHEN {row}.type = 'expense' THEN {row}.amount_cents ELSE 0 END),
+                tx_count = tx_count {sign} 1,
+                version = version + 1
+            WHERE username = {row}.username;
+"""
+_ADD_ROW = (
+    "INSERT OR IGNORE INTO user_balances (username) VALUES (new.username);"
+    + _BALANCE_DELTA.format(row="new", sign="+")
+    + """
+            INSERT OR IGNORE INTO monthly_rollups (username, month, type)
+            VALUES (new.username, COALESCE(substr(new.date, 1, 7), ''), new.type);
+            UPDATE monthly_rollups
+            SET total_cents = total_cents + new.amount_cents, tx_count = tx_count + 1
+            WHERE username = new.username AND month = COALESCE(substr(new.date, 1, 7), '') AND type = new.type;
+"""
+)
+_REMOVE_ROW = (
+    _BALANCE_DELTA.format(row="old", sign="-")
+    + """
+            UPDATE monthly_rollups
+            SET total_cents = total_cents - old.amount_cents, tx_count = tx_count - 1
+            WHERE username = old.username AND month = COALESCE(substr(old.date, 1, 7), '') AND type = old.type;
+            DELETE FROM monthly_rollups
+            WHERE username = old.username AND month = COALESCE(substr(old.date, 1, 7), '') AND type = old.type
+              AND tx_count <= 0;
+"""
+)
+# The search document of a transaction row: the owner as a single hex token,
+# the category, the description unless it is sealed, and the blind-index terms.
+_SEARCH_DOCUMENT = """
+    hex({row}.username), {row}.category,
+    CASE WHEN substr({row}.description, 1, 5) = 'enc1:' THEN '' ELSE COALESCE({row}.description, '') END,
+    COALESCE({row}.search_terms, '')
+"""
+_INDEX_ROW = (
+    "INSERT INTO transactions_fts (rowid, owner, category, description, terms) "
+    "VALUES (new.id, " + _SEARCH_DOCUMENT.format(row="new") + ");"
+)
+# External-content FTS5 rows are removed by replaying the values they were indexed with.
+_UNINDEX_ROW = (
+    "INSERT INTO transactions_fts (transactions_fts, rowid, owner, category, description, terms) "
+    "VALUES ('delete', old.id, " + _SEARCH_DOCUMENT.format(row="old") + ");"
+)
+
+# Tables whose row changes are journaled, with the column that identifies a row.
+# Parents come first: copies are brought up to date in this order.
+JOURNALED_TABLES = {"users": "id", "transactions": "id", "user_keys": "username"}
+
+
+def _journal_triggers():
+    """Triggers appending every insert, update and delete of JOURNALED_TABLES to change_journal."""
+    for table, key in JOURNALED_TABLES.items():
+        yield f"""
+        CREATE TRIGGER trg_{table}_journal_insert AFTER INSERT ON {table}
+        BEGIN
+            INSERT INTO change_journal (table_name, row_key, op) VALUES ('{table}', new.{key}, 'insert');
+        END
+        """
+        # A changed key journals the old key as deleted and the new one as inserted.
+        yield f"""
+        CREATE TRIGGER trg_{table}_journal_update AFTER UPDATE ON {table}
+        BEGIN
+            INSERT INTO change_journal (table_name, row_key, op)
+            VALUES ('{table}', old.{key}, CASE WHEN new.{key} IS old.{key} THEN 'update' ELSE 'delete' END);
+            INSERT INTO change_journal (table_name, row_key, op)
+            SELECT '{table}', new.{key}, 'insert' WHERE new.{key} IS NOT old.{key};
+        END
+        """
+        yield f"""
+        CREATE TRIGGER trg_{table}_journal_delete AFTER DELETE ON {table}
+        BEGIN
+            INSERT INTO change_journal (table_name, row_key, op) VALUES ('{table}', old.{key}, 'delete');
+        END
+        """
+
+
+MIGRATIONS = [
+    (1, [
+        """
+        CREATE TABLE IF NOT EXISTS users (
+            id INTEGER PRIMARY KEY AUTOINCREMENT,
+            username TEXT UNIQUE NOT NULL,
+            password TEXT NOT NULL
+        )
+        """,
+        """
+        CREATE TABLE IF NOT EXISTS transactions (
+            id INTEGER PRIMARY KEY AUTOINCREMENT,
+            username TEXT NOT NULL,
+            type TEXT NOT NULL CHECK (type IN ('income', 'expense')),
+            category TEXT NOT NULL,
+            amount REAL NOT NULL,
+            description TEXT,
+            date TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
+            FOREIGN KEY (username) REFERENCES users (username)
+        )
+        """,
+    ]),
+    # Every reader filters by username; most order by date or sum by type.
+    (2, [
+        "CREATE INDEX IF NOT EXISTS idx_transactions_username_date ON transactions (username, date)",
+        "CREATE INDEX IF NOT EXISTS idx_transactions_username_type_amount ON transactions (username, type, amount)",
+    ]),
+    # Materialized per-user balances and monthly rollups, kept current by triggers
+    # so summaries are a primary-key lookup instead of a scan.
+    (3, [
+        """
+        CREATE TABLE IF NOT EXISTS user_balances (
+            username TEXT PRIMARY KEY,
+            total_income REAL NOT NULL DEFAULT 0,
+            total_expenses REAL NOT NULL DEFAULT 0,
+            tx_count INTEGER NOT NULL DEFAULT 0,
+            version INTEGER NOT NULL DEFAULT 0
+        ) WITHOUT ROWID
+        """,
+        """
+        CREATE TABLE IF NOT EXISTS monthly_rollups (
+            username TEXT NOT NULL,
+            month TEXT NOT NULL,
+            type TEXT NOT NULL,
+            total REAL NOT NULL DEFAULT 0,
+            tx_count INTEGER NOT NULL DEFAULT 0,
+            PRIMARY KEY (username, month, type)
+        ) WITHOUT ROWID
+        """,
+        """
+        CREATE TRIGGER IF NOT EXISTS trg_transactions_rollup_insert AFTER INSERT ON transactions
+        BEGIN
+            INSERT OR IGNORE INTO user_balances (username) VALUES (new.username);
+            UPDATE user_balances
+            SET total_income = total_income + (CASE WHEN new.type = 'income' THEN new.amount ELSE 0 END),
+                total_expenses = total_expenses + (CASE WHEN new.type = 'expense' THEN new.amount ELSE 0 END),
+                tx_count = tx_count + 1,
+                version = version + 1
+            WHERE username = new.username;
+            INSERT OR IGNORE INTO monthly_rollups (username, month, type)
+            VALUES (new.username, COALESCE(substr(new.date, 1, 7), ''), new.type);
+            UPDATE monthly_rollups
+            SET total = total + new.amount, tx_count = tx_count + 1
+            WHERE username = new.username AND month = COALESCE(substr(new.date, 1, 7), '') AND type = new.type;
+        END
+        """,
+        """
+        CREATE TRIGGER IF NOT EXISTS trg_transactions_rollup_delete AFTER DELETE ON transactions
+        BEGIN
+            UPDATE user_balances
+            SET total_income = total_income - (CASE WHEN old.type = 'income' THEN old.amount ELSE 0 END),
+                total_expenses = total_expenses - (CASE WHEN old.type = 'expense' THEN old.amount ELSE 0 END),
+                tx_count = tx_count - 1,
+                version = version + 1
+            WHERE username = old.username;
+            UPDATE monthly_rollups
+            SET total = total - old.amount, tx_count = tx_count - 1
+            WHERE username = old.username AND month = COALESCE(substr(old.date, 1, 7), '') AND type = old.type;
+            DELETE FROM monthly_rollups
+            WHERE username = old.username AND month = COALESCE(substr(old.date, 1, 7), '') AND type = old.type
+              AND tx_count <= 0;
+        END
+        """,
+        """
+        CREATE TRIGGER IF NOT EXISTS trg_transactions_rollup_update
+        AFTER UPDATE OF username, type, amount, date ON transactions
+        BEGIN
+            UPDATE user_balances
+            SET total_income = total_income - (CASE WHEN old.type = 'income' THEN old.amount ELSE 0 END),
+                total_expenses = total_expenses - (CASE WHEN old.type = 'expense' THEN old.amount ELSE 0 END),
+                tx_count = tx_count - 1,
+                version = version + 1
+            WHERE username = old.username;
+            UPDATE monthly_rollups
+            SET total = total - old.amount, tx_count = tx_count - 1
+            WHERE username = old.username AND month = COALESCE(substr(old.date, 1, 7), '') AND type = old.type;
+            DELETE FROM monthly_rollups
+            WHERE username = old.username AND month = COALESCE(substr(old.date, 1, 7), '') AND type = old.type
+              AND tx_count <= 0;
+
+            INSERT OR IGNORE INTO user_balances (username) VALUES (new.username);
+            UPDATE user_balances
+            SET total_income = total_income + (CASE WHEN new.type = 'income' THEN new.amount ELSE 0 END),
+                total_expenses = total_expenses + (CASE WHEN new.type = 'expense' THEN new.amount ELSE 0 END),
+                tx_count = tx_count + 1,
+                version = version + 1
+            WHERE username = new.username;
+            INSERT OR IGNORE INTO monthly_rollups (username, month, type)
+            VALUES (new.username, COALESCE(substr(new.date, 1, 7), ''), new.type);
+            UPDATE monthly_rollups
+            SET total = total + new.amount, tx_count = tx_count + 1
+            WHERE username = new.username AND month = COALESCE(substr(new.date, 1, 7), '') AND type = new.type;
+        END
+        """,
+        """
+        INSERT OR REPLACE INTO user_balances (username, total_income, total_expenses, tx_count, version)
+        SELECT username,
+               SUM(CASE WHEN type = 'income' THEN amount ELSE 0 END),
+               SUM(CASE WHEN type = 'expense' THEN amount ELSE 0 END),
+               COUNT(*), 0
+        FROM transactions
+        GROUP BY username
+        """,
+        """
+        INSERT OR REPLACE INTO monthly_rollups (username, month, type, total, tx_count)
+        SELECT username, COALESCE(substr(date, 1, 7), ''), type, SUM(amount), COUNT(*)
+        FROM transactions
+        GROUP BY username, COALESCE(substr(date, 1, 7), ''), type
+        """,
+    ]),
+    # Indexes behind the sortable columns of the transactions table view; each one
+    # ends in the implicit rowid so (column, id) keyset pages are range scans.
+    (4, [
+        "CREATE INDEX IF NOT EXISTS idx_transactions_username ON transactions (username)",
+        "CREATE INDEX IF NOT EXISTS idx_transactions_username_category ON transactions (username, category)",
+        "CREATE INDEX IF NOT EXISTS idx_transactions_username_amount ON transactions (username, amount)",
+        """
+        CREATE INDEX IF NOT EXISTS idx_transactions_username_description
+        ON transactions (username, COALESCE(description, ''))
+        """,
+    ]),
+    # Money as integer cents: exact SUMs, and smaller rows than REAL for typical amounts.
+    (5, [
+        _rebuild_transactions_in_cents,
+        "CREATE INDEX idx_transactions_username_date ON transactions (username, date)",
+        "CREATE INDEX idx_transactions_username_type_amount ON transactions (username, type, amount_cents)",
+        "CREATE INDEX idx_transactions_username ON transactions (username)",
+        "CREATE INDEX idx_transactions_username_category ON transactions (username, category)",
+        "CREATE INDEX idx_transactions_username_amount ON transactions (username, amount_cents)",
+        """
+        CREATE INDEX idx_transactions_username_description
+        ON transactions (username, COALESCE(description, ''))
+        """,
+        f"""
+        CREATE TRIGGER trg_transactions_rollup_insert AFTER INSERT ON transactions
+        BEGIN
+            {_ADD_ROW}
+        END
+        """,
+        f"""
+        CREATE TRIGGER trg_transactions_rollup_delete AFTER DELETE ON transactions
+        BEGIN
+            {_REMOVE_ROW}
+        END
+        """,
+        f"""
+        CREATE TRIGGER trg_transactions_rollup_update
+        AFTER UPDATE OF username, type, amount_cents, date ON transactions
+        BEGIN
+            {_REMOVE_ROW}
+            {_ADD_ROW}
+        END
+        """,
+    ]),
+    # Per-user data keys for encrypted descriptions, wrapped by a key derived from
+    # the password. Existing descriptions are sealed after each user's next login.
+    (6, [
+        """
+        CREATE TABLE user_keys (
+            username TEXT PRIMARY KEY,
+            kdf TEXT NOT NULL,
+            wrapped_key TEXT NOT NULL,
+            old_keys TEXT,
+            reencrypt_after INTEGER,
+            FOREIGN KEY (username) REFERENCES users (username)
+        ) WITHOUT ROWID
+        """,
+    ]),
+    # Fire the update trigger on category changes too: the rollups are unchanged,
+    # but the version bump invalidates cached per-category charts.
+    (7, [
+        "DROP TRIGGER trg_transactions_rollup_update",
+        f"""
+        CREATE TRIGGER trg_transactions_rollup_update
+        AFTER UPDATE OF username, type, category, amount_cents, date ON transactions
+        BEGIN
+            {_REMOVE_ROW}
+            {_ADD_ROW}
+        END
+        """,
+    ]),
+    # user_balances.version doubles as the per-user data version for query caches,
+    # so description-only edits (and re-encryption) must move it too.
+    (8, [
+        """
+        CREATE TRIGGER trg_transactions_version_description
+        AFTER UPDATE OF description ON transactions
+        BEGIN
+            UPDATE user_balances SET version = version + 1 WHERE username = new.username;
+        END
+        """,
+    ]),
+    # Full-text search. Sealed descriptions are indexed through search_terms, a
+    # blind index the application writes next to the ciphertext; the partial
+    # index finds sealed rows still missing it so re-encryption can fill them in.
+    (9, [
+        "ALTER TABLE transactions ADD COLUMN search_terms TEXT",
+        "ALTER TABLE user_keys ADD COLUMN wrapped_search_key TEXT",
+        f"""
+        CREATE VIEW transaction_search_documents (id, owner, category, description, terms) AS
+        SELECT id, {_SEARCH_DOCUMENT.format(row="transactions")}
+        FROM transactions
+        """,
+        """
+        CREATE VIRTUAL TABLE transactions_fts USING fts5(
+            owner, category, description, terms,
+            content = 'transaction_search_documents', content_rowid = 'id',
+            tokenize = 'unicode61 remove_diacritics 2', prefix = '2 3', detail = column
+        )
+        """,
+        f"""
+        CREATE TRIGGER trg_transactions_search_insert AFTER INSERT ON transactions
+        BEGIN
+            {_INDEX_ROW}
+        END
+        """,
+        f"""
+        CREATE TRIGGER trg_transactions_search_delete AFTER DELETE ON transactions
+        BEGIN
+            {_UNINDEX_ROW}
+        END
+        """,
+        f"""
+        CREATE TRIGGER trg_transactions_search_update
+        AFTER UPDATE OF username, category, description, search_terms ON transactions
+        BEGIN
+            {_UNINDEX_ROW}
+            {_INDEX_ROW}
+        END
+        """,
+        "INSERT INTO transactions_fts (transactions_fts) VALUES ('rebuild')",
+        """
+        CREATE INDEX idx_transactions_unsearchable ON transactions (username, id)
+        WHERE search_terms IS NULL AND substr(description, 1, 5) = 'enc1:'
+        """,
+    ]),
+    # Change journal for incremental backups (see backup.py). AUTOINCREMENT keeps
+    # seq growing even after the journal is pruned; journal_meta holds this
+    # database's identity and how far the journal was pruned, and
+    # sync_checkpoints how far this database, as a copy, has replayed others.
+    (10, [
+        """
+        CREATE TABLE change_journal (
+            seq INTEGER PRIMARY KEY AUTOINCREMENT,
+            table_name TEXT NOT NULL,
+            row_key NOT NULL,
+            op TEXT NOT NULL CHECK (op IN ('insert', 'update', 'delete')),
+            changed_at TEXT NOT NULL DEFAULT CURRENT_TIMESTAMP
+        )
+        """,
+        "CREATE TABLE journal_meta (name TEXT PRIMARY KEY, value) WITHOUT ROWID",
+        """
+        INSERT INTO journal_meta (name, value)
+        VALUES ('database_id', lower(hex(randomblob(16)))), ('pruned_through', 0)
+        """,
+        """
+        CREATE TABLE sync_checkpoints (
+            source_id TEXT PRIMARY KEY,
+            last_seq INTEGER NOT NULL,
+            synced_at TEXT NOT NULL DEFAULT CURRENT_TIMESTAMP
+        ) WITHOUT ROWID
+        """,
+        *_journal_triggers(),
+    ]),
+]
+
+LATEST_VERSION = MIGRATIONS[-1][0]
+
+
+def get_version(conn):
+    return conn.execute("PRAGMA user_version").fetchone()[0]
+
+
+def migrate(conn, target=LATEST_VERSION):
+    """
+    Bring the database up to ``target``.
+    :param conn: An open sqlite3 connection
+    :param target: The schema version to stop at
+    :return: The schema version after migrating
+    """
+    current = get_version(conn)
+    if conn.in_transaction:
+        conn.commit()
+
+    for version, steps in MIGRATIONS:
+        if version <= current or version > target:
+            continue
+        conn.execute("BEGIN IMMEDIATE")
+        try:
+            # Another process may have migrated between our read and the lock;
+            # the steps are not idempotent, so check again under the lock.
+            current = get_version(conn)
+            if version <= current:
+                conn.commit()
+                continue
+            for step in steps:
+                if callable(step):
+                    step(conn)
+                else:
+                    conn.execute(step)
+            conn.execute(f"PRAGMA user_version = {version}")
+            conn.commit()
+        except BaseException:
+            conn.rollback()
+            raise
+        current = version
+
+    return current
@@ -0,0 +1,213 @@
+"""
+Password hashing.
+
+Hashes are stored in a self-describing format so the work factor can be raised
+later without invalidating existing accounts:
+
+    scrypt$n=32768,r=8,p=1$<salt>$<hash>
+    pbkdf2_sha256$600000$<salt>$<hash>
+
+Rows written before this format existed hold a bare SHA-256 hex digest; they
+still verify, and ``needs_rehash`` reports them so they can be upgraded on the
+next successful login.
+"""
+import base64
+import hashlib
+import hmac
+import os
+import threading
+import time
+from collections import OrderedDict
+
+from instrumentation import timed
+
+SALT_BYTES = 16
+SCRYPT_DEFAULTS = {"n": 2 ** 15, "r": 8, "p": 1}
+PBKDF2_DEFAULT_ITERATIONS = 600_000
+
+
+def _b64encode(data):
+    return base64.b64encode(data).decode("ascii").rstrip("=")
+
+
+def _b64decode(text):
+    return base64.b64decode(text + "=" * (-len(text) % 4))
+
+
+def _is_legacy(stored):
+    return len(stored) == 64 and "$" not in stored
+
+
+def _env_int(name, minimum):
+    """:return: The integer in environment variable ``name``, or None if it is unset or empty"""
+    value = os.environ.get(name, "").strip()
+    if not value:
+        return None
+    try:
+        number = int(value)
+    except ValueError:
+        raise ValueError(f"{name} must be an integer, got {value!r}") from None
+    if number < minimum:
+        raise ValueError(f"{name} must be at least {minimum}, got {number}")
+    return number
+
+
+class PasswordHasher:
+    """
+    Hashes and verifies passwords with scrypt or PBKDF2-HMAC-SHA256.
+    :param scheme: "scrypt" or "pbkdf2_sha256"
+    :param n, r, p: scrypt cost, block size and parallelism
+    :param iterations: PBKDF2 iteration count
+    """
+
+    def __init__(self, scheme="scrypt", n=None, r=None, p=None, iterations=None):
+        if scheme not in ("scrypt", "pbkdf2_sha256"):
+            raise ValueError(f"Unknown password hashing scheme: {scheme}")
+        self.scheme = scheme
+        self.scrypt_params = {
+            "n": n or SCRYPT_DEFAULTS["n"],
+            "r": r or SCRYPT_DEFAULTS["r"],
+            "p": p or SCRYPT_DEFAULTS["p"],
+        }
+        self.iterations = iterations or PBKDF2_DEFAULT_ITERATIONS
+
+    @classmethod
+    def from_env(cls):
+        """
+        Build a hasher from FINANCE_KDF ("scrypt" or "pbkdf2_sha256"),
+        FINANCE_SCRYPT_N and FINANCE_PBKDF2_ITERATIONS, falling back to the
+        defaults for unset or empty variables.
+        :raises ValueError: If a variable is set to an unusable value
+        """
+        n = _env_int("FINANCE_SCRYPT_N", minimum=2)
+        if n is not None and n & (n - 1):
+            raise ValueError(f"FINANCE_SCRYPT_N must be a power of two, got {n}")
+        return cls(
+            scheme=os.environ.get("FINANCE_KDF") or "scrypt",
+            n=n,
+            iterations=_env_int("FINANCE_PBKDF2_ITERATIONS", minimum=1),
+        )
+
+    def _encode(self, salt, digest):
+        if self.scheme == "scrypt":
+            params = self.scrypt_params
+            encoded_params = f"n={params['n']},r={params['r']},p={params['p']}"
+        else:
+            encoded_params = str(self.iterations)
+        return f"{self.scheme}${encoded_params}${_b64encode(salt)}${_b64encode(digest)}"
+
+    def dummy_hash(self):
+        """
+        A hash no password matches, with this hasher's scheme and parameters,
+        so verifying against it costs the same as a real check. Made from random
+        bytes, without running the KDF.
+        """
+        return self._encode(os.urandom(SALT_BYTES), os.urandom(32))
+
+    def _scrypt(self, password, salt, n, r, p):
+        # hashlib's default 32 MiB limit is too small for n=2**15 and above.
+        return hashlib.scrypt(password.encode(), salt=salt, n=n, r=r, p=p, maxmem=256 * r * n + 1024 * 1024, dklen=32)
+
+    def _pbkdf2(self, password, salt, iterations):
+        return hashlib.pbkdf2_hmac("sha256", password.encode(), salt, iterations)
+
+    @timed("auth.hash_password")
+    def hash(self, password):
+        """
+        Hash a password with a fresh salt.
+        :return: The encoded hash, including scheme, parameters and salt
+        """
+        salt = os.urandom(SALT_BYTES)
+        if self.scheme == "scrypt":
+            digest = self._scrypt(password, salt, **self.scrypt_params)
+        else:
+            digest = self._pbkdf2(password, salt, self.iterations)
+        return self._encode(salt, digest)
+
+    @timed("auth.verify_password")
+    def verify(self, password, stored):
+        """
+        Check a password against a stored hash in any supported format.
+        :return: True if the password matches
+        """
+        if not stored:
+            return False
+        if _is_legacy(stored):
+            candidate = hashlib.sha256(password.encode()).hexdigest()
+            return hmac.compare_digest(candidate, stored)
+        try:
+            scheme, params, salt, digest = stored.split("$")
+            salt, digest = _b64decode(salt), _b64decode(digest)
+            if scheme == "scrypt":
+                values = dict(item.split("=") for item in params.split(","))
+                candidate = self._scrypt(password, salt, int(values["n"]), int(values["r"]), int(values["p"]))
+            elif scheme == "pbkdf2_sha256":
+                candidate = self._pbkdf2(password, salt, int(params))
+            else:
+                return False
+        except (ValueError, KeyError):
+            return False
+        return hmac.compare_digest(candidate, digest)
+
+    def needs_rehash(self, stored):
+        """True if the hash uses a legacy format or different parameters than this hasher."""
+        if _is_legacy(stored):
+            return True
+        scheme, _, params = stored.partition("$")
+        params = params.split("$", 1)[0]
+        if scheme != self.scheme:
+            return True
+        if scheme == "scrypt":
+            p = self.scrypt_params
+            return params != f"n={p['n']},r={p['r']},p={p['p']}"
+        return params != str(self.iterations)
+
+
+class VerificationCache:
+    """
+    Remembers recent successful logins for a short time so re-authentication
+    within a session skips the KDF.
+
+    Entries are keyed by an HMAC of the username and password under a key that
+    exists only in this process, and record the stored hash they were checked
+    against, so a password change invalidates them.
+    :param max_entries: Oldest entries are dropped beyond this size
+    :param ttl: Seconds an entry stays valid
+    """
+
+    def __init__(self, max_entries=64, ttl=300):
+        self.max_entries = max_entries
+        self.ttl = ttl
+        self._key = os.urandom(32)
+        self._entries = OrderedDict()
+        self._lock = threading.Lock()
+
+    def _entry_key(self, username, password):
+        message = username.encode() + b"\0" + password.encode()
+        return hmac.new(self._key, message, hashlib.sha256).digest()
+
+    def check(self, username, password, stored):
+        """:return: True if this password was verified against ``stored`` within the TTL"""
+        key = self._entry_key(username, password)
+        now = time.monotonic()
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None:
+                return False
+            cached_hash, expires = entry
+            if expires < now or not hmac.compare_digest(cached_hash, stored):
+                del self._entries[key]
+                return False
+            return True
+
+    def add(self, username, password, stored):
+        key = self._entry_key(username, password)
+        with self._lock:
+            self._entries[key] = (stored, time.monotonic() + self.ttl)
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
@@ -0,0 +1,201 @@
+"""
+PDF statement engine.
+
+Rows are streamed from the database and drawn against a column layout that is
+computed once per report (widths, alignment, truncation limits), with fonts
+selected once per section rather than per cell. Summary, monthly and category
+sections come from the aggregated SQL in ``aggregations`` instead of raw rows.
+"""
+from collections import namedtuple
+from fpdf import FPDF
+
+from aggregations import category_totals, monthly_totals, summary_totals
+
+Column = namedtuple("Column", ["title", "width", "align", "max_chars", "format"])
+
+FONT = "Arial"
+BODY_SIZE = 9
+ROW_HEIGHT = 6
+PAGE_MARGIN = 10
+
+
+def _text(value):
+    """FPDF's core fonts are latin-1 only."""
+    return str(value).encode("latin-1", "replace").decode("latin-1")
+
+
+def _money(value):
+    return f"${value:,.2f}"
+
+
+class _DocumentBuffer:
+    """
+    Append-only stand-in for fpdf 1.x's string document buffer.
+    fpdf 1.x grows ``self.buffer`` with ``+=`` on a str, which copies the whole
+    document on every line written and makes large reports quadratic.
+    """
+
+    def __init__(self):
+        self._parts = []
+        self._length = 0
+
+    def __iadd__(self, text):
+        self._parts.append(text)
+        self._length += len(text)
+        return self
+
+    def __len__(self):
+        return self._length
+
+    def __str__(self):
+        return "".join(self._parts)
+
+    def encode(self, encoding):
+        return str(self).encode(encoding)
+
+
+class StatementPDF(FPDF):
+    def __init__(self, title):
+        super().__init__()
+        if isinstance(getattr(self, "buffer", None), str):
+            self.buffer = _DocumentBuffer()
+        self.title_text = _text(title)
+        self.set_margins(PAGE_MARGIN, PAGE_MARGIN)
+        self.set_auto_page_break(False)
+        self.alias_nb_pages()
+
+    def footer(self):
+        self.set_y(-12)
+        self.set_font(FONT, "I", 8)
+        self.cell(0, 6, f"{self.title_text} - page {self.page_no()}/{{nb}}", 0, 0, "C")
+
+
+class StatementRenderer:
+    """
+    Renders one user's statement.
+    :param db_manager: DBManager to read from
+    :param username: The user whose statement is rendered
+    """
+
+    def __init__(self, db_manager, username):
+        self.db_manager = db_manager
+        self.username = username
+        self.pdf = StatementPDF(f"{username}'s Transaction Report")
+        self.pdf.set_font(FONT, "", BODY_SIZE)
+        self.columns = self._layout()
+        self.row_limit = self.pdf.h - PAGE_MARGIN - 14
+
+    def _layout(self):
+        """Column widths and per-column character limits, computed once per report."""
+        usable = self.pdf.w - 2 * PAGE_MARGIN
+        spec = [
+            ("ID", 0.09, "R", str),
+            ("Date", 0.15, "L", str),
+            ("Type", 0.11, "L", str),
+            ("Category", 0.19, "L", str),
+            ("Amount", 0.14, "R", _money),
+            ("Description", 0.32, "L", str),
+        ]
+        # Average glyph width of the body font drives the truncation limits.
+        sample = "abcdefghijklmnopqrstuvwxyz0123456789"
+        char_width = self.pdf.get_string_width(sample) / len(sample)
+        return [
+            Column(title, usable * share, align, max(int(usable * share / char_width) - 1, 3), formatter)
+            for title, share, align, formatter in spec
+        ]
+
+    def _heading(self, text):
+        self.pdf.set_font(FONT, "B", 12)
+        self.pdf.cell(0, 9, _text(text), 0, 1)
+        self.pdf.set_font(FONT, "", BODY_SIZE)
+
+    def _table_header(self):
+        self.pdf.set_font(FONT, "B", BODY_SIZE)
+        self.pdf.set_fill_color(220, 226, 235)
+        for column in self.columns:
+            self.pdf.cell(column.width, ROW_HEIGHT, column.title, 1, 0, column.align, 1)
+        self.pdf.ln()
+        self.pdf.set_font(FONT, "", BODY_SIZE)
+
+    def _ensure_space(self, height, repeat_header=False):
+        if self.pdf.get_y() + height > self.row_limit:
+            self.pdf.add_page()
+            if repeat_header:
+                self._table_header()
+
+    def _key_values(self, pairs):
+        for label, value in pairs:
+            self._ensure_space(ROW_HEIGHT)
+            self.pdf.cell(60, ROW_HEIGHT, _text(label), 0, 0)
+            self.pdf.cell(40, ROW_HEIGHT, _text(value), 0, 1, "R")
+
+    def render_summary(self):
+        totals = summary_totals(self.db_manager, self.username)
+        self._heading("Summary")
+        self._key_values([
+            ("Total income", _money(totals.total_income)),
+            ("Total expenses", _money(totals.total_expenses)),
+            ("Balance", _money(totals.balance)),
+            ("Transactions", f"{totals.count:,}"),
+        ])
+        self.pdf.ln(4)
+
+        months = monthly_totals(self.db_manager, self.username)
+        if months:
+            self._heading("By month")
+            self._key_values(
+                (month.period or "Undated", f"+{_money(month.income)} / -{_money(month.expenses)}")
+                for month in months
+            )
+            self.pdf.ln(4)
+
+        categories = category_totals(self.db_manager, self.username)
+        if categories:
+            self._heading("By category")
+            self._key_values(
+                (f"{item.category} ({item.type}, {item.count:,})", _money(item.total)) for item in categories
+            )
+        return totals.count
+
+    def render_transactions(self, chunks, total, progress=None, progress_every=500):
+        """
+        Draw the transaction table from an iterable of row chunks
+        (id, type, category, amount, description, date).
+        :return: Number of rows drawn
+        """
+        self.pdf.add_page()
+        self._heading("Transactions")
+        self._table_header()
+
+        pdf = self.pdf
+        cell = pdf.cell
+        columns = self.columns
+        done = 0
+        for rows in chunks:
+            for row in rows:
+                if progress and done % progress_every == 0:
+                    progress(done, total)
+                if pdf.y + ROW_HEIGHT > self.row_limit:
+                    pdf.add_page()
+                    self._table_header()
+                # Unpack once: each index into a records.Transaction rebuilds its value tuple.
+                id_, type_, category, amount, description, date = row
+                for column, value in zip(columns, (id_, date, type_, category, amount, description)):
+                    text = _text(column.format(value)) if value is not None else ""
+                    if len(text) > column.max_chars:
+                        text = text[:column.max_chars - 3] + "..."
+                    cell(column.width, ROW_HEIGHT, text, 1, 0, column.align)
+                pdf.ln()
+                done += 1
+        return done
+
+    def render(self, chunks, total, progress=None):
+        self.pdf.add_page()
+        self.pdf.set_font(FONT, "B", 16)
+        self.pdf.cell(0, 12, self.pdf.title_text, 0, 1, "C")
+        self.pdf.set_font(FONT, "", BODY_SIZE)
+        self.render_summary()
+        return self.render_transactions(chunks, total, progress)
+
+    def save(self, file_path):
+        self.pdf.output(file_path, "F")
@@ -0,0 +1,49 @@
+from PyQt5.QtCore import QObject, QRunnable, QThreadPool, pyqtSignal, pyqtSlot
+
+from tasks import Task
+
+
+class _Dispatcher(QObject):
+    """Lives on the GUI thread; signals emitted from workers are queued onto it."""
+
+    delivered = pyqtSignal(object, tuple)
+
+    def __init__(self):
+        super().__init__()
+        self.delivered.connect(self._dispatch)
+
+    @pyqtSlot(object, tuple)
+    def _dispatch(self, callback, args):
+        callback(*args)
+
+
+class _TaskRunnable(QRunnable):
+    def __init__(self, task, dispatcher):
+        super().__init__()
+        self.task = task
+        self.dispatcher = dispatcher
+
+    def run(self):
+        self.task.run(lambda callback, *args: self.dispatcher.delivered.emit(callback, args))
+
+
+class QtTaskExecutor:
+    """
+    Runs tasks on a QThreadPool and delivers their callbacks on the GUI thread
+    through a queued signal. Same ``submit`` interface as tasks.TaskExecutor.
+    """
+
+    def __init__(self, max_workers=2, parent=None):
+        self._pool = QThreadPool(parent)
+        self._pool.setMaxThreadCount(max_workers)
+        self._dispatcher = _Dispatcher()
+
+    def submit(self, fn, *args, on_done=None, on_error=None, on_progress=None, **kwargs):
+        task = Task(fn, args, kwargs, on_done, on_error, on_progress)
+        self._pool.start(_TaskRunnable(task, self._dispatcher))
+        return task
+
+    def shutdown(self, wait=False):
+        self._pool.clear()
+        if wait:
+            self._pool.waitForDone()
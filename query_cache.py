@@ -0,0 +1,146 @@
+"""
+Per-user cache of read-query results.
+
+Entries are keyed by (username, query kind, parameters) and are dropped by
+size (least recently used first) and age (TTL). Validity is checked against
+two counters:
+
+* ``PRAGMA data_version`` on a connection the cache keeps for itself. It
+  changes whenever any other connection commits, in this process or another
+  one sharing the file, and costs no table access to read. While it is
+  unchanged every entry is current.
+* ``user_balances.version``, which triggers bump on every change to one of a
+  user's transactions. After another commit, an entry is kept only if its
+  user's version is the one it was computed at, so writes by one user leave
+  everyone else's entries alone.
+
+Writers in this process also call ``invalidate`` so their own user's entries
+are freed at once.
+"""
+import logging
+import threading
+import time
+from collections import OrderedDict, namedtuple
+
+logger = logging.getLogger(__name__)
+
+CacheStats = namedtuple("CacheStats", ["hits", "misses", "expired", "evicted", "invalidated", "size"])
+
+_Entry = namedtuple("_Entry", ["value", "user_version", "data_version", "expires"])
+
+
+class QueryCache:
+    """
+    :param pool: db_manager.ConnectionPool of the database being cached
+    :param max_entries: Least recently used entries are dropped beyond this count
+    :param ttl: Seconds an entry may be served, however current it is
+    :param max_rows: Results that are sequences longer than this are not cached
+    """
+
+    def __init__(self, pool, max_entries=256, ttl=60, max_rows=5000):
+        self.pool = pool
+        self.max_entries = max_entries
+        self.ttl = ttl
+        self.max_rows = max_rows
+        self._entries = OrderedDict()
+        self._lock = threading.Lock()
+        self._watcher = None
+        self._watcher_lock = threading.Lock()
+        # User versions read since data_version last changed.
+        self._versions = {}
+        self._versions_at = None
+        self._hits = self._misses = self._expired = self._evicted = self._invalidated = 0
+
+    def _data_version(self):
+        with self._watcher_lock:
+            if self._watcher is None:
+                self._watcher = self.pool._open()
+            return self._watcher.execute("PRAGMA data_version").fetchone()[0]
+
+    def _user_version(self, username, data_version):
+        with self._lock:
+            if self._versions_at == data_version and username in self._versions:
+                return self._versions[username]
+        with self.pool.connection() as conn:
+            row = conn.execute("SELECT version FROM user_balances WHERE username = ?", (username,)).fetchone()
+        version = row[0] if row else 0
+        with self._lock:
+            if self._versions_at != data_version:
+                self._versions = {}
+                self._versions_at = data_version
+            self._versions[username] = version
+        return version
+
+    def get(self, username, kind, params, compute):
+        """
+        The cached result for (username, kind, params), or ``compute()``'s result on a miss.
+        Results are shared between callers and must not be modified.
+        :param params: Hashable parameters that distinguish results of the same kind
+        """
+        key = (username, kind, params)
+        data_version = self._data_version()
+        now = time.monotonic()
+
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is not None and entry.expires < now:
+                del self._entries[key]
+                self._expired += 1
+                entry = None
+            if entry is not None and entry.data_version == data_version:
+                self._entries.move_to_end(key)
+                self._hits += 1
+                return entry.value
+
+        # Something was committed since the entry was stored, or there is no entry.
+        # The user version is read before computing, so a write racing the query
+        # leaves the new entry with an old version and it is dropped next time.
+        user_version = self._user_version(username, data_version)
+        if entry is not None and entry.user_version == user_version:
+            with self._lock:
+                if self._entries.get(key) is entry:
+                    self._entries[key] = entry._replace(data_version=data_version)
+                    self._entries.move_to_end(key)
+                self._hits += 1
+            return entry.value
+
+        value = compute()
+        with self._lock:
+            self._misses += 1
+            if entry is not None:
+                self._invalidated += 1
+            if isinstance(value, (list, tuple)) and len(value) > self.max_rows:
+                self._entries.pop(key, None)
+                return value
+            self._entries[key] = _Entry(value, user_version, data_version, now + self.ttl)
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+                self._evicted += 1
+        return value
+
+    def invalidate(self, username):
+        """Drop every entry of ``username``."""
+        with self._lock:
+            keys = [key for key in self._entries if key[0] == username]
+            for key in keys:
+                del self._entries[key]
+            self._versions.pop(username, None)
+            self._invalidated += len(keys)
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+            self._versions = {}
+
+    def stats(self):
+        """:return: CacheStats counters since the cache was created"""
+        with self._lock:
+            return CacheStats(self._hits, self._misses, self._expired, self._evicted, self._invalidated,
+                              len(self._entries))
+
+    def close(self):
+        with self._watcher_lock:
+            if self._watcher is not None:
+                self._watcher.close()
+                self._watcher = None
@@ -0,0 +1,115 @@
+"""
+Money values and typed transaction rows.
+
+Amounts are stored as integer cents. ``to_cents`` is the single entry point
+for user input (str, int, float or Decimal); ``from_cents`` gives an exact
+Decimal back for display and totals.
+"""
+from decimal import ROUND_HALF_UP, Decimal, InvalidOperation
+from sys import intern
+
+from errors import InvalidTransaction
+
+CENT = Decimal("0.01")
+
+
+def to_cents(value):
+    """
+    Convert an amount in currency units to integer cents, rounding half up.
+    Floats go through their shortest repr, so 0.1 + 0.2 style noise is dropped.
+    :raises InvalidTransaction: If the value is not a finite number
+    """
+    if isinstance(value, int) and not isinstance(value, bool):
+        return value * 100
+    try:
+        amount = Decimal(value.strip() if isinstance(value, str) else str(value))
+    except (InvalidOperation, TypeError, ValueError):
+        raise InvalidTransaction(f"Invalid amount: {value!r}")
+    if not amount.is_finite():
+        raise InvalidTransaction(f"Invalid amount: {value!r}")
+    return int(amount.quantize(CENT, rounding=ROUND_HALF_UP) * 100)
+
+
+def from_cents(cents):
+    """Integer cents to an exact Decimal amount (None stays None)."""
+    if cents is None:
+        return None
+    return Decimal(cents).scaleb(-2)
+
+
+class Transaction:
+    """
+    One transactions row. Behaves like the (id, type, category, amount,
+    description, date) tuple it replaces: it can be indexed, unpacked and
+    iterated, with ``amount`` as a Decimal computed on access. ``__slots__``
+    keeps instances free of a per-row ``__dict__``.
+
+    A description read with a cipher (see encryption.FieldCipher) stays sealed
+    until it is first accessed, so rows that are never displayed are never
+    decrypted; ``stored_description`` is the value as stored.
+    """
+
+    __slots__ = ("id", "type", "category", "amount_cents", "stored_description", "date", "_cipher", "_plaintext")
+
+    def __init__(self, id, type, category, amount_cents, description, date, cipher=None):
+        self.id = id
+        self.type = type
+        self.category = category
+        self.amount_cents = amount_cents
+        self.stored_description = description
+        self.date = date
+        self._cipher = cipher
+        self._plaintext = None
+
+    @classmethod
+    def from_row(cls, cursor, row, cipher=None):
+        """
+        sqlite3 row_factory for SELECT id, type, category, amount_cents, description, date.
+        Type, category and date repeat across a history, so they are interned:
+        rows share one string object per distinct value instead of one each.
+        :param cipher: Bind with functools.partial to read sealed descriptions
+        """
+        trans_id, trans_type, category, amount_cents, description, date = row
+        if cipher is not None and not cipher.is_sealed(description):
+            cipher = None
+        return cls(
+            trans_id, intern(trans_type), intern(category), amount_cents, description,
+            intern(date) if date is not None else None, cipher
+        )
+
+    @property
+    def description(self):
+        if self._cipher is None:
+            return self.stored_description
+        if self._plaintext is None:
+            self._plaintext = self._cipher.decrypt(self.stored_description)
+        return self._plaintext
+
+    @property
+    def amount(self):
+        return from_cents(self.amount_cents)
+
+    def _values(self):
+        return (self.id, self.type, self.category, self.amount, self.description, self.date)
+
+    def __iter__(self):
+        return iter(self._values())
+
+    def __len__(self):
+        return 6
+
+    def __getitem__(self, index):
+        return self._values()[index]
+
+    def __eq__(self, other):
+        if isinstance(other, Transaction):
+            return self._values() == other._values()
+        if isinstance(other, tuple):
+            return self._values() == other
+        return NotImplemented
+
+    __hash__ = None
+
+    def __repr__(self):
+        return (f"Transaction(id={self.id}, type={self.type!r}, category={self.category!r}, "
+                f"amount={self.amount}, description={self.description!r}, date={self.date!r})")
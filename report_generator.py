@@ -1,92 +1,225 @@
-import pandas as pd
-from fpdf import FPDF
+import csv
+import logging
+import string
+import tempfile
+import time
+from collections import namedtuple
 from db_manager import DBManager
+from instrumentation import span
 from pathlib import Path
 import os
 
-def export_to_excel(username):
+CHUNK_SIZE = 2000
+# Overrides ~/Downloads as the directory exports are written to.
+EXPORT_DIR_ENV = "FINANCE_EXPORT_DIR"
+
+logger = logging.getLogger(__name__)
+
+EXPORT_COLUMNS = ["ID", "Type", "Category", "Amount", "Description", "Date"]
+# Username characters kept as they are in export file names.
+_FILE_NAME_CHARS = frozenset(string.ascii_letters + string.digits + "_-")
+
+
+class ExportResult(namedtuple("ExportResult", ["path", "rows", "seconds"])):
+    @property
+    def rows_per_second(self):
+        return self.rows / self.seconds if self.seconds else float(self.rows)
+
+
+def default_output_dir():
+    """The export directory used when none is given: $FINANCE_EXPORT_DIR, else ~/Downloads."""
+    return os.environ.get(EXPORT_DIR_ENV) or str(Path.home() / "Downloads")
+
+
+def _output_path(username, extension, output_dir=None):
     """
-    Export transactions to an Excel file for the specified user.
-    :param username: The username of the user
+    Where an export for ``username`` is written; defaults to default_output_dir().
+    Every byte of the username outside [A-Za-z0-9_-] is percent-escaped, "%"
+    included: the name cannot leave the directory (even for names stored
+    before registration rejected separators), and no two users share a file.
     """
-    db_manager = DBManager()
-    conn = db_manager.get_connection()
-    cursor = conn.cursor()
+    directory = output_dir or default_output_dir()
+    os.makedirs(directory, exist_ok=True)
+    name = "".join(chr(byte) if chr(byte) in _FILE_NAME_CHARS else f"%{byte:02X}" for byte in username.encode())
+    return os.path.join(directory, f"{name}_transactions.{extension}")
 
-    cursor.execute("SELECT * FROM transactions WHERE username = ?", (username,))
-    rows = cursor.fetchall()
 
-    # Define column names for Excel
-    columns = ["ID", "Username", "Type", "Category", "Amount", "Date", "Description"]
-
-    if not rows:
-        print(f"No transactions found for {username}.")
-        return
+def _write_atomically(file_path, writer, chunks):
+    """
+    Run ``writer`` against a temporary file next to ``file_path`` and rename it
+    into place once complete, so readers never see a half-written export and a
+    failed export leaves any previous file untouched.
+    :return: What ``writer`` returned
+    """
+    directory, name = os.path.split(file_path)
+    # Keep the extension last: some writers pick the format from it.
+    fd, temp_path = tempfile.mkstemp(prefix=f".{name}.", suffix=os.path.splitext(name)[1], dir=directory)
+    os.close(fd)
+    try:
+        written = writer(temp_path, chunks)
+        os.replace(temp_path, file_path)
+    except BaseException:
+        try:
+            os.remove(temp_path)
+        except OSError:
+            pass
+        raise
+    return written
+
+
+def _iter_chunks(db_manager, username, chunk_size=CHUNK_SIZE, cipher=None):
+    """Yield the user's transactions as lists of rows, using the keyset-paginated reader."""
+    cursor = None
+    while True:
+        rows, cursor = db_manager.get_transactions_page(username, chunk_size, cursor, cipher=cipher)
+        if rows:
+            yield rows
+        if cursor is None:
+            return
+
+
+def _stream_export(username, extension, writer, progress=None, output_dir=None, db_manager=None,
+                   cipher=None, chunk_size=CHUNK_SIZE):
+    """
+    Shared driver for the row-streaming exports.
+    :param writer: Callable(file_path, chunks) that writes every chunk and returns the row count
+    :param cipher: encryption.FieldCipher for the user's sealed descriptions
+    :return: ExportResult, or None if there was nothing to export
+    """
+    db_manager = db_manager or DBManager()
+    total = db_manager.count_transactions(username)
+    if not total:
+        logger.info("No transactions found for %s", username)
+        return None
+
+    def chunks():
+        done = 0
+        for rows in _iter_chunks(db_manager, username, chunk_size, cipher):
+            if progress:
+                progress(done, total)
+            yield rows
+            done += len(rows)
+        if progress:
+            progress(done, total)
+
+    file_path = _output_path(username, extension, output_dir)
+    started = time.perf_counter()
+    with span(f"export.{extension}") as measured:
+        written = measured.rows = _write_atomically(file_path, writer, chunks())
+    result = ExportResult(file_path, written, time.perf_counter() - started)
+    logger.info("Exported %d transactions to %s in %.2fs (%.0f rows/s)",
+                result.rows, file_path, result.seconds, result.rows_per_second)
+    return result
+
+
+def _write_excel(file_path, chunks):
+    from openpyxl import Workbook
+
+    # Write-only workbooks stream rows to disk instead of keeping every cell in memory.
+    workbook = Workbook(write_only=True)
+    sheet = workbook.create_sheet("Transactions")
+    sheet.append(EXPORT_COLUMNS)
+    written = 0
+    try:
+        for rows in chunks:
+            for row in rows:
+                sheet.append(tuple(row))
+            written += len(rows)
+    except BaseException:
+        # Finish the sheet's row writer now; left to the garbage collector it
+        # writes to a file that is already closed.
+        sheet.close()
+        raise
+    workbook.save(file_path)
+    return written
+
+
+def _write_csv(file_path, chunks):
+    written = 0
+    with open(file_path, "w", newline="", encoding="utf-8") as f:
+        writer = csv.writer(f)
+        writer.writerow(EXPORT_COLUMNS)
+        for rows in chunks:
+            writer.writerows(rows)
+            written += len(rows)
+    return written
+
+
+def _write_parquet(file_path, chunks):
+    import pyarrow as pa
+    import pyarrow.parquet as pq
+
+    schema = pa.schema([
+        ("ID", pa.int64()), ("Type", pa.string()), ("Category", pa.string()),
+        ("Amount", pa.decimal128(18, 2)), ("Description", pa.string()), ("Date", pa.string()),
+    ])
+    written = 0
+    with pq.ParquetWriter(file_path, schema) as writer:
+        for rows in chunks:
+            columns = list(zip(*rows))
+            writer.write_table(pa.Table.from_arrays(
+                [pa.array(values, type=field.type) for values, field in zip(columns, schema)], schema=schema
+            ))
+            written += len(rows)
+    return written
+
+
+def export_to_excel(username, progress=None, output_dir=None, db_manager=None, cipher=None):
+    """
+    Export transactions to an Excel file for the specified user.
+    Rows are streamed from the database in chunks into a write-only workbook,
+    so memory use does not grow with the size of the history.
+    :param username: The username of the user
+    :param progress: Optional callable(done, total) invoked as the export advances
+    :param output_dir: Directory for the file; defaults to $FINANCE_EXPORT_DIR or ~/Downloads
+    :param cipher: encryption.FieldCipher to decrypt descriptions; sealed values are written as stored without it
+    :return: ExportResult, or None if there was nothing to export
+    """
+    return _stream_export(username, "xlsx", _write_excel, progress, output_dir, db_manager, cipher)
 
-    # Create a DataFrame
-    df = pd.DataFrame(rows, columns=columns)
 
-    # Save to Excel file in Downloads folder
-    downloads_path = str(Path.home() / "Downloads")
-    file_path = os.path.join(downloads_path, f"{username}_transactions.xlsx")
-    df.to_excel(file_path, index=False)
+def export_to_csv(username, progress=None, output_dir=None, db_manager=None, cipher=None):
+    """
+    Export transactions to a CSV file; the fastest export for large histories.
+    :return: ExportResult, or None if there was nothing to export
+    """
+    return _stream_export(username, "csv", _write_csv, progress, output_dir, db_manager, cipher)
 
-    conn.close()
-    print(f"Transactions successfully exported to Excel at {file_path}")
 
-def export_to_pdf(username):
+def export_to_parquet(username, progress=None, output_dir=None, db_manager=None, cipher=None):
+    """
+    Export transactions to a Parquet file, one row group per chunk.
+    Requires pyarrow.
+    :return: ExportResult, or None if there was nothing to export
+    """
+    try:
+        import pyarrow  # noqa: F401
+    except ImportError:
+        logger.warning("pyarrow module not installed. Install it using 'pip install pyarrow'.")
+        return None
+    return _stream_export(username, "parquet", _write_parquet, progress, output_dir, db_manager, cipher)
+
+def export_to_pdf(username, progress=None, output_dir=None, db_manager=None, cipher=None):
     """
-    Export transactions to a PDF file for the specified user.
+    Export a PDF statement for the specified user: summary, monthly and
+    category sections followed by the full transaction table.
     :param username: The username of the user
+    :param progress: Optional callable(done, total) invoked as the export advances
+    :param output_dir: Directory for the file; defaults to $FINANCE_EXPORT_DIR or ~/Downloads
+    :return: ExportResult, or None if there was nothing to export
     """
-    db_manager = DBManager()
-    conn = db_manager.get_connection()
-    cursor = conn.cursor()
-
-    cursor.execute("SELECT type, category, amount, date, description FROM transactions WHERE username = ?", (username,))
-    rows = cursor.fetchall()
-    conn.close()
-
-    if not rows:
-        print(f"No transactions found for {username}.")
-        return
-
-    # Initialize PDF
-    pdf = FPDF()
-    pdf.set_auto_page_break(auto=True, margin=15)
-    pdf.add_page()
-    pdf.set_font("Arial", size=12)
-
-    # Add title
-    pdf.set_font("Arial", size=16, style="B")
-    pdf.cell(200, 10, txt=f"{username}'s Transaction Report", ln=True, align='C')
-    pdf.ln(10)
-
-    # Add table headers
-    pdf.set_font("Arial", size=12, style="B")
-    headers = ["Type", "Category", "Amount", "Date", "Description"]
-    column_widths = [40, 40, 30, 30, 50]
-    for i, header in enumerate(headers):
-        pdf.cell(column_widths[i], 10, header, border=1)
-    pdf.ln()
-
-    # Add table rows
-    pdf.set_font("Arial", size=12)
-    for row in rows:
-        pdf.cell(40, 10, row[0], border=1)
-        pdf.cell(40, 10, row[1], border=1)
-        pdf.cell(30, 10, f"${row[2]:.2f}", border=1)
-        pdf.cell(30, 10, row[3], border=1)
-        pdf.cell(50, 10, row[4], border=1)
-        pdf.ln()
-
-    # Save to PDF file in Downloads folder
-    downloads_path = str(Path.home() / "Downloads")
-    file_path = os.path.join(downloads_path, f"{username}_transactions.pdf")
-    pdf.output(file_path)
-
-    print(f"Transactions successfully exported to PDF at {file_path}")
+    from pdf_report import StatementRenderer  # Deferred: loads fpdf
+
+    db_manager = db_manager or DBManager()
+
+    def write_pdf(file_path, chunks):
+        renderer = StatementRenderer(db_manager, username)
+        written = renderer.render(chunks, total=None)
+        renderer.save(file_path)
+        return written
+
+    return _stream_export(username, "pdf", write_pdf, progress, output_dir, db_manager, cipher)
 
 # Ensure these functions are properly accessible
-__all__ = ["export_to_excel", "export_to_pdf"]
+__all__ = ["export_to_excel", "export_to_csv", "export_to_parquet", "export_to_pdf", "default_output_dir"]
 
@@ -0,0 +1,118 @@
+"""
+Full-text search over transaction categories and descriptions.
+
+Search runs on the transactions_fts FTS5 index, which triggers keep in step
+with the transactions table (see migration 9). Each indexed row holds:
+
+* ``owner``: the username as one hex token, so a search only walks the
+  posting lists of its own user;
+* ``category`` and plaintext ``description`` text;
+* ``terms``: the blind index of an encrypted description. Ciphertext cannot
+  be indexed, so when a description is sealed the writer also stores one
+  keyed hash per word prefix (see ``encryption.KeyRing.search_terms``), and
+  a query word is matched by its hash.
+
+Every query word must match (AND), as a prefix of a category or description
+word. Words shorter than MIN_PREFIX are left out of the query: the blind index
+stores no prefixes that short, so keeping them would match plaintext
+descriptions but never sealed ones. Results come newest first by id and page with ``(last id,)`` as cursor:
+the index hands out rowids in that order, so a page costs the rows it
+returns, not the size of the history.
+"""
+import re
+import unicodedata
+
+from db_manager import _filter_clauses
+from instrumentation import timed
+from records import Transaction
+
+# Word prefixes stored in the blind index; shorter query words are ignored and
+# longer ones are cut to MAX_PREFIX.
+MIN_PREFIX = 2
+MAX_PREFIX = 12
+
+_WORD = re.compile(r"[^\W_]+")
+
+
+def words(text):
+    """
+    Split text into lower-case words with accents removed, the way the FTS5
+    unicode61 tokenizer of transactions_fts does.
+    """
+    if not text:
+        return []
+    decomposed = unicodedata.normalize("NFKD", str(text))
+    stripped = "".join(char for char in decomposed if not unicodedata.combining(char))
+    return _WORD.findall(stripped.casefold())
+
+
+def word_prefixes(word):
+    """The prefixes of ``word`` that the blind index stores, shortest first."""
+    return [word[:length] for length in range(MIN_PREFIX, min(len(word), MAX_PREFIX) + 1)]
+
+
+def match_expression(username, query, term_token=None):
+    """
+    FTS5 MATCH expression for ``query`` within one user's rows. Words shorter
+    than MIN_PREFIX are dropped, for plaintext and sealed descriptions alike.
+    :param term_token: Optional callable mapping a word to its blind-index token,
+        so encrypted descriptions are searched too
+    :return: The expression, or None if ``query`` has no words of MIN_PREFIX or more characters
+    """
+    query_words = [word for word in words(query) if len(word) >= MIN_PREFIX]
+    if not query_words:
+        return None
+    # Words contain letters and digits only, so they can be quoted as they are.
+    clauses = [f'owner : "{username.encode().hex()}"']
+    for word in query_words:
+        clause = f'{{category description}} : "{word}"*'
+        if term_token is not None:
+            clause += f' OR terms : "{term_token(word[:MAX_PREFIX])}"'
+        clauses.append(f"({clause})")
+    return " AND ".join(clauses)
+
+
+@timed("db.search_transactions", rows=lambda page: len(page[0]))
+def search_transactions(db_manager, username, query, page_size=100, after=None, filters=None, cipher=None,
+                        term_token=None):
+    """
+    One page of a user's transactions matching ``query``, newest first.
+    :param query: Words to look for; each must start a word of the category or description.
+        One-character words are ignored, and a query of only those matches nothing
+    :param after: The cursor returned with the previous page, or None for the first page
+    :param filters: Optional dict as for DBManager.get_transactions_page
+    :param cipher: encryption.FieldCipher for the user's sealed descriptions
+    :param term_token: Blind-index token function of the user's KeyRing
+    :return: (rows, cursor) where rows are records.Transaction and cursor is None
+        once the results are exhausted
+    """
+    expression = match_expression(username, query, term_token)
+    if expression is None:
+        return [], None
+
+    # The FTS side is a subquery exposing only the id, so filter columns are not ambiguous.
+    # CROSS JOIN keeps it the outer loop: selective filters would otherwise tempt the
+    # planner into an index scan of transactions with one MATCH per row.
+    hits = "SELECT rowid AS id FROM transactions_fts WHERE transactions_fts MATCH ?"
+    params = [expression]
+    if after is not None:
+        hits += " AND rowid < ?"
+        params.extend(after)
+    query_sql = f"""
+        SELECT id, type, category, amount_cents, description, date
+        FROM ({hits}) AS hits CROSS JOIN transactions USING (id)
+        WHERE username = ?
+    """
+    params.append(username)
+    for clause, value in _filter_clauses(filters):
+        query_sql += f" AND {clause}"
+        params.append(value)
+    query_sql += " ORDER BY id DESC LIMIT ?"
+    params.append(page_size)
+
+    with db_manager.connection() as conn:
+        result = conn.execute(query_sql, params)
+        result.row_factory = Transaction.from_row if cipher is None else cipher.row_factory
+        rows = result.fetchall()
+    cursor = (rows[-1].id,) if len(rows) == page_size else None
+    return rows, cursor
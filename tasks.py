@@ -0,0 +1,148 @@
+"""
+Background task execution shared by the Qt and tkinter front ends.
+
+Work runs on a small thread pool; results, errors and progress updates are
+handed back to the UI thread by the front-end specific executor, so callbacks
+can touch widgets directly. Long-running functions accept a ``progress``
+callable, report through it, and are cancelled the next time they do so.
+"""
+import logging
+import queue
+import threading
+from concurrent.futures import ThreadPoolExecutor
+
+logger = logging.getLogger(__name__)
+
+
+class TaskCancelled(Exception):
+    """Raised inside a task when it reports progress after being cancelled."""
+
+
+class Task:
+    def __init__(self, fn, args, kwargs, on_done=None, on_error=None, on_progress=None):
+        self.fn = fn
+        self.args = args
+        self.kwargs = kwargs
+        self.on_done = on_done
+        self.on_error = on_error
+        self.on_progress = on_progress
+        self._cancelled = threading.Event()
+        self._deliver = None
+
+    @property
+    def cancelled(self):
+        return self._cancelled.is_set()
+
+    def cancel(self):
+        """Ask the task to stop; it is abandoned at its next progress report."""
+        self._cancelled.set()
+
+    def report_progress(self, done, total=None):
+        """Passed to the task function as ``progress``."""
+        if self.cancelled:
+            raise TaskCancelled()
+        if self.on_progress:
+            self._deliver(self.on_progress, done, total)
+
+    def run(self, deliver):
+        """
+        Execute on a worker thread.
+        :param deliver: Callable(callback, *args) that runs callback on the UI thread
+        """
+        self._deliver = deliver
+        try:
+            if self.cancelled:
+                raise TaskCancelled()
+            kwargs = dict(self.kwargs)
+            if self.on_progress:
+                kwargs["progress"] = self.report_progress
+            result = self.fn(*self.args, **kwargs)
+            if self.cancelled:
+                raise TaskCancelled()
+        except Exception as e:
+            if self.on_error:
+                deliver(self.on_error, e)
+            return
+        if self.on_done:
+            deliver(self.on_done, result)
+
+
+class TaskExecutor:
+    """Runs tasks on a thread pool; subclasses decide how callbacks reach the UI thread."""
+
+    def __init__(self, max_workers=2):
+        self._pool = ThreadPoolExecutor(max_workers=max_workers, thread_name_prefix="finance-task")
+
+    def submit(self, fn, *args, on_done=None, on_error=None, on_progress=None, **kwargs):
+        """
+        Run ``fn(*args, **kwargs)`` in the background.
+        When ``on_progress`` is given, ``fn`` is also called with a ``progress`` keyword.
+        Cancelled tasks report TaskCancelled to ``on_error``.
+        :return: The Task, which can be cancelled
+        """
+        task = Task(fn, args, kwargs, on_done, on_error, on_progress)
+        self._start(task)
+        return task
+
+    def _start(self, task):
+        self._pool.submit(self._run, task)
+
+    def _run(self, task):
+        task.run(self._deliver)
+
+    def _deliver(self, callback, *args):
+        callback(*args)
+
+    def shutdown(self, wait=False):
+        self._pool.shutdown(wait=wait, cancel_futures=True)
+
+
+class TkTaskExecutor(TaskExecutor):
+    """Delivers callbacks on the tkinter main loop by polling a queue with ``root.after``."""
+
+    def __init__(self, root, max_workers=2, poll_interval_ms=50):
+        super().__init__(max_workers)
+        self.root = root
+        self.poll_interval_ms = poll_interval_ms
+        self._callbacks = queue.Queue()
+        self._pending = 0
+        self._polling = False
+
+    def _start(self, task):
+        self._pending += 1
+        super()._start(task)
+        if not self._polling:
+            self._polling = True
+            self.root.after(self.poll_interval_ms, self._poll)
+
+    def _run(self, task):
+        try:
+            super()._run(task)
+        finally:
+            # Marks the task as finished once its callbacks have been drained.
+            self._callbacks.put((None, ()))
+
+    def _deliver(self, callback, *args):
+        self._callbacks.put((callback, args))
+
+    def _poll(self):
+        try:
+            while True:
+                try:
+                    callback, args = self._callbacks.get_nowait()
+                except queue.Empty:
+                    break
+                if callback is None:
+                    self._pending -= 1
+                    continue
+                # One failing callback (e.g. on a widget clear_screen destroyed)
+                # must not stop the others, or the polling, from running.
+                try:
+                    callback(*args)
+                except Exception:
+                    logger.exception("Task callback %r failed", callback)
+        finally:
+            if self._pending > 0:
+                self.root.after(self.poll_interval_ms, self._poll)
+            else:
+                self._polling = False
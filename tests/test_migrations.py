@@ -0,0 +1,78 @@
+"""
+Migrations run by several processes opening the same old database at once.
+
+    python -m unittest tests.test_migrations
+"""
+import multiprocessing
+import os
+import sqlite3
+import sys
+import tempfile
+import unittest
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from migrations import LATEST_VERSION, get_version, migrate  # noqa: E402
+
+USERS = 20
+TRANSACTIONS = 500
+ROUNDS = 5
+
+
+def _open(db_path, start, results):
+    from db_manager import DBManager
+
+    start.wait()
+    try:
+        results.put(("ok", DBManager(db_path).schema_version()))
+    except Exception as e:  # Reported to the test process
+        results.put(("error", f"{type(e).__name__}: {e}"))
+
+
+def _old_database(db_path):
+    """A populated database still at the original (version 1) schema."""
+    conn = sqlite3.connect(db_path)
+    try:
+        migrate(conn, target=1)
+        conn.executemany("INSERT INTO users (username, password) VALUES (?, '')",
+                         [(f"user{index}",) for index in range(USERS)])
+        conn.executemany(
+            "INSERT INTO transactions (username, type, category, amount, description, date) VALUES (?, ?, ?, ?, ?, ?)",
+            [(f"user{index % USERS}", "expense" if index % 3 else "income", "Food", index / 100, f"Row {index}",
+              "2024-01-01") for index in range(TRANSACTIONS)]
+        )
+        conn.commit()
+    finally:
+        conn.close()
+
+
+class ConcurrentMigrationTest(unittest.TestCase):
+
+    def test_two_processes_migrate_the_same_old_database(self):
+        context = multiprocessing.get_context("spawn")
+        for _ in range(ROUNDS):
+            with tempfile.TemporaryDirectory() as tmp:
+                db_path = os.path.join(tmp, "finance.db")
+                _old_database(db_path)
+                start, results = context.Event(), context.Queue()
+                workers = [context.Process(target=_open, args=(db_path, start, results)) for _ in range(2)]
+                for worker in workers:
+                    worker.start()
+                start.set()
+                outcomes = [results.get(timeout=60) for _ in workers]
+                for worker in workers:
+                    worker.join(60)
+
+                self.assertEqual(outcomes, [("ok", LATEST_VERSION)] * 2)
+                conn = sqlite3.connect(db_path)
+                try:
+                    self.assertEqual(get_version(conn), LATEST_VERSION)
+                    self.assertEqual(conn.execute("SELECT COUNT(*) FROM transactions").fetchone()[0], TRANSACTIONS)
+                    self.assertEqual(conn.execute("SELECT SUM(tx_count) FROM user_balances").fetchone()[0],
+                                     TRANSACTIONS)
+                finally:
+                    conn.close()
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,109 @@
+from PyQt5.QtCore import QAbstractTableModel, QModelIndex, Qt
+
+from db_manager import TRANSACTION_COLUMNS
+
+HEADERS = ["ID", "Type", "Category", "Amount", "Description", "Date"]
+AMOUNT_COLUMN = TRANSACTION_COLUMNS.index("amount")
+
+
+class TransactionTableModel(QAbstractTableModel):
+    """
+    Table model over a user's transactions that loads rows page by page.
+
+    The view asks for more rows through canFetchMore/fetchMore as it scrolls,
+    and sorting and filtering are pushed into the SQL query, so opening the
+    table costs one page no matter how long the history is. While a search
+    text is set, rows come from the full-text index instead, most recently
+    added first, with the same filters.
+    """
+
+    def __init__(self, finance_tracker, page_size=200, parent=None):
+        super().__init__(parent)
+        self.finance_tracker = finance_tracker
+        self.page_size = page_size
+        self.filters = {}
+        self.search_text = ""
+        self.sort_column = "date"
+        self.descending = True
+        self._rows = []
+        self._cursor = None
+        self._exhausted = False
+
+    def rowCount(self, parent=QModelIndex()):
+        return 0 if parent.isValid() else len(self._rows)
+
+    def columnCount(self, parent=QModelIndex()):
+        return 0 if parent.isValid() else len(HEADERS)
+
+    def data(self, index, role=Qt.DisplayRole):
+        if not index.isValid():
+            return None
+        value = self._rows[index.row()][index.column()]
+        if role == Qt.DisplayRole:
+            if index.column() == AMOUNT_COLUMN:
+                return f"{value:.2f}"
+            return "" if value is None else str(value)
+        if role == Qt.TextAlignmentRole and index.column() == AMOUNT_COLUMN:
+            return Qt.AlignRight | Qt.AlignVCenter
+        return None
+
+    def headerData(self, section, orientation, role=Qt.DisplayRole):
+        if role == Qt.DisplayRole and orientation == Qt.Horizontal:
+            return HEADERS[section]
+        return super().headerData(section, orientation, role)
+
+    def canFetchMore(self, parent=QModelIndex()):
+        return not parent.isValid() and not self._exhausted
+
+    def fetchMore(self, parent=QModelIndex()):
+        if parent.isValid() or self._exhausted:
+            return
+        if self.search_text:
+            rows, self._cursor = self.finance_tracker.search_transactions(
+                self.search_text, self.page_size, self._cursor, filters=self.filters
+            )
+        else:
+            rows, self._cursor = self.finance_tracker.get_transactions_page(
+                self.page_size, self._cursor, filters=self.filters,
+                sort_column=self.sort_column, descending=self.descending
+            )
+        self._exhausted = self._cursor is None
+        if rows:
+            start = len(self._rows)
+            self.beginInsertRows(QModelIndex(), start, start + len(rows) - 1)
+            self._rows.extend(rows)
+            self.endInsertRows()
+
+    def sort(self, column, order=Qt.AscendingOrder):
+        self.sort_column = TRANSACTION_COLUMNS[column]
+        self.descending = order == Qt.DescendingOrder
+        self.refresh()
+
+    def set_filters(self, trans_type=None, category=None, date_from=None, date_to=None,
+                    amount_min=None, amount_max=None):
+        """Restrict the rows to a type, category, inclusive YYYY-MM-DD date range and/or amount range."""
+        self.filters = {
+            "type": trans_type,
+            "category": category,
+            "date_from": date_from,
+            "date_to": date_to,
+            "amount_min": amount_min,
+            "amount_max": amount_max,
+        }
+        self.refresh()
+
+    def set_search(self, text):
+        """Show only rows matching ``text`` (see FinanceTracker.search_transactions); blank shows all."""
+        text = text.strip()
+        if text == self.search_text:
+            return
+        self.search_text = text
+        self.refresh()
+
+    def refresh(self):
+        """Drop the loaded rows and start again from the first page."""
+        self.beginResetModel()
+        self._rows = []
+        self._cursor = None
+        self._exhausted = False
+        self.endResetModel()